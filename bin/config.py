@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 
@@ -24,6 +25,62 @@ AGENT_IP = "127.0.0.1:5051";
 # A dictionary from IP's to SSH keys to assist with remote commands
 SSH_KEYS = {}
 
+# The number of seconds a master connection to a remote host is kept
+# open after its last use, so that further remote commands are sent
+# over it without a new SSH handshake. 0 disables connection sharing.
+SSH_CONTROL_PERSIST = 60
+
+# The directory in which the CLI caches data between invocations
+# (e.g. the plugin manifest). Defaults to '$XDG_CACHE_HOME/mesos-cli'
+# and can be overridden with the 'MESOS_CLI_CACHE_DIR' environment
+# variable.
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME',
+                   os.path.join(os.path.expanduser("~"), ".cache")),
+    "mesos-cli")
+if os.environ.get('MESOS_CLI_CACHE_DIR'):
+    CACHE_DIR = os.environ.get('MESOS_CLI_CACHE_DIR')
+
+# The time to live (in seconds) of cached responses per endpoint, and
+# the maximum size (in bytes) of all cached responses. Responses of
+# endpoints that are not listed here are never cached.
+CACHE_TTLS = {
+    "/state" : 5,
+    "/state-summary" : 5,
+    "/slaves" : 5,
+    "/flags" : 60,
+    "/containers" : 2
+}
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+# Settings of the HTTP client used to talk to masters and agents.
+# Timeouts are in seconds. Failed connections are retried
+# 'HTTP_RETRIES' times, backing off exponentially from 'HTTP_BACKOFF'.
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 30.0
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5
+
+# Settings for reading files from sandboxes. Files are read in pages
+# starting at 'SANDBOX_PAGE_SIZE' bytes and doubling up to
+# 'SANDBOX_MAX_PAGE_SIZE' bytes, with up to 'SANDBOX_READ_AHEAD'
+# pages requested concurrently. Followed files are polled every
+# 'SANDBOX_POLL_INTERVAL' seconds while they grow, backing off up to
+# 'SANDBOX_MAX_POLL_INTERVAL' seconds while they are idle.
+SANDBOX_PAGE_SIZE = 64 * 1024
+SANDBOX_MAX_PAGE_SIZE = 4 * 1024 * 1024
+SANDBOX_READ_AHEAD = 4
+SANDBOX_POLL_INTERVAL = 0.5
+SANDBOX_MAX_POLL_INTERVAL = 8.0
+
+# The number of seconds after which tasks and sandboxes that have not
+# been seen again are pruned from the sandbox index in 'CACHE_DIR'.
+INDEX_MAX_AGE = 7 * 24 * 60 * 60
+
+# The number of seconds the addresses of the local network interfaces
+# are cached for when deciding whether an agent runs on this host.
+LOCAL_ADDRESSES_TTL = 10
+
 if os.environ.get('MESOS_CLI') is not None:
     configData = None
     try:
@@ -32,11 +89,57 @@ if os.environ.get('MESOS_CLI') is not None:
             if "MASTER_IP" in configData:
                 MASTER_IP = configData["MASTER_IP"]
 
-            if "AGENT`_IP" in configData:
+            if "AGENT_IP" in configData:
                 AGENT_IP = configData["AGENT_IP"]
 
             if "SSH_KEYS" in configData:
                 SSH_KEYS = configData["SSH_KEYS"]
+
+            if "SSH_CONTROL_PERSIST" in configData:
+                SSH_CONTROL_PERSIST = configData["SSH_CONTROL_PERSIST"]
+
+            if "CACHE_DIR" in configData:
+                CACHE_DIR = configData["CACHE_DIR"]
+
+            if "CACHE_TTLS" in configData:
+                CACHE_TTLS.update(configData["CACHE_TTLS"])
+
+            if "CACHE_MAX_SIZE" in configData:
+                CACHE_MAX_SIZE = configData["CACHE_MAX_SIZE"]
+
+            if "HTTP_CONNECT_TIMEOUT" in configData:
+                HTTP_CONNECT_TIMEOUT = configData["HTTP_CONNECT_TIMEOUT"]
+
+            if "HTTP_READ_TIMEOUT" in configData:
+                HTTP_READ_TIMEOUT = configData["HTTP_READ_TIMEOUT"]
+
+            if "HTTP_RETRIES" in configData:
+                HTTP_RETRIES = configData["HTTP_RETRIES"]
+
+            if "HTTP_BACKOFF" in configData:
+                HTTP_BACKOFF = configData["HTTP_BACKOFF"]
+
+            if "SANDBOX_PAGE_SIZE" in configData:
+                SANDBOX_PAGE_SIZE = configData["SANDBOX_PAGE_SIZE"]
+
+            if "SANDBOX_MAX_PAGE_SIZE" in configData:
+                SANDBOX_MAX_PAGE_SIZE = configData["SANDBOX_MAX_PAGE_SIZE"]
+
+            if "SANDBOX_READ_AHEAD" in configData:
+                SANDBOX_READ_AHEAD = configData["SANDBOX_READ_AHEAD"]
+
+            if "SANDBOX_POLL_INTERVAL" in configData:
+                SANDBOX_POLL_INTERVAL = configData["SANDBOX_POLL_INTERVAL"]
+
+            if "SANDBOX_MAX_POLL_INTERVAL" in configData:
+                SANDBOX_MAX_POLL_INTERVAL = \
+                    configData["SANDBOX_MAX_POLL_INTERVAL"]
+
+            if "INDEX_MAX_AGE" in configData:
+                INDEX_MAX_AGE = configData["INDEX_MAX_AGE"]
+
+            if "LOCAL_ADDRESSES_TTL" in configData:
+                LOCAL_ADDRESSES_TTL = configData["LOCAL_ADDRESSES_TTL"]
     except:
         pass
 
@@ -1,2 +1,3 @@
-from . import plugins
 from . import util
+from . import manifest
+from . import completion
@@ -0,0 +1,244 @@
+"""
+Commands often download the same (potentially very large) responses from
+a master or agent only seconds after a previous invocation of the CLI did,
+e.g. the '/state' of the master. To avoid this, responses of selected
+endpoints are cached on disk for a configurable time to live per endpoint.
+
+Every response is stored in its own file, so the modification time of the
+file records when the response was fetched and its access time (which we
+update explicitly on every hit) when it was last used. The latter is used
+to evict the least recently used responses once the cache grows beyond
+its maximum size.
+"""
+
+import hashlib
+import os
+import time
+
+# The default time to live (in seconds) of the responses of each
+# endpoint. Responses of endpoints that are not listed are never cached.
+TTLS = {
+    "/state" : 5,
+    "/state-summary" : 5,
+    "/slaves" : 5,
+    "/flags" : 60,
+    "/containers" : 2
+}
+
+# The default maximum size (in bytes) of all cached responses.
+MAX_SIZE = 256 * 1024 * 1024
+
+
+class ResponseCache(object):
+    """
+    An on disk cache of responses keyed by address and endpoint.
+    A cache without a directory caches nothing.
+    """
+
+    def __init__(self, directory, ttls=None, max_size=MAX_SIZE):
+        self.directory = directory
+        self.ttls = TTLS if ttls is None else ttls
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Returns a cache in the 'responses' directory of `config.CACHE_DIR`
+        using the 'CACHE_TTLS' and 'CACHE_MAX_SIZE' settings in `config`.
+        """
+        directory = getattr(config, "CACHE_DIR", None)
+        if directory is not None:
+            directory = os.path.join(directory, "responses")
+
+        return cls(directory,
+                   ttls=getattr(config, "CACHE_TTLS", TTLS),
+                   max_size=getattr(config, "CACHE_MAX_SIZE", MAX_SIZE))
+
+    def ttl(self, endpoint):
+        """
+        Returns the time to live of the responses of `endpoint`
+        (ignoring its query string), or None if they are not cached.
+        """
+        return self.ttls.get(endpoint.split("?")[0])
+
+    def path(self, addr, endpoint):
+        key = (addr + " " + endpoint).encode("utf-8")
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest())
+
+    def open(self, addr, endpoint, max_age=None):
+        """
+        Returns the cached response of `endpoint` at `addr` as an open
+        file if it is younger than `max_age` seconds (or the endpoint's
+        time to live if `max_age` is None). Returns None otherwise.
+        """
+        ttl = self.ttl(endpoint)
+        if self.directory is None or ttl is None:
+            return None
+
+        if max_age is not None:
+            ttl = max_age
+
+        path = self.path(addr, endpoint)
+        try:
+            fetched = os.path.getmtime(path)
+            if time.time() - fetched > ttl:
+                return None
+
+            f = open(path, "rb")
+
+            # Record the use of the response for LRU eviction.
+            os.utime(path, (time.time(), fetched))
+        except (IOError, OSError):
+            return None
+
+        return f
+
+    def get(self, addr, endpoint, max_age=None):
+        """
+        Returns the body of the cached response of `endpoint` at `addr`
+        (see `open()`), or None if there is no fresh response.
+        """
+        f = self.open(addr, endpoint, max_age)
+        if f is None:
+            return None
+
+        with f:
+            try:
+                return f.read()
+            except IOError:
+                return None
+
+    def create(self, addr, endpoint):
+        """
+        Returns a `CacheEntry` to write the response of `endpoint` at
+        `addr` to, or None if the response can not (or should not) be
+        cached.
+        """
+        if self.directory is None or self.ttl(endpoint) is None:
+            return None
+
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            return CacheEntry(self, self.path(addr, endpoint))
+        except (IOError, OSError):
+            return None
+
+    def put(self, addr, endpoint, body):
+        """
+        Caches `body` as the response of `endpoint` at `addr` if the
+        responses of `endpoint` are cached at all. The cache is only an
+        optimization, so failures to write to it are silently ignored.
+        """
+        entry = self.create(addr, endpoint)
+        if entry is not None:
+            entry.write(body)
+            entry.commit()
+
+    def tee(self, addr, endpoint, stream):
+        """
+        Returns a file-like object reading from `stream` that caches the
+        data read as the response of `endpoint` at `addr` once `stream`
+        has been read completely (and the object is closed).
+        """
+        entry = self.create(addr, endpoint)
+        if entry is None:
+            return stream
+
+        return Tee(stream, entry)
+
+    def evict(self):
+        """
+        Removes the least recently used responses until
+        the cache is no larger than its maximum size.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, name))
+            total += stat.st_size
+
+        entries.sort()
+        for atime, size, name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
+class CacheEntry(object):
+    """
+    A response being written to the cache. The response is written to a
+    temporary file and only renamed into place when committed, so that
+    concurrent invocations never read a partial response.
+    """
+
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = path
+        self.temp_path = "%s.%d.tmp" % (path, os.getpid())
+        self.file = open(self.temp_path, "wb")
+        self.failed = False
+
+    def write(self, data):
+        if self.failed:
+            return
+        try:
+            self.file.write(data)
+        except (IOError, OSError):
+            self.failed = True
+
+    def commit(self):
+        try:
+            self.file.close()
+            if self.failed:
+                os.remove(self.temp_path)
+                return
+            os.rename(self.temp_path, self.path)
+            self.cache.evict()
+        except (IOError, OSError):
+            pass
+
+    def discard(self):
+        try:
+            self.file.close()
+            os.remove(self.temp_path)
+        except (IOError, OSError):
+            pass
+
+
+class Tee(object):
+    """
+    A file-like object that reads from a stream and writes everything it
+    reads to a `CacheEntry`. The entry is committed when the stream has
+    been read completely and discarded otherwise.
+    """
+
+    def __init__(self, stream, entry):
+        self.stream = stream
+        self.entry = entry
+        self.complete = False
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.entry.write(data)
+        else:
+            self.complete = True
+        return data
+
+    def close(self):
+        self.stream.close()
+        if self.complete:
+            self.entry.commit()
+        else:
+            self.entry.discard()
@@ -0,0 +1,294 @@
+"""
+Commands showing the resource usage of containers on the local agent
+(e.g. `container stats`) read it straight from the kernel instead of
+entering the namespaces of every container and running `top` in it. The
+Mesos containerizer (like Docker) puts each container into its own
+cgroups, whose accounting files hold the CPU time, memory and block I/O
+used by all processes of the container, and '/proc/<pid>/stat' holds the
+usage of each of those processes.
+
+A `Sampler` reads these files for the container of a given process and
+returns its statistics using the same names as the '/monitor/statistics'
+endpoint of an agent wherever possible (e.g. 'cpus_user_time_secs').
+Usage rates, like the number of CPUs used, are computed from two
+consecutive samples with `cpu_usage()` and `rate()`. Both cgroups v1 and
+the unified hierarchy of cgroups v2 are supported.
+"""
+
+import os
+import time
+
+PROC_DIR = "/proc"
+CGROUP_DIR = "/sys/fs/cgroup"
+
+# The clock ticks per second used by '/proc/<pid>/stat' and 'cpuacct.stat'
+# and the size of a memory page.
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+# Memory limits at least this large mean that there is no limit.
+UNLIMITED = 2 ** 62
+
+
+def read_file(path):
+    """
+    Returns the contents of the file at `path`, or None if it cannot be
+    read (e.g., because the controller is not mounted).
+    """
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def read_keys(path):
+    """
+    Returns the 'key value' lines of the file at `path` (e.g.,
+    'memory.stat') as a dictionary of integers, or None.
+    """
+    text = read_file(path)
+    if text is None:
+        return None
+
+    result = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].isdigit():
+            result[fields[0]] = int(fields[1])
+
+    return result
+
+
+def cpu_usage(previous, current):
+    """
+    Returns the number of CPUs used between the samples `previous` and
+    `current` (e.g., 0.5 for half a CPU), or None if it is not known.
+    """
+    if previous is None:
+        return None
+
+    try:
+        elapsed = current['timestamp'] - previous['timestamp']
+        used = (current['cpus_user_time_secs'] +
+                current['cpus_system_time_secs'] -
+                previous['cpus_user_time_secs'] -
+                previous['cpus_system_time_secs'])
+    except KeyError:
+        return None
+
+    if elapsed <= 0:
+        return None
+
+    return max(0.0, used / float(elapsed))
+
+
+def rate(previous, current, key):
+    """
+    Returns the change per second of the counter `key` between the
+    samples `previous` and `current`, or None if it is not known.
+    """
+    if previous is None or key not in previous or key not in current:
+        return None
+
+    elapsed = current['timestamp'] - previous['timestamp']
+    if elapsed <= 0:
+        return None
+
+    return max(0.0, (current[key] - previous[key]) / float(elapsed))
+
+
+class Sampler(object):
+    """
+    Samples the resource usage of containers from the '/proc' file system
+    at `proc` and the cgroup file systems mounted below `cgroup`.
+    """
+
+    def __init__(self, proc=PROC_DIR, cgroup=CGROUP_DIR):
+        self.proc = proc
+        self.cgroup = cgroup
+
+        # The cgroup directories of every running process sampled so far.
+        # The cgroups of a container never change while it is running.
+        self._cgroups = {}
+
+    def cgroups(self, pid):
+        """
+        Returns a dictionary mapping each controller (e.g. 'cpuacct') to
+        the directory of the cgroup of process `pid`. The controllers of
+        the unified hierarchy of cgroups v2 are mapped by the empty string.
+        Raises an `IOError` if there is no such process.
+        """
+        # A process that exits (e.g., because its container was
+        # destroyed) is forgotten, so `sample()` raises an `IOError`.
+        if pid in self._cgroups:
+            if os.path.isdir(os.path.join(self.proc, str(pid))):
+                return self._cgroups[pid]
+            del self._cgroups[pid]
+
+        with open(os.path.join(self.proc, str(pid), "cgroup")) as f:
+            lines = f.read().splitlines()
+
+        result = {}
+        for line in lines:
+            fields = line.split(":", 2)
+            if len(fields) != 3:
+                continue
+
+            path = fields[2].lstrip("/")
+            if fields[1] == "":
+                result[""] = os.path.join(self.cgroup, path)
+                continue
+
+            # Controllers mounted together (e.g. 'cpu,cpuacct') are
+            # usually also linked under each of their own names.
+            controllers = fields[1].split(",")
+            for name in [fields[1]] + controllers:
+                directory = os.path.join(self.cgroup, name, path)
+                if os.path.isdir(directory):
+                    for controller in controllers:
+                        result[controller] = directory
+                    break
+
+        self._cgroups[pid] = result
+        return result
+
+    def _sample_cpu(self, cgroups, statistics):
+        if "cpuacct" in cgroups:
+            ticks = read_keys(os.path.join(cgroups["cpuacct"], "cpuacct.stat"))
+            if ticks is not None and "user" in ticks and "system" in ticks:
+                statistics['cpus_user_time_secs'] = (
+                    ticks["user"] / float(CLOCK_TICKS))
+                statistics['cpus_system_time_secs'] = (
+                    ticks["system"] / float(CLOCK_TICKS))
+            return
+
+        if "" in cgroups:
+            usage = read_keys(os.path.join(cgroups[""], "cpu.stat"))
+            if (usage is not None and "user_usec" in usage and
+                    "system_usec" in usage):
+                statistics['cpus_user_time_secs'] = usage["user_usec"] / 1e6
+                statistics['cpus_system_time_secs'] = (
+                    usage["system_usec"] / 1e6)
+
+    def _sample_memory(self, cgroups, statistics):
+        if "memory" in cgroups:
+            directory = cgroups["memory"]
+            memory = read_keys(os.path.join(directory, "memory.stat")) or {}
+            rss = memory.get("total_rss", memory.get("rss"))
+            limit = read_file(os.path.join(directory, "memory.limit_in_bytes"))
+        elif "" in cgroups:
+            memory = read_keys(os.path.join(cgroups[""], "memory.stat")) or {}
+            rss = memory.get("anon")
+            limit = read_file(os.path.join(cgroups[""], "memory.max"))
+        else:
+            return
+
+        if rss is not None:
+            statistics['mem_rss_bytes'] = rss
+        # An unlimited cgroup has a limit of 'max' (v2) or of the
+        # largest page aligned 64 bit integer (v1).
+        if (limit is not None and limit.strip().isdigit() and
+                int(limit) < UNLIMITED):
+            statistics['mem_limit_bytes'] = int(limit)
+
+    def _sample_io(self, cgroups, statistics):
+        read = 0
+        written = 0
+        if "blkio" in cgroups:
+            text = read_file(os.path.join(
+                cgroups["blkio"], "blkio.throttle.io_service_bytes"))
+            if text is None:
+                return
+            for line in text.splitlines():
+                fields = line.split()
+                if len(fields) != 3 or not fields[2].isdigit():
+                    continue
+                if fields[1] == "Read":
+                    read += int(fields[2])
+                elif fields[1] == "Write":
+                    written += int(fields[2])
+        elif "" in cgroups:
+            text = read_file(os.path.join(cgroups[""], "io.stat"))
+            if text is None:
+                return
+            for line in text.splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes" and value.isdigit():
+                        read += int(value)
+                    elif key == "wbytes" and value.isdigit():
+                        written += int(value)
+        else:
+            return
+
+        statistics['io_read_bytes'] = read
+        statistics['io_write_bytes'] = written
+
+    def process(self, pid):
+        """
+        Returns the statistics of the process `pid` from '/proc/<pid>/stat'
+        (its 'command', 'state', 'threads', 'cpu_time_secs' and
+        'rss_bytes'), or None if there is no such process.
+        """
+        text = read_file(os.path.join(self.proc, str(pid), "stat"))
+        if text is None:
+            return None
+
+        # The command is enclosed in parentheses and may contain
+        # spaces and parentheses itself.
+        start = text.find("(")
+        end = text.rfind(")")
+        fields = text[end + 2:].split()
+        if start == -1 or end == -1 or len(fields) < 22:
+            return None
+
+        return {
+            'command' : text[start + 1:end],
+            'state' : fields[0],
+            'threads' : int(fields[17]),
+            'cpu_time_secs' : (
+                (int(fields[11]) + int(fields[12])) / float(CLOCK_TICKS)),
+            'rss_bytes' : int(fields[21]) * PAGE_SIZE
+        }
+
+    def processes(self, cgroups):
+        """
+        Returns a dictionary mapping the ID of every process in `cgroups`
+        to its statistics (see `process()`).
+        """
+        path = None
+        for controller in ["cpuacct", "memory", ""]:
+            if controller in cgroups:
+                path = os.path.join(cgroups[controller], "cgroup.procs")
+                break
+
+        text = read_file(path) if path is not None else None
+        if text is None:
+            return {}
+
+        result = {}
+        for line in text.split():
+            # Processes may exit while we are going through them.
+            statistics = self.process(int(line))
+            if statistics is not None:
+                result[int(line)] = statistics
+
+        return result
+
+    def sample(self, pid):
+        """
+        Returns the statistics of the container of process `pid`. Only the
+        statistics of mounted controllers are included, along with the
+        'timestamp' of the sample and the 'processes' of the container.
+        Raises an `IOError` if there is no such process.
+        """
+        cgroups = self.cgroups(pid)
+
+        statistics = {'timestamp' : time.time()}
+        self._sample_cpu(cgroups, statistics)
+        self._sample_memory(cgroups, statistics)
+        self._sample_io(cgroups, statistics)
+        statistics['processes'] = self.processes(cgroups)
+
+        return statistics
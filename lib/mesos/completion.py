@@ -0,0 +1,37 @@
+"""
+Autocompletion runs on every tab press, so it is answered directly from
+the completion index kept in the plugin manifest (see
+`mesos.manifest.completion()`) without importing any plugins or docopt.
+"""
+
+from mesos.util import completions
+
+
+def complete(index, current_word, argv):
+    """
+    Perform autocomplete for the given input arguments using the
+    completion index `index`. Returns a tuple of a valid autocomplete
+    option and the list of completion words.
+    """
+    option = "default"
+
+    if len(argv) > 0 and argv[0] == "help":
+        argv = argv[1:]
+
+    # <command>
+    comp_words = list(index.keys()) + ["help"]
+    comp_words = completions(comp_words, current_word, argv)
+    if comp_words != None:
+        return (option, comp_words)
+
+    commands = index.get(argv[0], {})
+    argv = argv[1:]
+
+    # <subcommand>
+    comp_words = list(commands.keys())
+    comp_words = completions(comp_words, current_word, argv)
+    if comp_words != None:
+        return (option, comp_words)
+
+    # [options]
+    return (option, commands.get(argv[0], []))
@@ -0,0 +1,44 @@
+"""
+Container subcommands identify containers by a prefix of their ID, which
+is resolved against the '/containers' endpoint of an agent. Instead of
+scanning the whole list once for every prefix, a `ContainerIndex` keeps
+the IDs of all containers sorted, so the containers matching a prefix are
+found with a binary search. An index is built from a single response of
+'/containers' and can resolve any number of prefixes.
+"""
+
+import bisect
+
+
+class ContainerIndex(object):
+    """
+    A prefix index of the `containers` listed by the '/containers'
+    endpoint of an agent.
+    """
+
+    def __init__(self, containers):
+        self.containers = {}
+        for container in containers:
+            self.containers[container["container_id"]] = container
+
+        self.ids = sorted(self.containers.keys())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def matches(self, prefix):
+        """
+        Returns the containers whose ID starts with `prefix`, ordered by
+        ID. A complete ID only matches its own container, even if it is
+        also a prefix of other IDs.
+        """
+        if prefix in self.containers:
+            return [self.containers[prefix]]
+
+        result = []
+        index = bisect.bisect_left(self.ids, prefix)
+        while index < len(self.ids) and self.ids[index].startswith(prefix):
+            result.append(self.containers[self.ids[index]])
+            index += 1
+
+        return result
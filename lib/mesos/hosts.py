@@ -0,0 +1,190 @@
+"""
+Commands that act on an agent (e.g. `container ps`) run locally if the
+agent runs on this host and over ssh otherwise. Deciding which is the
+case needs the addresses of the local network interfaces. Instead of
+running (and parsing the output of) `ifconfig`, which is slow and not
+installed everywhere, `LocalAddresses` reads them from the routing
+tables of the kernel in '/proc/net': the local IPv4 routes in 'fib_trie'
+and the IPv6 addresses in 'if_inet6'. Hostnames are resolved and are
+local if any of their addresses is.
+
+Both the addresses and the decisions for each host are cached for a few
+seconds, so repeated decisions do not read '/proc' (or query the
+resolver) again.
+"""
+
+import socket
+import struct
+import time
+
+PROC_DIR = "/proc"
+
+# The number of seconds local addresses and decisions are cached for.
+TTL = 10
+
+
+def split_host(addr):
+    """
+    Returns the host of an address like 'host:port', '[::1]:port', 'host'
+    or '::1'.
+    """
+    if addr.startswith("["):
+        return addr[1:addr.find("]")]
+    if addr.count(":") == 1:
+        return addr.split(":")[0]
+    return addr
+
+
+def normalize(host):
+    """
+    Returns the canonical form of `host` if it is an IP address
+    (e.g. '::1' for '0:0::1'), or None if it is not.
+    """
+    for family in [socket.AF_INET, socket.AF_INET6]:
+        try:
+            return socket.inet_ntop(family, socket.inet_pton(family, host))
+        except (socket.error, ValueError):
+            pass
+
+    return None
+
+
+def ipv4_number(address):
+    return struct.unpack("!I", socket.inet_aton(address))[0]
+
+
+class LocalAddresses(object):
+    """
+    The addresses of the local network interfaces, as listed in the
+    '/proc' file system at `proc`, cached for `ttl` seconds.
+    """
+
+    def __init__(self, proc=PROC_DIR, ttl=TTL):
+        self.proc = proc
+        self.ttl = ttl
+
+        self._addresses = None
+        self._networks = None
+        self._read = None
+        self._hosts = {}
+
+    def _read_file(self, name):
+        try:
+            with open("%s/net/%s" % (self.proc, name)) as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _read_ipv4(self, addresses, networks):
+        """
+        Adds the addresses (and networks, like 127.0.0.0/8) that are
+        routed to this host according to the 'fib_trie' of the kernel.
+        Its leaves are listed as '|-- <address>' followed by a line for
+        each route, e.g. '/32 host LOCAL' for the address of a local
+        interface.
+        """
+        text = self._read_file("fib_trie")
+        if text is None:
+            return False
+
+        address = None
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("|-- "):
+                address = line[4:]
+            elif address is not None and line.endswith(" host LOCAL"):
+                length = int(line.split()[0][1:])
+                if length == 32:
+                    addresses.add(address)
+                else:
+                    mask = (0xffffffff << (32 - length)) & 0xffffffff
+                    networks.add((ipv4_number(address) & mask, mask))
+
+        return True
+
+    def _read_ipv6(self, addresses):
+        """
+        Adds the addresses listed in 'if_inet6', one per line starting
+        with the address as 32 hex digits.
+        """
+        text = self._read_file("if_inet6")
+        if text is None:
+            return
+
+        for line in text.splitlines():
+            fields = line.split()
+            if fields and len(fields[0]) == 32:
+                address = ":".join(fields[0][i:i + 4]
+                                   for i in range(0, 32, 4))
+                addresses.add(normalize(address))
+
+    def addresses(self):
+        """
+        Returns a tuple of the set of local addresses and the set of
+        local IPv4 networks (as (network, netmask) tuples of integers).
+        """
+        now = time.time()
+        if self._read is not None and now - self._read <= self.ttl:
+            return (self._addresses, self._networks)
+
+        addresses = set()
+        networks = set()
+        if not self._read_ipv4(addresses, networks):
+            # Without '/proc' (e.g. on macOS) we fall
+            # back to the addresses of our hostname.
+            addresses.update(["127.0.0.1", "::1"])
+            addresses.update(self.resolve(socket.gethostname()))
+        self._read_ipv6(addresses)
+
+        self._addresses = addresses
+        self._networks = networks
+        self._read = now
+        self._hosts = {}
+        return (addresses, networks)
+
+    def resolve(self, host):
+        """
+        Returns the set of addresses `host` resolves to (which is empty if
+        it cannot be resolved).
+        """
+        try:
+            infos = socket.getaddrinfo(host, None)
+        except (socket.error, UnicodeError):
+            return set()
+
+        # Link local IPv6 addresses carry the interface, e.g. '%eth0'.
+        addresses = set(normalize(info[4][0].split("%")[0])
+                        for info in infos)
+        addresses.discard(None)
+        return addresses
+
+    def _address_is_local(self, address, addresses, networks):
+        if address in addresses:
+            return True
+
+        if ":" not in address:
+            number = ipv4_number(address)
+            for network, mask in networks:
+                if number & mask == network:
+                    return True
+
+        return False
+
+    def is_local(self, host):
+        """
+        Returns whether `host` (an address or a hostname)
+        is an address of this host.
+        """
+        addresses, networks = self.addresses()
+        if host in self._hosts:
+            return self._hosts[host]
+
+        address = normalize(host)
+        if address is not None:
+            local = self._address_is_local(address, addresses, networks)
+        else:
+            local = any(self._address_is_local(address, addresses, networks)
+                        for address in self.resolve(host))
+
+        self._hosts[host] = local
+        return local
@@ -0,0 +1,342 @@
+"""
+A small HTTP client shared by all plugins for talking to masters and
+agents. Connections are kept alive and pooled per address, so commands
+that issue many requests against the same master or agent (e.g. paging
+through a file in a sandbox) only pay for a TCP handshake once. Instead
+of exiting, failures are reported by raising one of the exceptions below;
+`PluginBase.main()` turns them into an error message for the user.
+"""
+
+import httplib
+import json
+import socket
+import threading
+import time
+import zlib
+
+# Default settings of a client. These can be overridden by the
+# corresponding 'HTTP_*' settings in the config (see `Client.from_config()`).
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+RETRIES = 2
+BACKOFF = 0.5
+POOL_SIZE = 8
+
+# The size of the chunks in which streamed responses are read.
+CHUNK_SIZE = 64 * 1024
+
+
+class HTTPException(Exception):
+    """
+    Base class of all errors raised by the client.
+    """
+    def __init__(self, url, message):
+        Exception.__init__(self, message)
+        self.url = url
+
+
+class ConnectionError(HTTPException):
+    """
+    Raised when a connection cannot be established
+    (or is lost) after exhausting all retries.
+    """
+    pass
+
+
+class TimeoutError(ConnectionError):
+    """
+    Raised when connecting or reading times out
+    after exhausting all retries.
+    """
+    pass
+
+
+class HTTPError(HTTPException):
+    """
+    Raised when the server responds with a non 2xx status code.
+    """
+    def __init__(self, url, code, reason, body):
+        HTTPException.__init__(
+            self, url, "Request to %s failed: %d %s" % (url, code, reason))
+        self.code = code
+        self.reason = reason
+        self.body = body
+
+
+def decode(encoding, body):
+    """
+    Decompresses a response `body` sent with the content `encoding`.
+    """
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate streams without a zlib header.
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+
+    return body
+
+
+def connection_error(url, addr, error):
+    """
+    Returns the exception to raise for a socket or protocol `error`.
+    """
+    if isinstance(error, socket.timeout):
+        return TimeoutError(url, "Timed out talking to %s" % addr)
+
+    return ConnectionError(
+        url, "Cannot establish connection with %s: %s" % (addr, error))
+
+
+class Response(object):
+    """
+    The body of a streamed response. Reading it decompresses the body
+    incrementally, so only a chunk of it is held in memory at a time.
+    """
+
+    def __init__(self, client, addr, endpoint, connection, response):
+        self.client = client
+        self.addr = addr
+        self.url = "http://" + addr + endpoint
+
+        self._connection = connection
+        self._response = response
+        self._buffer = ""
+        self._done = False
+        self._closed = False
+
+        self._decompressor = None
+        encoding = response.getheader("content-encoding")
+        if encoding == "gzip":
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._decompressor = zlib.decompressobj()
+
+    def read(self, size=CHUNK_SIZE):
+        """
+        Returns up to `size` bytes of the body (or the next chunk if
+        `size` is negative), or an empty string once the body has been
+        read completely.
+        """
+        while not self._buffer and not self._done:
+            try:
+                data = self._response.read(CHUNK_SIZE)
+            except (socket.error, httplib.HTTPException) as error:
+                self.close()
+                raise connection_error(self.url, self.addr, error)
+
+            if not data:
+                self._done = True
+                if self._decompressor is not None:
+                    self._buffer = self._decompressor.flush()
+            elif self._decompressor is not None:
+                self._buffer = self._decompressor.decompress(data)
+            else:
+                self._buffer = data
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+    def close(self):
+        """
+        Returns the connection to the pool of the client if the body
+        was read completely, or closes it otherwise.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._done:
+            self.client._finish(self.addr, self._connection, self._response)
+        else:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Client(object):
+    """
+    An HTTP client with a pool of persistent connections per address.
+    A client can safely be shared between threads.
+    """
+
+    def __init__(self,
+                 connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT,
+                 retries=RETRIES,
+                 backoff=BACKOFF,
+                 pool_size=POOL_SIZE):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Returns a client using the 'HTTP_*' settings in `config`
+        (falling back to the defaults for any missing settings).
+        """
+        return cls(
+            connect_timeout=getattr(
+                config, "HTTP_CONNECT_TIMEOUT", CONNECT_TIMEOUT),
+            read_timeout=getattr(config, "HTTP_READ_TIMEOUT", READ_TIMEOUT),
+            retries=getattr(config, "HTTP_RETRIES", RETRIES),
+            backoff=getattr(config, "HTTP_BACKOFF", BACKOFF),
+            pool_size=getattr(config, "HTTP_POOL_SIZE", POOL_SIZE))
+
+    def _connect(self, addr):
+        connection = httplib.HTTPConnection(addr, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        return connection
+
+    def _acquire(self, addr):
+        """
+        Returns a tuple of a connection to `addr` and whether
+        the connection was taken from the pool.
+        """
+        with self._lock:
+            pool = self._pools.get(addr)
+            if pool:
+                return (pool.pop(), True)
+
+        return (self._connect(addr), False)
+
+    def _release(self, addr, connection):
+        with self._lock:
+            pool = self._pools.setdefault(addr, [])
+            if len(pool) < self.pool_size:
+                pool.append(connection)
+                return
+
+        connection.close()
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+        with self._lock:
+            pools = self._pools
+            self._pools = {}
+
+        for pool in pools.values():
+            for connection in pool:
+                connection.close()
+
+    def _send(self, addr, endpoint, headers, stream):
+        """
+        Sends a GET request of `endpoint` to `addr`, retrying failed
+        connections with exponential backoff. Returns a tuple of the
+        connection, the response and its (raw) body, unless `stream` is
+        set, in which case the body is left to be read by the caller.
+        """
+        url = "http://" + addr + endpoint
+
+        request_headers = {"Accept-Encoding" : "gzip, deflate"}
+        if headers is not None:
+            request_headers.update(headers)
+
+        failures = 0
+        while True:
+            connection = None
+            pooled = False
+            try:
+                connection, pooled = self._acquire(addr)
+                connection.request("GET", endpoint, headers=request_headers)
+                response = connection.getresponse()
+                body = None
+                if not stream:
+                    body = response.read()
+            except (socket.error, httplib.HTTPException) as error:
+                if connection is not None:
+                    connection.close()
+
+                # A pooled connection may have been closed by the
+                # other end since it was last used, so we retry on
+                # a fresh connection straight away.
+                if pooled:
+                    continue
+
+                if failures >= self.retries:
+                    raise connection_error(url, addr, error)
+
+                time.sleep(self.backoff * (2 ** failures))
+                failures += 1
+                continue
+
+            return (connection, response, body)
+
+    def _finish(self, addr, connection, response):
+        """
+        Returns the connection of a completely read
+        response to the pool (if it can be reused).
+        """
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(addr, connection)
+
+    def request(self, addr, endpoint, headers=None):
+        """
+        Performs a GET request of `endpoint` against `addr` (a host:port
+        string) and returns the (decompressed) body of the response.
+        Failed connections are retried with exponential backoff.
+        """
+        connection, response, body = self._send(
+            addr, endpoint, headers, False)
+        self._finish(addr, connection, response)
+
+        body = decode(response.getheader("content-encoding"), body)
+
+        if response.status < 200 or response.status >= 300:
+            raise HTTPError("http://" + addr + endpoint,
+                            response.status, response.reason, body)
+
+        return body
+
+    def stream(self, addr, endpoint, headers=None):
+        """
+        Performs a GET request of `endpoint` against `addr` and returns
+        the body of the response as a `Response` to be read (and
+        decompressed) incrementally. The caller must close it.
+        """
+        connection, response, body = self._send(
+            addr, endpoint, headers, True)
+
+        if response.status < 200 or response.status >= 300:
+            try:
+                body = response.read()
+            except (socket.error, httplib.HTTPException) as error:
+                connection.close()
+                raise connection_error(
+                    "http://" + addr + endpoint, addr, error)
+            self._finish(addr, connection, response)
+            raise HTTPError("http://" + addr + endpoint,
+                            response.status, response.reason,
+                            decode(response.getheader("content-encoding"),
+                                   body))
+
+        return Response(self, addr, endpoint, connection, response)
+
+    def get_json(self, addr, endpoint):
+        """
+        Performs a GET request of `endpoint` against `addr`
+        and returns the parsed json results.
+        """
+        return json.loads(self.request(addr, endpoint).decode("utf-8"))
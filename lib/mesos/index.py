@@ -0,0 +1,248 @@
+"""
+Commands that read files from a sandbox (e.g. `cluster cat` or `container
+logs`) need to know which agent runs a task and where its sandbox is on
+that agent. Finding out requires the '/state' of the master and of the
+agent, which can be hundreds of megabytes on a large cluster. Since the
+sandbox of a task (or container) never moves, we remember every task,
+agent and sandbox seen in such a '/state' in a SQLite database under
+`config.CACHE_DIR`, so later lookups are answered with an indexed query.
+
+Whenever a lookup misses (or the sandbox it returns no longer exists),
+commands fall back to the '/state' of the master or agent and record
+everything in it, which refreshes the index incrementally. Entries that
+have not been seen for `MAX_AGE` seconds are pruned.
+"""
+
+import os
+import sqlite3
+import time
+
+INDEX_FILE = "sandboxes.db"
+
+# The default number of seconds after which entries that have not been
+# seen again are pruned. This can be overridden by 'INDEX_MAX_AGE' in
+# the config (see `SandboxIndex.from_config()`).
+MAX_AGE = 7 * 24 * 60 * 60
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS agents (
+         id TEXT PRIMARY KEY,
+         addr TEXT NOT NULL,
+         updated REAL NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS tasks (
+         framework_id TEXT NOT NULL,
+         id TEXT NOT NULL,
+         agent_id TEXT NOT NULL,
+         executor_id TEXT NOT NULL,
+         updated REAL NOT NULL,
+         PRIMARY KEY (framework_id, id))""",
+    """CREATE TABLE IF NOT EXISTS sandboxes (
+         addr TEXT NOT NULL,
+         directory TEXT NOT NULL,
+         framework_id TEXT NOT NULL,
+         executor_id TEXT NOT NULL,
+         container_id TEXT,
+         active INTEGER NOT NULL,
+         updated REAL NOT NULL,
+         PRIMARY KEY (addr, directory))""",
+    """CREATE INDEX IF NOT EXISTS sandboxes_by_executor
+         ON sandboxes (addr, framework_id, executor_id)""",
+    """CREATE INDEX IF NOT EXISTS sandboxes_by_container
+         ON sandboxes (addr, container_id)"""
+]
+
+
+def task_executor_id(task):
+    """
+    Returns the ID of the executor of `task` (as listed by the master).
+    An executorless task has an empty executor ID in the master but uses
+    the same executor ID as task ID in the agent.
+    """
+    if task['executor_id'] == '':
+        return task['id']
+
+    return task['executor_id']
+
+
+class SandboxIndex(object):
+    """
+    An index of the agents and sandbox directories of tasks and
+    containers, stored in the SQLite database at `path`. The index is
+    only an optimization: if the database cannot be used, the index
+    is kept in memory (and is thus empty on every invocation).
+    """
+
+    def __init__(self, path, max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._db = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Returns the index in `config.CACHE_DIR`
+        using the 'INDEX_MAX_AGE' setting in `config`.
+        """
+        path = None
+        directory = getattr(config, "CACHE_DIR", None)
+        if directory is not None:
+            path = os.path.join(directory, INDEX_FILE)
+
+        return cls(path, max_age=getattr(config, "INDEX_MAX_AGE", MAX_AGE))
+
+    def _connect(self, path):
+        db = sqlite3.connect(path, timeout=5)
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.commit()
+        return db
+
+    @property
+    def db(self):
+        if self._db is not None:
+            return self._db
+
+        if self.path is not None:
+            try:
+                directory = os.path.dirname(self.path)
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._db = self._connect(self.path)
+                return self._db
+            except (sqlite3.Error, IOError, OSError):
+                pass
+
+        self._db = self._connect(":memory:")
+        return self._db
+
+    def _query(self, query, args):
+        try:
+            return self.db.execute(query, args).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _update(self, statements):
+        """
+        Executes the (statement, rows) tuples in `statements`
+        in a single transaction and prunes stale entries.
+        """
+        cutoff = time.time() - self.max_age
+        try:
+            with self.db:
+                for statement, rows in statements:
+                    self.db.executemany(statement, rows)
+                for table in ["agents", "tasks", "sandboxes"]:
+                    self.db.execute(
+                        "DELETE FROM %s WHERE updated < ?" % table,
+                        (cutoff,))
+        except sqlite3.Error:
+            pass
+
+    def add_master_state(self, state):
+        """
+        Records the agents and tasks in the '/state' of a master. Only
+        the 'id' and 'pid' of agents and the 'id', 'framework_id',
+        'executor_id' and 'slave_id' of tasks are needed.
+        """
+        now = time.time()
+        agents = [(agent['id'], agent['pid'].split('@')[1], now)
+                  for agent in state.get('slaves', [])]
+
+        tasks = []
+        for framework in (state.get('frameworks', []) +
+                          state.get('completed_frameworks', [])):
+            for task in (framework.get('tasks', []) +
+                         framework.get('completed_tasks', [])):
+                tasks.append((task['framework_id'], task['id'],
+                              task['slave_id'], task_executor_id(task), now))
+
+        self._update([
+            ("INSERT OR REPLACE INTO agents VALUES (?, ?, ?)", agents),
+            ("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)", tasks)
+        ])
+
+    def add_agent_state(self, addr, state):
+        """
+        Records the sandboxes in the '/state' of the agent at `addr`.
+        Only the 'id' of frameworks and the 'id', 'container' and
+        'directory' of executors are needed.
+        """
+        now = time.time()
+        sandboxes = []
+        for framework in (state.get('frameworks', []) +
+                          state.get('completed_frameworks', [])):
+            # Active executors are recorded last, so they replace
+            # completed runs of the same executor.
+            for executors, active in [('completed_executors', 0),
+                                      ('executors', 1)]:
+                for executor in framework.get(executors, []):
+                    sandboxes.append((addr, executor['directory'],
+                                      framework['id'], executor['id'],
+                                      executor.get('container'), active,
+                                      now))
+
+        self._update([
+            ("INSERT OR REPLACE INTO sandboxes VALUES (?, ?, ?, ?, ?, ?, ?)",
+             sandboxes)
+        ])
+
+    def remove(self, addr, directory):
+        """
+        Forgets the sandbox at `directory` on the agent at `addr`
+        (e.g., because it has been garbage collected).
+        """
+        self._update([
+            ("DELETE FROM sandboxes WHERE addr = ? AND directory = ?",
+             [(addr, directory)])
+        ])
+
+    def task(self, framework_id, task_id):
+        """
+        Returns a tuple of the address of the agent running the task
+        `task_id` of `framework_id` and the ID of its executor,
+        or None if the task is not in the index.
+        """
+        rows = self._query(
+            "SELECT agents.addr, tasks.executor_id FROM tasks"
+            " JOIN agents ON tasks.agent_id = agents.id"
+            " WHERE tasks.framework_id = ? AND tasks.id = ?",
+            (framework_id, task_id))
+
+        if not rows:
+            return None
+
+        return rows[0]
+
+    def executor(self, addr, framework_id, executor_id):
+        """
+        Returns the sandbox directory of the (latest run of the) executor
+        `executor_id` of `framework_id` on the agent at `addr`, or None
+        if it is not in the index.
+        """
+        rows = self._query(
+            "SELECT directory FROM sandboxes"
+            " WHERE addr = ? AND framework_id = ? AND executor_id = ?"
+            " ORDER BY active DESC, updated DESC LIMIT 1",
+            (addr, framework_id, executor_id))
+
+        if not rows:
+            return None
+
+        return rows[0][0]
+
+    def container(self, addr, prefix):
+        """
+        Returns the sandbox directory of the active container on the
+        agent at `addr` whose ID starts with `prefix`, or None if there
+        is no such container in the index (or more than one).
+        """
+        rows = self._query(
+            "SELECT directory FROM sandboxes"
+            " WHERE addr = ? AND container_id >= ? AND container_id < ?"
+            " AND active = 1 LIMIT 2",
+            (addr, prefix, prefix + u"\uffff"))
+
+        if len(rows) != 1:
+            return None
+
+        return rows[0][0]
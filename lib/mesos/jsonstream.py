@@ -0,0 +1,242 @@
+"""
+Parsing the response of an endpoint like the '/state' of a large master
+with `json.loads()` requires the whole raw body, its decoded text and the
+resulting objects to be in memory at once, even though most commands only
+need a handful of fields out of it. Instead, `load()` parses a json
+document incrementally from a stream and only materializes the fields
+selected by a projection, skipping over everything else.
+
+A projection mirrors the structure of the document:
+
+  - `True` keeps a value as a whole.
+  - A dictionary keeps only the listed fields of an object,
+    each projected by its own projection.
+  - A list with a single projection keeps every element of an array,
+    each projected by that projection.
+
+For example, the following keeps the id and the name of every task of
+every framework in the '/state' of a master:
+
+  {"frameworks" : [{"tasks" : [{"id" : True, "name" : True}]}]}
+
+Scalars are always kept, and objects or arrays that do not match the
+shape of their projection are skipped (and parsed as None).
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# The types of decoded numbers, and the characters that may continue a
+# number (so a number followed by one of them has not been read fully).
+NUMBER_TYPES = (int, long, float)
+NUMBER_CHARS = "0123456789.eE+-"
+
+# Matches everything up to the next bracket, skipping over complete
+# strings (which may contain brackets themselves).
+SKIP = re.compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+
+
+class Parser(object):
+    """
+    An incremental json parser reading from a file-like `stream`.
+    Only the unparsed remainder of the current chunk of the stream
+    (and any value being kept) is held in memory.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        """
+        Drops the parsed part of the buffer and appends the next chunk
+        of the stream to it. Values that span several chunks are read in
+        growing chunks to keep re-parsing them cheap. Returns False once
+        the end of the stream has been reached.
+        """
+        if self.eof:
+            return False
+
+        remaining = len(self.buffer) - self.pos
+        data = self.stream.read(max(self.chunk_size, remaining))
+        if not data:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips any whitespace and returns the next character
+        (or an empty string at the end of the stream).
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def error(self, message):
+        return ValueError("%s at '%s'" % (
+            message, self.buffer[self.pos:self.pos + 20]))
+
+    def next(self, expected):
+        """
+        Consumes the next character, which must be one of `expected`.
+        """
+        char = self.peek()
+        if char == "" or char not in expected:
+            raise self.error("Expected one of '%s'" % expected)
+        self.pos += 1
+        return char
+
+    def capture(self):
+        """
+        Parses the next value as a whole.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+                # A number at the end of the buffer may continue in the
+                # next chunk, even if only part of it was decoded (e.g.
+                # '12' out of a buffer ending with '12.' or '1.5e').
+                if (self.eof or not isinstance(value, NUMBER_TYPES) or
+                        (end < len(self.buffer) and
+                         self.buffer[end] not in NUMBER_CHARS)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise self.error("Invalid value")
+
+            self.fill()
+
+    def skip(self):
+        """
+        Skips over the next value without materializing it.
+        """
+        if self.peek() not in "{[":
+            self.capture()
+            return
+
+        depth = 0
+        while True:
+            self.pos = SKIP.match(self.buffer, self.pos).end()
+
+            # We ran out of data, possibly in the middle of a string.
+            if self.pos == len(self.buffer) or self.buffer[self.pos] == '"':
+                if not self.fill():
+                    raise self.error("Unexpected end of stream")
+                continue
+
+            if self.buffer[self.pos] in "{[":
+                depth += 1
+            else:
+                depth -= 1
+            self.pos += 1
+
+            if depth == 0:
+                return
+
+    def string(self):
+        """
+        Parses the next value, which must be a string.
+        """
+        if self.peek() != '"':
+            raise self.error("Expected a string")
+
+        while True:
+            try:
+                value, end = json.decoder.scanstring(
+                    self.buffer, self.pos + 1)
+                self.pos = end
+                return value
+            except ValueError:
+                if not self.fill():
+                    raise self.error("Unterminated string")
+
+    def object(self, projection):
+        result = {}
+        self.next("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return result
+
+        while True:
+            key = self.string()
+            self.next(":")
+            if key in projection:
+                result[key] = self.value(projection[key])
+            else:
+                self.skip()
+
+            if self.next(",}") == "}":
+                return result
+
+    def array(self, projection):
+        result = []
+        self.next("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return result
+
+        while True:
+            result.append(self.value(projection))
+
+            if self.next(",]") == "]":
+                return result
+
+    def value(self, projection=True):
+        """
+        Parses the next value, keeping only what `projection` selects.
+        """
+        char = self.peek()
+        if char == "":
+            raise self.error("Unexpected end of stream")
+
+        if projection is True:
+            return self.capture()
+
+        if isinstance(projection, dict) and char == "{":
+            return self.object(projection)
+
+        if isinstance(projection, list) and char == "[":
+            return self.array(projection[0])
+
+        if char in "{[":
+            self.skip()
+            return None
+
+        return self.capture()
+
+
+def load(stream, projection=True):
+    """
+    Parses the json document read from the file-like `stream`,
+    keeping only the fields selected by `projection`.
+    """
+    return Parser(stream).value(projection)
+
+
+def loads(text, projection=True):
+    """
+    Parses the json document `text`, keeping
+    only the fields selected by `projection`.
+    """
+    parser = Parser(None)
+    parser.buffer = text
+    parser.eof = True
+    return parser.value(projection)
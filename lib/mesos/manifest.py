@@ -0,0 +1,209 @@
+"""
+Every plugin is described by its module level PLUGIN_NAME, PLUGIN_CLASS
+and SHORT_HELP, and by the COMMANDS of its plugin class. Gathering this
+information requires importing the plugin (and all of its dependencies),
+which dominates the startup time of the CLI. To avoid paying this cost on
+every invocation, we cache the description of every plugin in a manifest
+under `config.CACHE_DIR` and only import a plugin again when one of its
+source files (or, for a frozen executable, the executable itself) has
+changed since it was last described.
+"""
+
+import json
+import os
+import sys
+
+from mesos.util import import_module
+
+MANIFEST_VERSION = 2
+
+MANIFEST_FILE = "plugins.json"
+
+
+def signature(plugin_path):
+    """
+    Returns a signature of the source files of the plugin at
+    `plugin_path` that changes whenever a file is modified, added or
+    removed. If the plugin has no source files on disk (e.g., when
+    running as a frozen executable that bundles them), the signature
+    of the executable is returned instead. Returns None if neither
+    can be found.
+    """
+    count = 0
+    newest = 0
+    for root, dirs, files in os.walk(plugin_path):
+        for name in files:
+            # Compiled files are (re)written as a side effect of
+            # importing the plugin, so they must not affect the signature.
+            if not name.endswith(".py"):
+                continue
+            count += 1
+            newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+
+    if count == 0:
+        try:
+            executable = os.stat(sys.executable)
+        except (OSError, TypeError):
+            return None
+        return [os.path.abspath(sys.executable), executable.st_size,
+                executable.st_mtime]
+
+    return [count, newest]
+
+
+def fingerprint(config):
+    """
+    Returns the settings in `config` that may be baked into the
+    description of a plugin (e.g., the default addresses in the flags of
+    its COMMANDS). A change to any of them invalidates the manifest.
+    """
+    settings = {}
+    for key in dir(config):
+        value = getattr(config, key)
+        if key.isupper() and isinstance(value, (basestring, int, float,
+                                                 list, dict)):
+            settings[key] = value
+
+    return json.loads(json.dumps(settings))
+
+
+def describe(plugin_path):
+    """
+    Imports the plugin at `plugin_path` and returns its manifest entry.
+    """
+    plugin = import_module(plugin_path, "plugins")
+    plugin_class = getattr(plugin, plugin.PLUGIN_CLASS)
+
+    return {
+        "path" : os.path.abspath(plugin_path),
+        "PLUGIN_NAME" : plugin.PLUGIN_NAME,
+        "PLUGIN_CLASS" : plugin.PLUGIN_CLASS,
+        "SHORT_HELP" : plugin.SHORT_HELP,
+        "COMMANDS" : json.loads(json.dumps(plugin_class.COMMANDS))
+    }
+
+
+def read(path):
+    """
+    Reads the manifest stored at `path`. Returns an empty
+    manifest if the file is missing or cannot be parsed.
+    """
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if not isinstance(manifest, dict):
+        return {}
+
+    return manifest
+
+
+def write(path, manifest):
+    """
+    Atomically writes `manifest` to `path`. The manifest is only a
+    cache, so failures to write it are silently ignored.
+    """
+    try:
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Write to a temporary file next to the manifest and rename it
+        # into place so that concurrent invocations never see a partially
+        # written manifest.
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "w") as temp:
+            json.dump(manifest, temp)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        pass
+
+
+def completion(entries):
+    """
+    Builds the completion index for the plugins described by `entries`:
+    a dictionary from plugin name to a dictionary from each of its
+    commands to the flags that command accepts.
+    """
+    index = {}
+    for entry in entries:
+        commands = {}
+        for cmd, command in entry["COMMANDS"].items():
+            flags = set(["-h", "--help"])
+            for flag in command.get("flags", {}).keys():
+                # Flags are listed as e.g. "--addr=Addr" or "-h --help".
+                for word in flag.split():
+                    flags.add(word.split("=")[0])
+            commands[cmd] = sorted(flags)
+        index[entry["PLUGIN_NAME"]] = commands
+
+    return index
+
+
+def refresh(config):
+    """
+    Returns the manifest of the plugins in `config.MESOS_CLI_PLUGINS`,
+    regenerating (and caching) the entries of the plugins whose cached
+    entries are stale. Only those plugins are actually imported.
+    """
+    path = os.path.join(config.CACHE_DIR, MANIFEST_FILE)
+    config_fingerprint = fingerprint(config)
+
+    manifest = read(path)
+    if (manifest.get("version") != MANIFEST_VERSION or
+            manifest.get("config") != config_fingerprint):
+        manifest = {}
+
+    cached = manifest.get("plugins", {})
+    plugins = {}
+    stale = False
+
+    for plugin_path in config.MESOS_CLI_PLUGINS:
+        key = os.path.abspath(plugin_path)
+        plugin_signature = signature(plugin_path)
+
+        entry = cached.get(key)
+        if (entry is None or plugin_signature is None or
+                entry.get("signature") != plugin_signature):
+            described = describe(plugin_path)
+            described["signature"] = plugin_signature
+            # A plugin without a signature is described on every run,
+            # but an unchanged entry is never written again.
+            if described != entry:
+                entry = described
+                stale = True
+
+        plugins[key] = entry
+
+    if stale or set(cached.keys()) != set(plugins.keys()):
+        manifest = {
+            "version" : MANIFEST_VERSION,
+            "config" : config_fingerprint,
+            "plugins" : plugins,
+            "completion" : completion(plugins.values())
+        }
+        write(path, manifest)
+
+    return manifest
+
+
+def load(config):
+    """
+    Returns the manifest entries of the plugins in
+    `config.MESOS_CLI_PLUGINS` (in the order of the plugin paths). Each
+    entry is a dictionary holding the "path", "PLUGIN_NAME",
+    "PLUGIN_CLASS", "SHORT_HELP" and "COMMANDS" of a plugin.
+    """
+    plugins = refresh(config)["plugins"]
+    return [plugins[os.path.abspath(plugin_path)]
+            for plugin_path in config.MESOS_CLI_PLUGINS]
+
+
+def completion_index(config):
+    """
+    Returns the completion index (see `completion()`) of the plugins
+    in `config.MESOS_CLI_PLUGINS`.
+    """
+    return refresh(config)["completion"]
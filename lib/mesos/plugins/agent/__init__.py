@@ -1,2 +1 @@
 from .main import *
-import tests
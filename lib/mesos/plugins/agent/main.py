@@ -1,11 +1,10 @@
 import json
 import sys
-import urllib2
 import config
-from socket import error as socket_error
 
 import mesos
 
+from mesos.http import HTTPError
 from mesos.plugins import PluginBase
 
 PLUGIN_CLASS = "Agent"
@@ -35,7 +34,11 @@ Sends a HTTP healthcheck request and returns the result.
             "arguments" : ["[<field>...]"],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Agent [Default: "+config.AGENT_IP+"]"
+                "IP and Port of Agent [Default: "+config.AGENT_IP+"]",
+                "--no-cache" :
+                "Do not use cached responses of the agent",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "Get Agent State Informtation",
             "long_help"  :
@@ -60,17 +63,6 @@ Multiple fields can be parsed from the same command. I.e. flags.work_dir id
     def __autocomplete__(self, command, current_word, argv):
         return []
     
-    #Helper to hit the specified endpoint and return json results
-    def hit_endpoint(self,addr,endpoint):
-        try:
-            http_response = ( urllib2.urlopen("http://"+addr+endpoint)
-                                            .read().decode('utf-8') )
-        except socket_error as e:
-            print("Cannot establish connection with Agent")
-            sys.exit(1)
-
-        return json.loads(http_response)
-
     def isInt(self, num):
         try:
             int(num)
@@ -111,18 +103,13 @@ Multiple fields can be parsed from the same command. I.e. flags.work_dir id
         return jsonSub
 
     def ping(self, argv):
-        httpResponseCode = None;
         try:
-            httpResponseCode = ( urllib2.urlopen("http://"+argv["--addr"]
-                                                    +"/health").getcode() )
-        except socket_error as e:
-            print("Cannot establish connection with Agent")
-            sys.exit(1)
-
-        if httpResponseCode == 200 :
-            print("Agent Healthy!")
-        else:
+            self.http.request(argv["--addr"], "/health")
+        except HTTPError:
             print("Agent not healthy!")
+            return
+
+        print("Agent Healthy!")
 
     def state(self,argv):
         stateInfo = self.hit_endpoint(argv["--addr"],"/state")
@@ -1,6 +1,10 @@
+import json
 import sys
 
 import mesos
+import mesos.cache
+import mesos.http
+import mesos.jsonstream
 
 from mesos.docopt import docopt
 
@@ -75,6 +79,13 @@ class PluginBase():
             self.USAGE = getattr(module, "USAGE")
 
         self.config = config
+        self.http = mesos.http.Client.from_config(config)
+        self.cache = mesos.cache.ResponseCache.from_config(config)
+
+        # Overridden by the '--no-cache' and '--max-age' flags of
+        # commands that support them.
+        self.use_cache = True
+        self.max_age = None
 
     def __autocomplete__(self, command, current_word, argv):
         return ("default", [])
@@ -101,6 +112,62 @@ class PluginBase():
 
         return (option, comp_words)
 
+    def hit_endpoint(self, addr, endpoint, fields=None):
+        """
+        Hit the specified endpoint and return the parsed json results.
+        Responses are served from (and stored in) the response cache.
+        If `fields` is given (a projection, see `mesos.jsonstream`), the
+        response is parsed incrementally while it is being received, and
+        only the selected fields are kept in memory.
+        Raises a `mesos.http.HTTPException` on failure.
+        """
+        if fields is None:
+            body = None
+            if self.use_cache:
+                body = self.cache.get(addr, endpoint, self.max_age)
+
+            if body is None:
+                body = self.http.request(addr, endpoint)
+                self.cache.put(addr, endpoint, body)
+
+            return json.loads(body.decode("utf-8"))
+
+        stream = None
+        if self.use_cache:
+            stream = self.cache.open(addr, endpoint, self.max_age)
+
+        if stream is None:
+            stream = self.cache.tee(
+                addr, endpoint, self.http.stream(addr, endpoint))
+
+        try:
+            result = mesos.jsonstream.load(stream, fields)
+
+            # Read any trailing whitespace, so that the response
+            # is cached and its connection can be reused.
+            while stream.read(mesos.jsonstream.CHUNK_SIZE):
+                pass
+        finally:
+            stream.close()
+
+        return result
+
+    def output(self, columns, argv):
+        """
+        Returns a writer (see `mesos.util.record_writer()`) for rows with
+        the given `columns` in the format selected by the '--format' flag
+        of a command. Commands that support it list the flag as:
+
+            "--format=FORMAT" : "Output format: table, json, ndjson or csv
+                                 [Default: table]"
+        """
+        try:
+            return mesos.util.record_writer(
+                argv.get("--format") or "table", columns)
+        except ValueError as error:
+            print >> sys.stderr, str(error)
+            sys.exit(1)
+
     def main(self, argv):
         command_strings = mesos.util.format_commands_help(self.COMMANDS)
 
@@ -139,7 +206,19 @@ class PluginBase():
                     version=self.VERSION,
                     options_first=True)
 
+            if arguments.get("--no-cache"):
+                self.use_cache = False
+            if arguments.get("--max-age") is not None:
+                self.max_age = float(arguments["--max-age"])
+
             self.__setup__(cmd, argv)
-            getattr(self, cmd.replace("-", "_"))(arguments)
+
+            # Failures to talk to a master or agent surface as
+            # exceptions; report them to the user instead of a trace.
+            try:
+                getattr(self, cmd.replace("-", "_"))(arguments)
+            except mesos.http.HTTPException as error:
+                print >> sys.stderr, str(error)
+                sys.exit(1)
         else:
             self.main(["--help"])
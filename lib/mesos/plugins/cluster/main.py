@@ -1,16 +1,21 @@
-import json
+import datetime
+import fnmatch
+import heapq
+import re
 import sys
-import urllib2
 import config
 import os
 import subprocess
 import itertools
-from socket import error as socket_error
+import threading
+import time
 
 import mesos
+import mesos.index
+import mesos.sandbox
 
+from mesos.http import HTTPError, HTTPException
 from mesos.plugins import PluginBase
-from mesos.util import Table
 
 PLUGIN_CLASS = "Cluster"
 PLUGIN_NAME = "cluster"
@@ -19,6 +24,108 @@ VERSION = "Mesos CLI Cluster Plugin 1.0"
 
 SHORT_HELP = "Cluster specific commands for the Mesos CLI"
 
+# The fields of the master's '/state' needed by `ps`
+# (see `mesos.jsonstream` for the format).
+PS_STATE_FIELDS = {
+    "frameworks" : [{
+        "id" : True,
+        "user" : True,
+        "name" : True,
+        "role" : True,
+        "roles" : True,
+        "tasks" : [{
+            "id" : True,
+            "name" : True,
+            "framework_id" : True,
+            "executor_id" : True,
+            "slave_id" : True,
+            "role" : True
+        }]
+    }],
+    "slaves" : [{
+        "id" : True,
+        "hostname" : True,
+        "pid" : True
+    }]
+}
+
+# The fields of the master's '/state-summary' and '/tasks' needed by `ps`
+# when paging through the tasks instead of fetching the whole '/state'.
+PS_SUMMARY_FIELDS = {
+    "frameworks" : [{
+        "id" : True,
+        "name" : True,
+        "role" : True,
+        "roles" : True
+    }],
+    "slaves" : [{
+        "id" : True,
+        "hostname" : True,
+        "pid" : True
+    }]
+}
+PS_TASKS_FIELDS = {
+    "tasks" : [{
+        "id" : True,
+        "name" : True,
+        "framework_id" : True,
+        "executor_id" : True,
+        "slave_id" : True,
+        "state" : True,
+        "user" : True,
+        "role" : True
+    }]
+}
+
+# The keys `ps` can sort by. Numeric keys sort the largest values first.
+PS_SORT_KEYS = ["mem", "cpu", "time", "user", "framework", "task", "agent"]
+PS_NUMERIC_SORT_KEYS = set(["mem", "cpu", "time"])
+
+# The states of tasks that are no longer active.
+TERMINAL_STATES = set([
+    "TASK_FINISHED", "TASK_FAILED", "TASK_KILLED", "TASK_LOST",
+    "TASK_ERROR", "TASK_DROPPED", "TASK_GONE", "TASK_GONE_BY_OPERATOR",
+    "TASK_UNREACHABLE"
+])
+
+# The fields of the master's '/state' needed by `cat`.
+CAT_TASK_FIELDS = {
+    "id" : True,
+    "framework_id" : True,
+    "executor_id" : True,
+    "slave_id" : True
+}
+CAT_FRAMEWORK_FIELDS = {
+    "id" : True,
+    "tasks" : [CAT_TASK_FIELDS],
+    "completed_tasks" : [CAT_TASK_FIELDS]
+}
+CAT_STATE_FIELDS = {
+    "frameworks" : [CAT_FRAMEWORK_FIELDS],
+    "completed_frameworks" : [CAT_FRAMEWORK_FIELDS],
+    "slaves" : [{
+        "id" : True,
+        "pid" : True
+    }]
+}
+
+# The fields of an agent's '/state' needed to find executor directories
+# (and to record them in the sandbox index).
+EXECUTOR_FIELDS = {
+    "id" : True,
+    "container" : True,
+    "directory" : True
+}
+AGENT_FRAMEWORK_FIELDS = {
+    "id" : True,
+    "executors" : [EXECUTOR_FIELDS],
+    "completed_executors" : [EXECUTOR_FIELDS]
+}
+AGENT_STATE_FIELDS = {
+    "frameworks" : [AGENT_FRAMEWORK_FIELDS],
+    "completed_frameworks" : [AGENT_FRAMEWORK_FIELDS]
+}
+
 
 class Cluster(PluginBase):
 
@@ -36,26 +143,205 @@ Arguments and Flag information same as mesos-execute.
             "arguments" : [],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]"
+                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]",
+                "--workers=N" :
+                "Number of agents to query concurrently [Default: 32]",
+                "--timeout=SECS" :
+                "Time to wait for the statistics of an agent [Default: 10]",
+                "--deadline=SECS" :
+                "Time to wait for the statistics of all agents [Default: 60]",
+                "--format=FORMAT" :
+                "Output format: table, json, ndjson or csv [Default: table]",
+                "--page-size=N" :
+                "Page through the master's /tasks instead of its /state",
+                "--user=USER" :
+                "Only show tasks of this user",
+                "--framework=FRAMEWORK" :
+                "Only show tasks of the framework with this ID or name",
+                "--task=REGEX" :
+                "Only show tasks whose ID or name matches this regex",
+                "--agent=AGENT" :
+                "Only show tasks on the agent with this ID, host or address",
+                "--role=ROLE" :
+                "Only show tasks running under this role",
+                "--sort=KEY" :
+                "Sort by mem, cpu, time, user, framework, task or agent",
+                "--limit=K" :
+                "Only show the first K tasks (in the order of --sort)",
+                "--no-cache" :
+                "Do not use cached responses of the master and agents",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "Display info for agents",
             "long_help"  :
 """
 Displays framework and task related statistics regarding the mesos cluster.
 Equivalent to mesos-ps.
+
+Statistics are fetched from all agents concurrently. Tasks on agents
+that fail to respond in time are still listed, without statistics.
+
+With --page-size, tasks are listed N at a time from the master's /tasks
+endpoint (joined with its /state-summary) and the rows of every page
+are shown as soon as it arrives, instead of waiting for the whole
+/state of the master. The USER column then shows the user of each task
+(if it has one), and --user can not be used.
+
+The --user, --framework, --task, --agent and --role filters are applied
+to the tasks listed by the master, so agents without any matching tasks
+are never queried for statistics.
+
+With --sort, tasks are sorted by memory usage, allocated CPUs or CPU
+time (largest first), or by user, framework, task or agent name. With
+--limit as well, only the top K tasks are kept while the rows stream
+in, so memory stays bounded no matter how many tasks there are.
+"""
+        },
+        "top" : {
+            "arguments" : [],
+            "flags" : {
+                "--addr=Addr" :
+                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]",
+                "--interval=SECS" :
+                "Time between refreshes [Default: 2]",
+                "--tasks-interval=SECS" :
+                "Time between refreshes of the task list [Default: 30]",
+                "--iterations=N" :
+                "Exit after N refreshes instead of running until interrupted",
+                "--limit=K" :
+                "Only show the top K tasks [Default: 20]",
+                "--sort=KEY" :
+                "Sort by cpu or mem [Default: cpu]",
+                "--workers=N" :
+                "Number of agents to query concurrently [Default: 32]",
+                "--timeout=SECS" :
+                "Time to wait for the statistics of an agent [Default: 10]",
+                "--user=USER" :
+                "Only show tasks of this user",
+                "--framework=FRAMEWORK" :
+                "Only show tasks of the framework with this ID or name",
+                "--task=REGEX" :
+                "Only show tasks whose ID or name matches this regex",
+                "--agent=AGENT" :
+                "Only show tasks on the agent with this ID, host or address",
+                "--role=ROLE" :
+                "Only show tasks running under this role"
+                },
+            "short_help" : "Display the tasks using the most resources",
+            "long_help"  :
+"""
+Displays the tasks using the most CPU (or memory) in the mesos cluster,
+refreshed every --interval seconds. Similar to top.
+
+CPU usage is the CPU time an executor used since the previous refresh
+divided by the time that passed, as a percentage of one CPU, so the
+first screen is only shown once two samples have been taken.
+
+The tasks are listed by the master's /state, which is only fetched again
+every --tasks-interval seconds. In between, every refresh only queries
+the /monitor/statistics of the agents running tasks that match the
+--user, --framework, --task, --agent and --role filters, concurrently.
+"""
+        },
+        "download" : {
+            "arguments" : ["<framework-ID>", "<task-ID>"],
+            "flags" : {
+                "--addr=Addr" :
+                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]",
+                "--output-dir=DIR" :
+                "Directory to download the sandboxes to [Default: .]",
+                "--include=GLOBS" :
+                "Only download files matching one of these globs",
+                "--exclude=GLOBS" :
+                "Do not download files matching one of these globs",
+                "--regex" :
+                "Match the framework and task IDs as regular expressions",
+                "--workers=N" :
+                "Number of files to download concurrently [Default: 16]",
+                "--no-cache" :
+                "Do not use cached responses of the master and agents",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
+                },
+            "short_help" : "Download the sandboxes of tasks",
+            "long_help"  :
+"""
+Downloads the sandboxes of tasks to DIR/<task-ID>/. The framework and
+task IDs may be glob patterns (or regular expressions with --regex).
+Tasks with the same ID in several frameworks are downloaded to
+DIR/<framework-ID>/<task-ID>/ instead.
+--include and --exclude take comma separated globs which are matched
+against the path of every file relative to its sandbox. Files that are
+already partially downloaded are resumed where they left off.
+"""
+        },
+        "grep" : {
+            "arguments" : ["<pattern>", "<file>"],
+            "flags" : {
+                "--addr=Addr" :
+                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]",
+                "--framework=ID" :
+                "Only search tasks of frameworks matching ID [Default: *]",
+                "--task=ID" :
+                "Only search tasks matching ID [Default: *]",
+                "--ignore-case" :
+                "Ignore case distinctions in the pattern",
+                "--max-count=N" :
+                "Stop reading a file after N matching lines",
+                "--files-with-matches" :
+                "Only print the IDs of tasks whose file matches",
+                "--workers=N" :
+                "Number of sandboxes to search concurrently [Default: 16]",
+                "--no-cache" :
+                "Do not use cached responses of the master and agents",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
+                },
+            "short_help" : "Search a file within many task sandboxes",
+            "long_help"  :
+"""
+Searches a file within the sandboxes of many tasks for lines matching
+a regular expression, printing every matching line prefixed with the
+ID of its task. The framework and task IDs may be glob patterns.
+Files are streamed from the agents concurrently and are not read any
+further once --max-count or --files-with-matches is satisfied.
 """
         },
         "cat" : {
             "arguments" : ["<framework-ID>", "<task-ID>", "<file>"],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]"
+                "IP and Port of Mesos Master [Default: "+config.MASTER_IP+"]",
+                "--regex" :
+                "Match the framework and task IDs as regular expressions",
+                "--output-dir=DIR" :
+                "Write the file of every matching task to DIR/<task-ID>/",
+                "--workers=N" :
+                "Number of sandboxes to read concurrently [Default: 16]",
+                "--follow" :
+                "Keep printing data appended to the file",
+                "--tail=N" :
+                "Only print the last N lines of the file",
+                "--bytes=N" :
+                "Only print the last N bytes of the file",
+                "--no-cache" :
+                "Do not use cached responses of the master and agents",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "Display file within task sandbox",
             "long_help"  :
 """
 Displays contents of a file within a task sandbox.
 Equivalent to mesos-cat
+
+The framework and task IDs may be glob patterns (or regular expressions
+with --regex), e.g. '*' selects every task of a framework. The file is
+then read from all matching sandboxes concurrently and every line is
+prefixed with the ID of its task (or written to --output-dir). Tasks
+with the same ID in several frameworks are written to
+DIR/<framework-ID>/<task-ID>/ instead.
 """
         }
     }
@@ -67,24 +353,27 @@ Equivalent to mesos-cat
     def __autocomplete__(self, command, current_word, argv):
         return []
 
-    #Helper to hit the specified endpoint and return json results
-    def hit_endpoint(self,addr,endpoint):
-        try:
-            http_response = ( urllib2.urlopen("http://"+addr+endpoint)
-                                             .read().decode('utf-8') )
-        except socket_error as e:
-            print("Cannot establish connection with Agent/Master")
-            sys.exit(1)
-
-        return json.loads(http_response)
-
     def execute(self,argv):
         subprocess.call(["mesos-execute"] + argv["<args>"])
 
-    # Helper for formatting the CPU column for a task.
-    def cpus(self, task, statistics):
+    # Helper for indexing the statistics of an agent by framework ID and
+    # executor ID, so that each task can look up its executor in O(1).
+    def index_statistics(self, statistics):
         if statistics is None:
-            return ""
+            return None
+
+        index = {}
+        for entry in statistics:
+            key = (entry['framework_id'], entry['executor_id'])
+            if key not in index:
+                index[key] = entry['statistics']
+
+        return index
+
+    # Helper for looking up the statistics of the executor of a task.
+    def task_statistics(self, task, index):
+        if index is None:
+            return None
 
         framework_id = task['framework_id']
         executor_id = task['executor_id']
@@ -93,84 +382,42 @@ Equivalent to mesos-cat
         if executor_id == '':
             executor_id = task['id']
 
-        cpus_limit = None
-        for entry in statistics:
-            if (entry['framework_id'] == framework_id and
-                entry['executor_id'] == executor_id):
-                cpus_limit = entry['statistics'].get('cpus_limit', None)
-                break
+        return index.get((framework_id, executor_id))
+
+    # Helper for formatting the CPU column for a task.
+    def cpus(self, statistics):
+        if statistics is None:
+            return ""
 
+        cpus_limit = statistics.get('cpus_limit', None)
         if cpus_limit is not None:
             return str(cpus_limit)
 
         return ""
 
     # Helper for formatting the MEM column for a task.
-    def mem(self, task, statistics):
+    def mem(self, statistics):
         if statistics is None:
             return ""
 
-        framework_id = task['framework_id']
-        executor_id = task['executor_id']
-        # An executorless task has an empty executor ID in the master but
-        # uses the same executor ID as task ID in the slave.
-        if executor_id == '':
-            executor_id = task['id']
-
-        mem_rss_bytes = None
-        mem_limit_bytes = None
-        for entry in statistics:
-            if (entry['framework_id'] == framework_id and
-                entry['executor_id'] == executor_id):
-                mem_rss_bytes = entry['statistics'].get('mem_rss_bytes', None)
-                mem_limit_bytes = entry['statistics'].get('mem_limit_bytes'
-                        , None)
-                break
-
+        mem_rss_bytes = statistics.get('mem_rss_bytes', None)
+        mem_limit_bytes = statistics.get('mem_limit_bytes', None)
         if mem_rss_bytes is not None and mem_limit_bytes is not None:
-            MB = 1024.0 * 1024.0
             return ( '{usage}/{limit}'
-                    .format(usage = data_size(mem_rss_bytes, "%.1f"),
-                            limit = data_size(mem_limit_bytes, "%.1f")) )
+                    .format(usage = mesos.util.data_size(mem_rss_bytes,
+                                                         "%.1f"),
+                            limit = mesos.util.data_size(mem_limit_bytes,
+                                                         "%.1f")) )
 
         return ""
 
-    def data_size(self, bytes, format):
-        # Ensure bytes is treated as floating point for the math below.
-        bytes = float(bytes)
-        if bytes < 1024:
-            return (format % bytes) + ' B'
-        elif bytes < (1024 * 1024):
-            return (format % (bytes / 1024)) + ' KB'
-        elif bytes < (1024 * 1024 * 1024):
-            return (format % (bytes / (1024 * 1024))) + ' MB'
-        else:
-            return (format % (bytes / (1024 * 1024 * 1024))) + ' GB'
-
     # Helper for formatting the TIME column for a task.
-    def time(self, task, statistics):
+    def time(self, statistics):
         if statistics is None:
-            return
-
-        framework_id = task['framework_id']
-        executor_id = task['executor_id']
-        # An executorless task has an empty executor ID in the master but
-        # uses the same executor ID as task ID in the slave.
-        if executor_id == '':
-            executor_id = task['id']
-
-        cpus_time_secs = None
-        cpus_system_time_secs = None
-        cpus_user_time_secs = None
-        for entry in statistics:
-            if ( (entry['framework_id'] == framework_id and
-                entry['executor_id'] == executor_id) ):
-                cpus_system_time_secs = ( entry['statistics']
-                        .get('cpus_system_time_secs', None) )
-                cpus_user_time_secs = ( entry['statistics']
-                        .get('cpus_user_time_secs', None) )
-                break
+            return ""
 
+        cpus_system_time_secs = statistics.get('cpus_system_time_secs', None)
+        cpus_user_time_secs = statistics.get('cpus_user_time_secs', None)
         if ( cpus_system_time_secs is not None
                 and cpus_user_time_secs is not None ):
             return (datetime.datetime
@@ -180,126 +427,899 @@ Equivalent to mesos-cat
 
         return ""
 
-    def ps(self,argv):
-        state = self.hit_endpoint(argv["--addr"], "/state")
-        # Collect all the active frameworks and tasks by agent ID.
+    # Helper returning the roles a task runs under.
+    def roles(self, framework, task):
+        if task.get('role'):
+            return [task['role']]
+        if framework.get('roles'):
+            return framework['roles']
+        return [framework.get('role')]
+
+    # Helper returning a function selecting the (user, framework, task,
+    # agent) tuples of `ps` that match the filters given in `argv`.
+    def task_filter(self, argv):
+        pattern = None
+        if argv.get("--task") is not None:
+            pattern = re.compile(argv["--task"])
+
+        def matches(user, framework, task, agent):
+            if argv.get("--user") is not None and user != argv["--user"]:
+                return False
+            if (argv.get("--framework") is not None and
+                    argv["--framework"] not in (framework.get('id'),
+                                                framework.get('name'))):
+                return False
+            if (argv.get("--agent") is not None and
+                    argv["--agent"] not in (agent['id'], agent['hostname'],
+                                            agent['pid'].split('@')[1])):
+                return False
+            if (argv.get("--role") is not None and
+                    argv["--role"] not in self.roles(framework, task)):
+                return False
+            if (pattern is not None and not pattern.search(task['id']) and
+                    not pattern.search(task['name'])):
+                return False
+            return True
+
+        return matches
+
+    # Helper returning a list with the single "page" of all active tasks
+    # in the master's /state that match `matches`, as (user, framework,
+    # task, agent) tuples. Tasks are grouped by agent, in the order the
+    # agents are listed by the master.
+    def state_tasks(self, addr, matches):
+        state = self.hit_endpoint(addr, "/state", PS_STATE_FIELDS)
+
+        agents = {}
         active = {}
+        for agent in state['slaves']:
+            agents[agent['id']] = agent
+            active[agent['id']] = []
+
         for framework in state['frameworks']:
             for task in framework['tasks']:
-                if task['slave_id'] not in active.keys():
-                    active[task['slave_id']] = []
-                active[task['slave_id']].append((framework, task))
+                if task['slave_id'] not in agents:
+                    continue
+                item = (framework['user'], framework, task,
+                        agents[task['slave_id']])
+                if matches(*item):
+                    active[task['slave_id']].append(item)
 
-        table = Table(['USER','FRAMEWORK','TASK','AGENT','MEM','TIME',
-                        'CPU (allocated)'])
+        return [[item for agent in state['slaves']
+                 for item in active[agent['id']]]]
 
-        # Grab all the agents with active tasks.
-        agents = []
-        for agent in state['slaves']:
-            if agent['id'] in active:
-                agents.append(agent)
-        # Go through each agents and create the table
-        # We use helper functions defined above for format help
-        for agent in agents:
-            statistics = self.hit_endpoint(agent["pid"].split("@")[1],
-                                            "/monitor/statistics")
-            if statistics is None:
-                print("Could not get statistics from agent at : "
-                        + agent["pid"].split("@")[1])
-
-            for framework, task in active[agent['id']]:
-                row = [framework['user'], framework['name'], task['name'],
+    # Helper paging through the active tasks in the master's /tasks,
+    # yielding a list of the (user, framework, task, agent) tuples
+    # matching `matches` for every page. Frameworks and agents are
+    # joined from /state-summary.
+    def paged_tasks(self, addr, page_size, matches):
+        summary = self.hit_endpoint(addr, "/state-summary", PS_SUMMARY_FIELDS)
+
+        frameworks = {}
+        for framework in summary['frameworks']:
+            frameworks[framework['id']] = framework
+
+        agents = {}
+        for agent in summary['slaves']:
+            agents[agent['id']] = agent
+
+        offset = 0
+        while True:
+            page = self.hit_endpoint(
+                addr, "/tasks?limit=%d&offset=%d" % (page_size, offset),
+                PS_TASKS_FIELDS)['tasks']
+
+            tasks = []
+            for task in page:
+                if (task.get('state') in TERMINAL_STATES or
+                        task['slave_id'] not in agents):
+                    continue
+                framework = frameworks.get(
+                    task['framework_id'],
+                    {"id" : task['framework_id'], "name" : ""})
+                item = (task.get('user', ''), framework, task,
+                        agents[task['slave_id']])
+                if matches(*item):
+                    tasks.append(item)
+            yield tasks
+
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    # Helper returning a client for fetching the statistics of agents
+    # that gives up on an agent after `timeout` seconds. Failed requests
+    # are not retried, so a dead agent costs no more than the timeout.
+    def statistics_client(self, timeout):
+        return mesos.http.Client(
+            connect_timeout=min(self.http.connect_timeout, timeout),
+            read_timeout=min(self.http.read_timeout, timeout),
+            retries=0)
+
+    # Helper yielding a (row, sort keys) tuple for every task shown by
+    # `ps`, as soon as the statistics of the task's agent are available.
+    def ps_rows(self, argv):
+        # Filter the tasks before fetching any statistics, so that agents
+        # without matching tasks are never contacted.
+        matches = self.task_filter(argv)
+        if argv.get("--page-size") is not None:
+            pages = self.paged_tasks(argv["--addr"], int(argv["--page-size"]),
+                                     matches)
+        else:
+            pages = self.state_tasks(argv["--addr"], matches)
+
+        # Fetch the statistics of all agents concurrently. The time spent
+        # on each agent is bounded by the client's timeouts as well as by
+        # the per agent and overall deadlines given to `fan_out()`.
+        timeout = float(argv["--timeout"])
+        client = self.statistics_client(timeout)
+
+        # The deadline bounds the whole run, however many pages there are.
+        expiry = time.time() + float(argv["--deadline"])
+
+        # The indexed statistics of every agent (or None if they could not
+        # be fetched), so that each agent is only queried once even if its
+        # tasks are spread over many pages.
+        statistics = {}
+
+        def fetch_statistics(agent):
+            if agent['id'] in statistics:
+                return statistics[agent['id']]
+            return self.index_statistics(client.get_json(
+                agent["pid"].split("@")[1], "/monitor/statistics"))
+
+        for tasks in pages:
+            # Collect the tasks of the page by agent.
+            agents = []
+            active = {}
+            for user, framework, task, agent in tasks:
+                if agent['id'] not in active:
+                    agents.append(agent)
+                    active[agent['id']] = []
+                active[agent['id']].append((user, framework, task))
+
+            # Go through each agents and create the table
+            # We use helper functions defined above for format help
+            for agent, index, error in mesos.util.fan_out(
+                    fetch_statistics,
+                    agents,
+                    workers=int(argv["--workers"]),
+                    timeout=timeout,
+                    deadline=max(0, expiry - time.time())):
+                # Agents seen on an earlier page keep their statistics,
+                # even once the deadline has passed.
+                if agent['id'] in statistics:
+                    index = statistics[agent['id']]
+                else:
+                    if error is not None:
+                        print >> sys.stderr, ("Could not get statistics "
+                                "from agent at : " +
+                                agent["pid"].split("@")[1])
+                    statistics[agent['id']] = index
+
+                for user, framework, task in active[agent['id']]:
+                    executor_statistics = self.task_statistics(task, index)
+                    row = [user, framework['name'], task['name'],
                         agent['hostname'],
-                    self.mem(task,statistics), self.time(task, statistics),
-                    self.cpus(task, statistics)]
-                table.add_row(row)
+                        self.mem(executor_statistics),
+                        self.time(executor_statistics),
+                        self.cpus(executor_statistics)]
+                    yield (row, self.sort_keys(row, executor_statistics))
 
-        print (table.to_string())
+    # Helper returning the values of a row of `ps` to sort by. Missing
+    # statistics are None, which sorts after all numbers.
+    def sort_keys(self, row, statistics):
+        keys = {
+            "user" : row[0],
+            "framework" : row[1],
+            "task" : row[2],
+            "agent" : row[3],
+            "mem" : None,
+            "cpu" : None,
+            "time" : None
+        }
+        if statistics is not None:
+            keys["mem"] = statistics.get('mem_rss_bytes')
+            keys["cpu"] = statistics.get('cpus_limit')
+            if ('cpus_user_time_secs' in statistics and
+                    'cpus_system_time_secs' in statistics):
+                keys["time"] = (statistics['cpus_user_time_secs'] +
+                                statistics['cpus_system_time_secs'])
+        return keys
 
-    def read(self, agent, task, file):
-        framework_id = task['framework_id']
-        executor_id = task['executor_id']
-        # An executorless task has an empty executor ID in the master but
-        # uses the same executor ID as task ID in the slave.
-        if executor_id == '':
-            executor_id = task['id']
+    def ps(self,argv):
+        sort = argv.get("--sort")
+        if sort is not None and sort not in PS_SORT_KEYS:
+            print >> sys.stderr, \
+                "Unknown sort key '%s', must be one of: %s" % (
+                    sort, ", ".join(PS_SORT_KEYS))
+            sys.exit(1)
+
+        # The users of frameworks are only listed in the master's /state,
+        # and tasks on /tasks only carry a user if they were given one.
+        if (argv.get("--user") is not None and
+                argv.get("--page-size") is not None):
+            print >> sys.stderr, \
+                "--user can not be used with --page-size, as the users " \
+                "of frameworks are only listed in the master's /state"
+            sys.exit(1)
+
+        limit = None
+        if argv.get("--limit") is not None:
+            limit = int(argv["--limit"])
+
+        table = self.output(['USER','FRAMEWORK','TASK','AGENT','MEM',
+                             'TIME','CPU (allocated)'], argv)
+
+        rows = self.ps_rows(argv)
+        if sort is None:
+            # Stop fetching statistics once enough rows have been shown.
+            rows = itertools.islice(rows, limit)
+        else:
+            key = lambda item: item[1][sort]
+            if sort in PS_NUMERIC_SORT_KEYS:
+                # Tasks without statistics come last.
+                if limit is None:
+                    rows = sorted(rows, key=key, reverse=True)
+                else:
+                    rows = heapq.nlargest(limit, rows, key=key)
+            else:
+                if limit is None:
+                    rows = sorted(rows, key=key)
+                else:
+                    rows = heapq.nsmallest(limit, rows, key=key)
+
+        for row, keys in rows:
+            table.add_row(row)
+
+        table.close()
+
+    # Helper returning the CPU time (in seconds) an executor has used,
+    # or None if its statistics do not include it.
+    def cpu_time(self, statistics):
+        if ('cpus_user_time_secs' not in statistics or
+                'cpus_system_time_secs' not in statistics):
+            return None
+
+        return (statistics['cpus_user_time_secs'] +
+                statistics['cpus_system_time_secs'])
+
+    # Helper returning a (usage, row) tuple for every task shown by `top`
+    # and the CPU time samples taken, keyed by agent, framework and
+    # executor. `statistics` holds the indexed statistics of every agent
+    # queried (and the time they were fetched), and `previous` the samples
+    # of the last refresh. `usage` maps 'cpu' to the number of CPUs used
+    # since the last refresh and 'mem' to the memory used (or None).
+    def top_rows(self, tasks, statistics, previous):
+        samples = {}
+        rows = []
+        for user, framework, task, agent in tasks:
+            key = (agent['id'], task['framework_id'],
+                   mesos.index.task_executor_id(task))
+
+            usage = {"cpu" : None, "mem" : None}
+            executor_statistics = None
+            if agent['id'] in statistics:
+                index, fetched = statistics[agent['id']]
+                executor_statistics = self.task_statistics(task, index)
+            elif key in previous:
+                # Keep the last sample of tasks on agents that failed to
+                # respond, so their usage is shown again once they do.
+                samples[key] = previous[key]
+
+            if executor_statistics is not None:
+                usage["mem"] = executor_statistics.get('mem_rss_bytes')
+                cpu_time = self.cpu_time(executor_statistics)
+                if cpu_time is not None:
+                    timestamp = executor_statistics.get('timestamp', fetched)
+                    samples[key] = (timestamp, cpu_time)
+                    if key in previous and timestamp > previous[key][0]:
+                        usage["cpu"] = ((cpu_time - previous[key][1]) /
+                                        (timestamp - previous[key][0]))
+
+            cpu = ""
+            if usage["cpu"] is not None:
+                cpu = "%.1f" % (usage["cpu"] * 100)
+
+            rows.append((usage, [user, framework['name'], task['name'],
+                                 agent['hostname'], cpu,
+                                 self.mem(executor_statistics),
+                                 self.cpus(executor_statistics)]))
+
+        return (rows, samples)
+
+    # Helper rendering a screen of `top` showing the `top` rows along
+    # with the totals of all `rows`, clearing the terminal (if any) first.
+    def top_screen(self, rows, top, failed):
+        cpu = sum(usage["cpu"] for usage, row in rows
+                  if usage["cpu"] is not None)
+        mem = sum(usage["mem"] for usage, row in rows
+                  if usage["mem"] is not None)
+
+        screen = ""
+        if sys.stdout.isatty():
+            screen += "\033[H\033[2J"
+
+        screen += "Tasks: %d, CPU: %.1f%%, MEM: %s (%s)\n" % (
+            len(rows), cpu * 100, mesos.util.data_size(mem, "%.1f"),
+            time.strftime("%H:%M:%S"))
+        if failed:
+            screen += "Could not get statistics from agents at : %s\n" % (
+                ", ".join(failed))
+        screen += "\n"
+
+        table = mesos.util.Table(['USER', 'FRAMEWORK', 'TASK', 'AGENT',
+                                  '%CPU', 'MEM', 'CPU (allocated)'])
+        for usage, row in top:
+            table.add_row(row)
+
+        return screen + table.to_string()
+
+    def top(self, argv):
+        sort = argv["--sort"]
+        if sort not in ["cpu", "mem"]:
+            print >> sys.stderr, \
+                "Unknown sort key '%s', must be one of: cpu, mem" % sort
+            sys.exit(1)
+
+        interval = float(argv["--interval"])
+        tasks_interval = float(argv["--tasks-interval"])
+        limit = int(argv["--limit"])
+        iterations = None
+        if argv.get("--iterations") is not None:
+            iterations = int(argv["--iterations"])
+
+        matches = self.task_filter(argv)
+        timeout = float(argv["--timeout"])
+        client = self.statistics_client(timeout)
+
+        def fetch_statistics(agent):
+            index = self.index_statistics(client.get_json(
+                agent["pid"].split("@")[1], "/monitor/statistics"))
+            return (index, time.time())
+
+        # The task list only changes as tasks are launched or finish, so
+        # it is kept between refreshes (and only fetched again every
+        # `tasks_interval` seconds). Only the statistics of the agents
+        # running the listed tasks are fetched on every refresh.
+        tasks = None
+        listed = None
+        samples = {}
+        refreshes = 0
+        shown = 0
+        try:
+            while True:
+                started = time.time()
+                if listed is None or started - listed >= tasks_interval:
+                    tasks = self.state_tasks(argv["--addr"], matches)[0]
+                    listed = started
+
+                agents = []
+                seen = set()
+                for user, framework, task, agent in tasks:
+                    if agent['id'] not in seen:
+                        seen.add(agent['id'])
+                        agents.append(agent)
+
+                statistics = {}
+                failed = []
+                for agent, result, error in mesos.util.fan_out(
+                        fetch_statistics,
+                        agents,
+                        workers=int(argv["--workers"]),
+                        timeout=timeout):
+                    if error is not None:
+                        failed.append(agent["pid"].split("@")[1])
+                    else:
+                        statistics[agent['id']] = result
+
+                rows, samples = self.top_rows(tasks, statistics, samples)
+
+                # CPU usage needs two samples, so the first
+                # refresh only takes the initial samples.
+                refreshes += 1
+                if refreshes > 1:
+                    top = heapq.nlargest(
+                        limit, rows, key=lambda item: item[0][sort])
+                    sys.stdout.write(self.top_screen(rows, top, failed))
+                    sys.stdout.flush()
+                    shown += 1
+                    if iterations is not None and shown >= iterations:
+                        break
+
+                time.sleep(max(0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            pass
+
+    # Helper returning a tuple of the address of the agent running the
+    # task `task_id` of `framework_id` and the task's sandbox directory,
+    # or None if either cannot be found. Both are looked up in the
+    # sandbox index first, falling back to the '/state' of the master
+    # and agent (and recording it in the index) on a miss.
+    def locate(self, master_addr, framework_id, task_id):
+        index = mesos.index.SandboxIndex.from_config(self.config)
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+
+        located = index.task(framework_id, task_id)
+        if located is not None:
+            addr, executor_id = located
+            directory = index.executor(addr, framework_id, executor_id)
+            if directory is not None:
+                if reader.exists(addr, directory):
+                    return (addr, directory)
+                index.remove(addr, directory)
+        else:
+            # Get the master's state.
+            state = self.hit_endpoint(master_addr, "/state",
+                                      CAT_STATE_FIELDS)
+            index.add_master_state(state)
+
+            # Build a dict from agent ID to agents.
+            agents = {}
+            for agent in state['slaves']:
+                agents[agent['id']] = agent
+
+            for framework in itertools.chain(state['frameworks'],
+                                             state['completed_frameworks']):
+                if framework['id'] == framework_id:
+                    for task in itertools.chain(framework['tasks'],
+                                                framework['completed_tasks']):
+                        if task['id'] == task_id:
+                            located = (
+                                agents[task['slave_id']]['pid'].split('@')[1],
+                                mesos.index.task_executor_id(task))
+
+            if located is None:
+                print('No task found!')
+                return None
+
+            addr, executor_id = located
 
         # Get 'state' json  to determine the executor directory.
-        state = self.hit_endpoint(agent['pid'].split('@')[1],"/state")
-        directory = None
+        state = self.hit_endpoint(addr, "/state", AGENT_STATE_FIELDS)
+        index.add_agent_state(addr, state)
+
         for framework in itertools.chain(state['frameworks'],
                                          state['completed_frameworks']):
             if framework['id'] == framework_id:
                 for executor in itertools.chain(framework['executors'],
                                             framework['completed_executors']):
                     if executor['id'] == executor_id:
-                        directory = executor['directory']
-                        break
+                        return (addr, executor['directory'])
 
-        if directory is None:
-            print ('File not found')
+        print ('File not found')
+        return None
 
+    def read(self, addr, directory, file, follow=False, lines=None,
+             bytes=None):
         path = os.path.join(directory, file)
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+
         # Determine the current length of the file.
         try:
-            result = self.hit_endpoint(
-                agent['pid'].split('@')[1],
-                '/files/read?path='+path+'&offset=-1')
+            length = reader.length(addr, path)
         except HTTPError as error:
             if error.code == 404:
                 print ('No such file or directory')
             else:
                 print ('Failed to determine length of file')
+            return
 
-        length = result['offset']
-        # Start streaming "pages" up to length.
-        PAGE_LENGTH = 1024
-        offset = 0
-        while True:
-            try:
-                result = self.hit_endpoint(
-                    agent['pid'].split('@')[1],
-                    '/files/read?path='+path
-                    +'&offset='+str(offset)
-                    +'&length='+str(PAGE_LENGTH))
-                offset += len(result['data'])
-                yield result['data']
-                if offset == length:
-                    return
-            except:
-                print('Failed to read file from agent')
+        try:
+            if lines is None and bytes is None:
+                pages = reader.read(addr, path, length=length)
+            else:
+                pages = reader.tail(addr, path, length, lines, bytes)
 
+            for data in pages:
+                yield data
+
+            # Keep polling for data appended to the file.
+            if follow:
+                for path, data in reader.follow(addr, [path],
+                                                {path : length}):
+                    yield data
+        except HTTPException:
+            print('Failed to read file from agent')
+            return
+
+
+    # Helper returning a function matching IDs against the glob (or
+    # regular expression) `pattern`, or None if `pattern` is a plain ID.
+    def matcher(self, pattern, regex):
+        if regex:
+            return re.compile("(?:%s)$" % pattern).match
+        if any(char in pattern for char in "*?["):
+            return lambda id: fnmatch.fnmatchcase(id, pattern)
+        return None
 
     def cat(self,argv):
-        # Get the master's state.
-        state = self.hit_endpoint(argv["--addr"], "/state")
-        if state is None:
-            print ("Could not connect to Master")
+        lines = None
+        if argv["--tail"] is not None:
+            lines = int(argv["--tail"])
+        bytes = None
+        if argv["--bytes"] is not None:
+            bytes = int(argv["--bytes"])
+
+        match_framework = self.matcher(argv["<framework-ID>"],
+                                       argv.get("--regex"))
+        match_task = self.matcher(argv["<task-ID>"], argv.get("--regex"))
+        if match_framework is not None or match_task is not None:
+            self.cat_tasks(argv, match_framework or
+                           (lambda id: id == argv["<framework-ID>"]),
+                           match_task or
+                           (lambda id: id == argv["<task-ID>"]),
+                           lines, bytes)
             return
 
-        # Build a dict from agent ID to agents.
-        agents = {}
-        for agent in state['slaves']:
-            agents[agent['id']] = agent
+        located = self.locate(argv["--addr"], argv["<framework-ID>"],
+                              argv["<task-ID>"])
+        if located is None:
+            return
+
+        addr, directory = located
+        if argv.get("--output-dir") is not None:
+            self.cat_tasks(argv, None, None, lines, bytes,
+                           [(argv["<framework-ID>"], argv["<task-ID>"],
+                             addr, directory)])
+            return
 
-        def cat(agent, task):
-            for data in self.read(agent, task, argv["<file>"]):
+        try:
+            for data in self.read(addr, directory, argv["<file>"],
+                                  argv["--follow"], lines, bytes):
                 sys.stdout.write(data)
+                if argv["--follow"]:
+                    sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+
+        sys.exit(0)
+
+    # Reads the file from the sandboxes of all tasks matching
+    # `match_framework` and `match_task` (or from the given list of
+    # `sandboxes` as (framework ID, task ID, agent address, directory)
+    # tuples) concurrently, writing every line prefixed with the ID of
+    # its task, or the file of every task to its own directory (see
+    # `task_directories()`).
+    def cat_tasks(self, argv, match_framework, match_task, lines, bytes,
+                  sandboxes=None):
+        if argv["--follow"]:
+            print >> sys.stderr, "--follow can only be used with a single task"
+            sys.exit(1)
+
+        if sandboxes is None:
+            sandboxes = self.find_sandboxes(
+                argv["--addr"], match_framework, match_task,
+                int(argv["--workers"]))
+            if not sandboxes:
+                print('No task found!')
+                return
+
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+        output_dir = argv.get("--output-dir")
+        if output_dir is not None:
+            directories = self.task_directories(output_dir, sandboxes)
+        lock = threading.Lock()
+
+        def write_lines(task_id, pages):
+            prefix = (task_id + ":").encode("utf-8")
+            partial = ""
+            for data in pages:
+                data = partial + data
+                end = data.rfind("\n") + 1
+                partial = data[end:]
+                if end > 0:
+                    output = "".join(prefix + line + "\n"
+                                     for line in data[:end - 1].split("\n"))
+                    with lock:
+                        sys.stdout.write(output)
+            if partial:
+                with lock:
+                    sys.stdout.write(prefix + partial + "\n")
+
+        def write_file(sandbox, pages):
+            path = os.path.join(directories[sandbox], argv["<file>"])
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as output:
+                for data in pages:
+                    output.write(data)
+
+        def cat(sandbox):
+            framework_id, task_id, addr, directory = sandbox
+            path = os.path.join(directory, argv["<file>"])
+            # Without --tail or --bytes this reads the whole file.
+            pages = reader.tail(addr, path, reader.length(addr, path),
+                                lines, bytes)
+            if output_dir is not None:
+                write_file(sandbox, pages)
+            else:
+                write_lines(task_id, pages)
+
+        failed = False
+        for sandbox, result, error in mesos.util.fan_out(
+                cat, sandboxes, workers=int(argv["--workers"])):
+            if error is not None:
+                print >> sys.stderr, "Could not read %s of task %s: %s" % (
+                    argv["<file>"], sandbox[1], error)
+                failed = True
+
+        if failed:
+            sys.exit(1)
+
+    def grep(self, argv):
+        flags = 0
+        if argv["--ignore-case"]:
+            flags = re.IGNORECASE
+        pattern = re.compile(argv["<pattern>"], flags)
+
+        max_count = None
+        if argv["--max-count"] is not None:
+            max_count = int(argv["--max-count"])
+        if argv["--files-with-matches"]:
+            max_count = 1
+
+        match_framework = (self.matcher(argv["--framework"], False) or
+                           (lambda id: id == argv["--framework"]))
+        match_task = (self.matcher(argv["--task"], False) or
+                      (lambda id: id == argv["--task"]))
+
+        sandboxes = self.find_sandboxes(argv["--addr"], match_framework,
+                                        match_task, int(argv["--workers"]))
+        if not sandboxes:
+            print('No task found!')
+            return
+
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+        lock = threading.Lock()
+
+        # Searches the file of a sandbox, returning the number of
+        # matching lines. Stops reading the file (and closes the
+        # generator reading its pages) once `max_count` is reached.
+        def grep(sandbox):
+            framework_id, task_id, addr, directory = sandbox
+            prefix = (task_id + ":").encode("utf-8")
+            path = os.path.join(directory, argv["<file>"])
+
+            def search(lines, count):
+                output = []
+                for line in lines:
+                    if count == max_count:
+                        break
+                    if pattern.search(line):
+                        output.append(prefix + line + "\n")
+                        count += 1
+
+                if output and not argv["--files-with-matches"]:
+                    with lock:
+                        sys.stdout.write("".join(output))
+                return count
+
+            count = 0
+            partial = ""
+            pages = reader.read(addr, path)
+            for data in pages:
+                lines = (partial + data).split("\n")
+                partial = lines.pop()
+                count = search(lines, count)
+                if count == max_count:
+                    pages.close()
+                    break
+            else:
+                if partial:
+                    count = search([partial], count)
+
+            if count > 0 and argv["--files-with-matches"]:
+                with lock:
+                    sys.stdout.write(task_id.encode("utf-8") + "\n")
+
+            return count
+
+        matched = False
+        failed = False
+        for sandbox, count, error in mesos.util.fan_out(
+                grep, sandboxes, workers=int(argv["--workers"])):
+            if error is not None:
+                print >> sys.stderr, "Could not read %s of task %s: %s" % (
+                    argv["<file>"], sandbox[1], error)
+                failed = True
+            elif count > 0:
+                matched = True
+
+        # Like grep, exit with 0 if any line matched, 1 if none did
+        # and 2 if a file could not be searched.
+        if matched:
+            sys.exit(0)
+        sys.exit(2 if failed else 1)
+
+    def download(self, argv):
+        match_framework = self.matcher(argv["<framework-ID>"], argv["--regex"])
+        match_task = self.matcher(argv["<task-ID>"], argv["--regex"])
+        if match_framework is None and match_task is None:
+            located = self.locate(argv["--addr"], argv["<framework-ID>"],
+                                  argv["<task-ID>"])
+            if located is None:
+                return
+            sandboxes = [(argv["<framework-ID>"], argv["<task-ID>"]) +
+                         located]
+        else:
+            sandboxes = self.find_sandboxes(
+                argv["--addr"],
+                match_framework or (lambda id: id == argv["<framework-ID>"]),
+                match_task or (lambda id: id == argv["<task-ID>"]),
+                int(argv["--workers"]))
+            if not sandboxes:
+                print('No task found!')
+                return
+
+        includes = (argv["--include"] or "*").split(",")
+        excludes = (argv["--exclude"] or "").split(",")
+
+        def selected(path):
+            return (any(fnmatch.fnmatchcase(path, glob) for glob in includes)
+                    and not any(fnmatch.fnmatchcase(path, glob)
+                                for glob in excludes if glob))
+
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+        directories = self.task_directories(argv["--output-dir"], sandboxes)
+
+        def list_files(sandbox):
+            framework_id, task_id, addr, directory = sandbox
+            files = []
+            for entry in reader.walk(addr, directory):
+                path = os.path.relpath(entry["path"], directory)
+                if selected(path):
+                    filename = os.path.join(directories[sandbox], path)
+                    files.append((addr, entry["path"], filename,
+                                  entry["size"]))
+            return files
+
+        # List all sandboxes first, so that files of all sandboxes
+        # are downloaded concurrently afterwards.
+        failed = False
+        files = []
+        for sandbox, result, error in mesos.util.fan_out(
+                list_files, sandboxes, workers=int(argv["--workers"])):
+            if error is not None:
+                print >> sys.stderr, \
+                    "Could not list sandbox of task %s: %s" % (
+                        sandbox[1], error)
+                failed = True
+            else:
+                files.extend(result)
+
+        def download(file):
+            addr, path, filename, size = file
+            if not os.path.isdir(os.path.dirname(filename)):
+                try:
+                    os.makedirs(os.path.dirname(filename))
+                except OSError:
+                    # Another worker may have created it concurrently.
+                    if not os.path.isdir(os.path.dirname(filename)):
+                        raise
+            return reader.download(addr, path, filename, size)
 
+        transferred = 0
+        for file, result, error in mesos.util.fan_out(
+                download, files, workers=int(argv["--workers"])):
+            if error is not None:
+                print >> sys.stderr, "Could not download %s: %s" % (
+                    file[1], error)
+                failed = True
+            else:
+                transferred += result
+
+        print("Downloaded %d files (%s transferred) to %s" % (
+            len(files), mesos.util.data_size(transferred, "%.1f"),
+            argv["--output-dir"]))
+
+        if failed:
+            sys.exit(1)
+
+    # Helper returning a dictionary mapping each of the `sandboxes` (see
+    # `find_sandboxes()`) to the directory its files are written to below
+    # `output_dir`: DIR/<task-ID>, or DIR/<framework-ID>/<task-ID> for
+    # tasks whose ID is used by several frameworks.
+    def task_directories(self, output_dir, sandboxes):
+        frameworks = {}
+        for framework_id, task_id, addr, directory in sandboxes:
+            frameworks.setdefault(task_id, set()).add(framework_id)
+
+        directories = {}
+        for sandbox in sandboxes:
+            framework_id, task_id, addr, directory = sandbox
+            name = task_id.replace(os.sep, "_")
+            if len(frameworks[task_id]) > 1:
+                name = os.path.join(framework_id.replace(os.sep, "_"), name)
+            directories[sandbox] = os.path.join(output_dir, name)
+
+        return directories
+
+    # Helper returning a list of (framework ID, task ID, agent address,
+    # directory) tuples for all tasks matching `match_framework` and
+    # `match_task`. Sandboxes found in the sandbox index are checked to
+    # still exist, like by `locate()`. All others are found in the
+    # '/state' of their agents. Both are fetched concurrently.
+    def find_sandboxes(self, master_addr, match_framework, match_task,
+                       workers):
+        index = mesos.index.SandboxIndex.from_config(self.config)
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+
+        state = self.hit_endpoint(master_addr, "/state", CAT_STATE_FIELDS)
+        index.add_master_state(state)
+
+        agents = {}
+        for agent in state['slaves']:
+            agents[agent['id']] = agent['pid'].split('@')[1]
+
+        tasks = []
         for framework in itertools.chain(state['frameworks'],
                                          state['completed_frameworks']):
-            if framework['id'] == argv["<framework-ID>"]:
-                for task in itertools.chain(framework['tasks'],
-                                            framework['completed_tasks']):
-                    if (task['id'] == argv["<task-ID>"]):
-                        cat(agents[task['slave_id']], task)
-                        sys.exit(0)
+            if not match_framework(framework['id']):
+                continue
+            for task in itertools.chain(framework['tasks'],
+                                        framework['completed_tasks']):
+                if match_task(task['id']) and task['slave_id'] in agents:
+                    tasks.append((task['framework_id'], task['id'],
+                                  agents[task['slave_id']],
+                                  mesos.index.task_executor_id(task)))
+
+        directories = {}
+        for framework_id, task_id, addr, executor_id in tasks:
+            directory = index.executor(addr, framework_id, executor_id)
+            if directory is not None:
+                directories[(addr, framework_id, executor_id)] = directory
 
-        print('No task found!')
+        # Sandboxes that have been garbage collected are removed from the
+        # index. Those that cannot be checked are looked up in the state
+        # of their agent as well, but are kept in the index.
+        def check_sandbox(key):
+            return reader.exists(key[0], directories[key])
 
+        for key, exists, error in mesos.util.fan_out(
+                check_sandbox, sorted(directories), workers):
+            if error is None and not exists:
+                index.remove(key[0], directories[key])
+            if error is not None or not exists:
+                del directories[key]
 
+        def fetch_state(addr):
+            return self.hit_endpoint(addr, "/state", AGENT_STATE_FIELDS)
 
+        missing = sorted(set(
+            addr for framework_id, task_id, addr, executor_id in tasks
+            if (addr, framework_id, executor_id) not in directories))
 
+        for addr, agent_state, error in mesos.util.fan_out(
+                fetch_state, missing, workers):
+            if error is not None:
+                print >> sys.stderr, \
+                    "Could not get state from agent at : " + addr
+                continue
 
+            index.add_agent_state(addr, agent_state)
+            for framework in itertools.chain(
+                    agent_state['frameworks'],
+                    agent_state['completed_frameworks']):
+                # Prefer active executors over completed runs.
+                for executor in itertools.chain(
+                        reversed(framework['completed_executors']),
+                        framework['executors']):
+                    directories[(addr, framework['id'], executor['id'])] = \
+                        executor['directory']
 
+        sandboxes = []
+        for framework_id, task_id, addr, executor_id in tasks:
+            directory = directories.get((addr, framework_id, executor_id))
+            if directory is None:
+                print >> sys.stderr, "No sandbox found for task " + task_id
+                continue
+            sandboxes.append((framework_id, task_id, addr, directory))
 
+        return sandboxes
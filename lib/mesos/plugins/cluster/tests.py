@@ -1,17 +1,653 @@
+import json
+import os
+import shutil
 import sys
 import StringIO
+import tempfile
+import time
 import unittest
 
+import mesos.index
+import mesos.sandbox
+import mesos.util
+
 import main
 
+from fake_server import FakeHandler, FakeServer
+
+
+def fake_task(task_id, agent_id):
+    return {
+        "id" : task_id,
+        "name" : "task-" + task_id,
+        "framework_id" : "framework",
+        "executor_id" : "",
+        "slave_id" : agent_id
+    }
+
+
+def fake_entries(directory, files):
+    """
+    Returns the entries listed by the '/files/browse' of `directory` for
+    `files`, which maps names to contents (or None for directories).
+    """
+    entries = []
+    for name, data in files.items():
+        if data is None:
+            entries.append({"path" : directory + "/" + name,
+                            "mode" : "drwxr-xr-x"})
+        else:
+            entries.append({"path" : directory + "/" + name,
+                            "mode" : "-rw-r--r--", "size" : len(data)})
+    return entries
+
+
+class DownloadHandler(FakeHandler):
+    """
+    Serves the raw files of the server's `files` on '/files/download'.
+    """
+    def do_GET(self):
+        if self.path not in self.server.files:
+            return FakeHandler.do_GET(self)
+
+        self.server.requests.append(self.path)
+        self.send_body(200, self.server.files[self.path])
+
+
+def fake_statistics(task_id):
+    return {
+        "framework_id" : "framework",
+        "executor_id" : task_id,
+        "statistics" : {
+            "cpus_limit" : 1.5,
+            "mem_rss_bytes" : 1024 * 1024,
+            "mem_limit_bytes" : 2 * 1024 * 1024,
+            "cpus_system_time_secs" : 1,
+            "cpus_user_time_secs" : 2
+        }
+    }
+
+
+class FakeConfig(object):
+    HTTP_RETRIES = 0
+
 
 class TestCommands(unittest.TestCase):
 
+    def setUp(self):
+        self.agents = [
+            FakeServer({
+                "/monitor/statistics" : [fake_statistics("task1")],
+                "/state" : {
+                    "frameworks" : [{
+                        "id" : "framework",
+                        "executors" : [{
+                            "id" : "task1",
+                            "container" : "container1",
+                            "directory" : "/sandbox/task1"
+                        }],
+                        "completed_executors" : []
+                    }],
+                    "completed_frameworks" : []
+                },
+                "/files/browse?path=%2Fsandbox%2Ftask1" : [],
+                "/files/read?path=%2Fsandbox%2Ftask1%2Fstdout&offset=-1" : {
+                    "data" : "",
+                    "offset" : 6
+                },
+                "/files/read?path=%2Fsandbox%2Ftask1%2Fstdout"
+                "&offset=0&length=6" : {
+                    "data" : "hello\n",
+                    "offset" : 0
+                }
+            }),
+            FakeServer({
+                "/monitor/statistics" : [fake_statistics("task2")]
+            }, delay=1)
+        ]
+
+        self.master = FakeServer({
+            "/state" : {
+                "frameworks" : [{
+                    "id" : "framework",
+                    "user" : "root",
+                    "name" : "marathon",
+                    "tasks" : [fake_task("task1", "agent1"),
+                               fake_task("task2", "agent2")],
+                    "completed_tasks" : []
+                }],
+                "completed_frameworks" : [],
+                "slaves" : [{
+                    "id" : "agent%d" % (index + 1),
+                    "hostname" : "host%d" % (index + 1),
+                    "pid" : "slave(1)@" + agent.addr
+                } for index, agent in enumerate(self.agents)]
+            }
+        })
+
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
+        sys.stdout = StringIO.StringIO()
+        sys.stderr = StringIO.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+
+        self.master.stop()
+        for agent in self.agents:
+            agent.stop()
+
     def test_execute(self):
         pass
 
     def test_cat(self):
-        pass
+        argv = {
+            "--addr" : self.master.addr,
+            "<framework-ID>" : "framework",
+            "<task-ID>" : "task1",
+            "<file>" : "stdout",
+            "--follow" : False,
+            "--tail" : None,
+            "--bytes" : None
+        }
+        with self.assertRaises(SystemExit):
+            main.Cluster(FakeConfig()).cat(argv)
+
+        self.assertEqual("hello\n", sys.stdout.getvalue())
+
+    def test_cat_pattern(self):
+        argv = {
+            "--addr" : self.master.addr,
+            "<framework-ID>" : "frame*",
+            "<task-ID>" : "task[1]",
+            "<file>" : "stdout",
+            "--regex" : False,
+            "--output-dir" : None,
+            "--workers" : "4",
+            "--follow" : False,
+            "--tail" : None,
+            "--bytes" : None
+        }
+        main.Cluster(FakeConfig()).cat(argv)
+        self.assertEqual("task1:hello\n", sys.stdout.getvalue())
+
+        argv["--regex"] = True
+        argv["<framework-ID>"] = "framework"
+        argv["<task-ID>"] = "task1|nothing"
+        argv["--output-dir"] = tempfile.mkdtemp()
+        try:
+            main.Cluster(FakeConfig()).cat(argv)
+            with open(os.path.join(argv["--output-dir"], "task1",
+                                   "stdout")) as f:
+                self.assertEqual("hello\n", f.read())
+        finally:
+            shutil.rmtree(argv["--output-dir"])
+
+    def test_download(self):
+        # Both frameworks run a task named task1, and the
+        # sandbox of task2 can not be listed.
+        directories = {
+            "/sandbox/fw1/task1" : {
+                "stdout" : "out1\n",
+                "stderr" : "err1\n",
+                "logs" : None
+            },
+            "/sandbox/fw1/task1/logs" : {
+                "app.log" : "app\n",
+                "app.tmp" : "tmp\n"
+            },
+            "/sandbox/fw2/task1" : {"stdout" : "out2\n"}
+        }
+        agent = FakeServer({
+            "/state" : {
+                "frameworks" : [{
+                    "id" : framework_id,
+                    "executors" : [{
+                        "id" : task_id,
+                        "container" : framework_id + task_id,
+                        "directory" : "/sandbox/%s/%s" % (
+                            framework_id, task_id)
+                    } for task_id in task_ids],
+                    "completed_executors" : []
+                } for framework_id, task_ids in [("fw1", ["task1", "task2"]),
+                                                 ("fw2", ["task1"])]],
+                "completed_frameworks" : []
+            }
+        }, handler=DownloadHandler)
+        agent.files = {}
+        self.agents.append(agent)
+
+        for directory, files in directories.items():
+            agent.routes[mesos.sandbox.browse_endpoint(directory)] = \
+                fake_entries(directory, files)
+            for name, data in files.items():
+                if data is not None:
+                    agent.files[mesos.sandbox.download_endpoint(
+                        directory + "/" + name)] = data
+
+        tasks = {}
+        for framework_id, task_id in [("fw1", "task1"), ("fw1", "task2"),
+                                      ("fw2", "task1")]:
+            task = fake_task(task_id, "agent3")
+            task["framework_id"] = framework_id
+            tasks.setdefault(framework_id, []).append(task)
+        self.master.routes["/state"] = {
+            "frameworks" : [{
+                "id" : framework_id,
+                "tasks" : tasks[framework_id],
+                "completed_tasks" : []
+            } for framework_id in ["fw1", "fw2"]],
+            "completed_frameworks" : [],
+            "slaves" : [{"id" : "agent3", "pid" : "slave(1)@" + agent.addr}]
+        }
+
+        argv = {
+            "--addr" : self.master.addr,
+            "<framework-ID>" : "fw*",
+            "<task-ID>" : "task*",
+            "--output-dir" : tempfile.mkdtemp(),
+            "--include" : "std*,logs/*",
+            "--exclude" : "stderr,*.tmp",
+            "--regex" : False,
+            "--workers" : "4"
+        }
+        config = FakeConfig()
+        config.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            cluster = main.Cluster(config)
+            cluster.use_cache = False
+            with self.assertRaises(SystemExit) as context:
+                cluster.download(argv)
+            self.assertEqual(1, context.exception.code)
+            self.assertIn("Could not list sandbox of task task2",
+                          sys.stderr.getvalue())
+
+            downloaded = {}
+            for root, dirs, files in os.walk(argv["--output-dir"]):
+                for name in files:
+                    path = os.path.join(root, name)
+                    with open(path) as f:
+                        downloaded[os.path.relpath(
+                            path, argv["--output-dir"])] = f.read()
+            self.assertEqual({
+                "fw1/task1/stdout" : "out1\n",
+                "fw1/task1/logs/app.log" : "app\n",
+                "fw2/task1/stdout" : "out2\n"
+            }, downloaded)
+
+            # A task ID used by a single framework is not qualified.
+            shutil.rmtree(argv["--output-dir"])
+            argv["<framework-ID>"] = "fw2"
+            cluster.download(argv)
+            with open(os.path.join(argv["--output-dir"], "task1",
+                                   "stdout")) as f:
+                self.assertEqual("out2\n", f.read())
+            self.assertIn("Downloaded 1 files", sys.stdout.getvalue())
+        finally:
+            shutil.rmtree(config.CACHE_DIR)
+            shutil.rmtree(argv["--output-dir"], ignore_errors=True)
+
+    def test_grep(self):
+        argv = {
+            "--addr" : self.master.addr,
+            "<pattern>" : "EL+",
+            "<file>" : "stdout",
+            "--framework" : "*",
+            "--task" : "task1",
+            "--ignore-case" : True,
+            "--max-count" : None,
+            "--files-with-matches" : False,
+            "--workers" : "4"
+        }
+        cluster = main.Cluster(FakeConfig())
+        with self.assertRaises(SystemExit) as context:
+            cluster.grep(argv)
+        self.assertEqual(0, context.exception.code)
+        self.assertEqual("task1:hello\n", sys.stdout.getvalue())
+
+        sys.stdout.truncate(0)
+        argv["--files-with-matches"] = True
+        with self.assertRaises(SystemExit) as context:
+            cluster.grep(argv)
+        self.assertEqual("task1\n", sys.stdout.getvalue())
+
+        argv["--ignore-case"] = False
+        with self.assertRaises(SystemExit) as context:
+            cluster.grep(argv)
+        self.assertEqual(1, context.exception.code)
+
+    def test_locate(self):
+        config = FakeConfig()
+        config.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            sandbox = (self.agents[0].addr, "/sandbox/task1")
+            self.assertEqual(sandbox, main.Cluster(config).locate(
+                self.master.addr, "framework", "task1"))
+
+            # The second lookup is answered from the sandbox index.
+            del self.master.requests[:]
+            del self.agents[0].requests[:]
+            self.assertEqual(sandbox, main.Cluster(config).locate(
+                self.master.addr, "framework", "task1"))
+            self.assertEqual([], self.master.requests)
+            self.assertEqual(["/files/browse?path=%2Fsandbox%2Ftask1"],
+                             self.agents[0].requests)
+        finally:
+            shutil.rmtree(config.CACHE_DIR)
+
+    def test_find_sandboxes(self):
+        config = FakeConfig()
+        config.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            # The agent's state changes, so it must not be cached.
+            cluster = main.Cluster(config)
+            cluster.use_cache = False
+
+            def find_sandboxes():
+                return cluster.find_sandboxes(
+                    self.master.addr, lambda framework_id: True,
+                    lambda task_id: task_id == "task1", 4)
+
+            sandboxes = [("framework", "task1", self.agents[0].addr,
+                          "/sandbox/task1")]
+            self.assertEqual(sandboxes, find_sandboxes())
+
+            # The second lookup is answered from the sandbox index.
+            del self.agents[0].requests[:]
+            self.assertEqual(sandboxes, find_sandboxes())
+            self.assertEqual(["/files/browse?path=%2Fsandbox%2Ftask1"],
+                             self.agents[0].requests)
+
+            # The sandbox was garbage collected and the executor runs
+            # again in a new one, which is found in the agent's state.
+            del self.agents[0].routes["/files/browse?path=%2Fsandbox%2Ftask1"]
+            executor = self.agents[0].routes["/state"]["frameworks"][0][
+                "executors"][0]
+            executor["directory"] = "/sandbox/task1-2"
+            sandboxes = [("framework", "task1", self.agents[0].addr,
+                          "/sandbox/task1-2")]
+            self.assertEqual(sandboxes, find_sandboxes())
+
+            index = mesos.index.SandboxIndex.from_config(config)
+            self.assertEqual("/sandbox/task1-2", index.executor(
+                self.agents[0].addr, "framework", "task1"))
+        finally:
+            shutil.rmtree(config.CACHE_DIR)
+
+    def test_task_statistics(self):
+        cluster = main.Cluster(FakeConfig())
+        index = cluster.index_statistics(
+            [fake_statistics("task1"), fake_statistics("executor")])
+
+        task = fake_task("task1", "agent1")
+        self.assertEqual("1.5", cluster.cpus(
+            cluster.task_statistics(task, index)))
+
+        task["executor_id"] = "executor"
+        self.assertEqual("00:00:03.000000", cluster.time(
+            cluster.task_statistics(task, index)))
+
+        task["executor_id"] = "unknown"
+        self.assertEqual("", cluster.mem(
+            cluster.task_statistics(task, index)))
+        self.assertEqual("", cluster.mem(
+            cluster.task_statistics(task, None)))
 
     def test_ps(self):
-        pass
+        argv = {
+            "--addr" : self.master.addr,
+            "--workers" : "2",
+            "--timeout" : "0.5",
+            "--deadline" : "10",
+            "--format" : "table"
+        }
+        # Agents are listed in the order of the master's
+        # agents, not in that of the tasks running on them.
+        self.master.routes["/state"]["frameworks"][0]["tasks"].reverse()
+        main.Cluster(FakeConfig()).ps(argv)
+
+        sys.stdout.seek(0)
+        lines = sys.stdout.read().strip().split("\n")
+
+        # The slow agent is shown as a partial row, in its original order.
+        self.assertEqual(3, len(lines))
+        self.assertEqual(
+            ["root", "marathon", "task-task1", "host1",
+             "1.0", "MB/2.0", "MB", "00:00:03.000000", "1.5"],
+            lines[1].split())
+        self.assertEqual(
+            ["root", "marathon", "task-task2", "host2"],
+            lines[2].split())
+        self.assertIn(self.agents[1].addr, sys.stderr.getvalue())
+
+    def test_ps_filters(self):
+        argv = {
+            "--addr" : self.master.addr,
+            "--workers" : "2",
+            "--timeout" : "0.5",
+            "--deadline" : "10",
+            "--format" : "ndjson",
+            "--framework" : "marathon",
+            "--task" : "k1$"
+        }
+        main.Cluster(FakeConfig()).ps(argv)
+
+        sys.stdout.seek(0)
+        records = [json.loads(line) for line in sys.stdout]
+
+        # The agent without matching tasks is never contacted.
+        self.assertEqual(["task-task1"],
+                         [record["TASK"] for record in records])
+        self.assertEqual([], self.agents[1].requests)
+
+        cluster = main.Cluster(FakeConfig())
+        task = fake_task("task1", "agent1")
+        agent = {"id" : "agent1", "hostname" : "host1",
+                 "pid" : "slave(1)@10.0.0.1:5051"}
+        framework = {"id" : "framework", "name" : "marathon",
+                     "roles" : ["web", "batch"]}
+
+        def matches(**filters):
+            return cluster.task_filter(filters)("root", framework, task, agent)
+
+        self.assertTrue(matches(**{"--user" : "root"}))
+        self.assertFalse(matches(**{"--user" : "alice"}))
+        self.assertTrue(matches(**{"--framework" : "framework"}))
+        self.assertTrue(matches(**{"--agent" : "10.0.0.1:5051"}))
+        self.assertFalse(matches(**{"--agent" : "host2"}))
+        self.assertTrue(matches(**{"--role" : "batch"}))
+        task["role"] = "web"
+        self.assertFalse(matches(**{"--role" : "batch"}))
+
+    def test_ps_sort(self):
+        cluster = main.Cluster(FakeConfig())
+        rows = []
+        for mem, name in [(3, "c"), (None, "a"), (1, "b"), (2, "d")]:
+            statistics = None
+            if mem is not None:
+                statistics = {"mem_rss_bytes" : mem}
+            row = ["root", "marathon", name, "host1", "", "", ""]
+            rows.append((row, cluster.sort_keys(row, statistics)))
+
+        def ps(sort, limit):
+            cluster.ps_rows = lambda argv: iter(rows)
+            cluster.output = lambda columns, argv: mesos.util.record_writer(
+                "csv", columns)
+            sys.stdout.truncate(0)
+            cluster.ps({"--sort" : sort, "--limit" : limit})
+            return [line.split(",")[2]
+                    for line in sys.stdout.getvalue().splitlines()[1:]]
+
+        self.assertEqual(["c", "d"], ps("mem", "2"))
+        self.assertEqual(["c", "d", "b", "a"], ps("mem", None))
+        self.assertEqual(["a", "b"], ps("task", "2"))
+        self.assertEqual(["c", "a", "b"], ps(None, "3"))
+
+    def test_ps_paged(self):
+        task1 = fake_task("task1", "agent1")
+        task1["user"] = "alice"
+        task3 = fake_task("task3", "agent1")
+        task3["state"] = "TASK_FINISHED"
+
+        self.master.routes.update({
+            "/state-summary" : {
+                "frameworks" : [{"id" : "framework", "name" : "marathon"}],
+                "slaves" : self.master.routes["/state"]["slaves"]
+            },
+            "/tasks?limit=1&offset=0" : {"tasks" : [task1]},
+            "/tasks?limit=1&offset=1" : {"tasks" : [task3]},
+            "/tasks?limit=1&offset=2" : {"tasks" : []}
+        })
+
+        argv = {
+            "--addr" : self.master.addr,
+            "--workers" : "2",
+            "--timeout" : "0.5",
+            "--deadline" : "10",
+            "--format" : "ndjson",
+            "--page-size" : "1"
+        }
+        main.Cluster(FakeConfig()).ps(argv)
+
+        sys.stdout.seek(0)
+        records = [json.loads(line) for line in sys.stdout]
+
+        self.assertEqual(1, len(records))
+        self.assertEqual("alice", records[0]["USER"])
+        self.assertEqual("marathon", records[0]["FRAMEWORK"])
+        self.assertEqual("1.5", records[0]["CPU (allocated)"])
+        self.assertNotIn("/state", self.master.requests)
+        self.assertEqual(["/monitor/statistics"], self.agents[0].requests)
+
+        # Tasks without a user of their own would never match --user.
+        sys.stdout.truncate(0)
+        del self.master.requests[:]
+        argv["--user"] = "root"
+        with self.assertRaises(SystemExit) as context:
+            main.Cluster(FakeConfig()).ps(argv)
+        self.assertEqual(1, context.exception.code)
+        self.assertIn("--user can not be used with --page-size",
+                      sys.stderr.getvalue())
+        self.assertEqual("", sys.stdout.getvalue())
+        self.assertEqual([], self.master.requests)
+
+    def test_ps_deadline(self):
+        # Two slow agents, whose tasks are listed on separate pages.
+        agent = FakeServer({
+            "/monitor/statistics" : [fake_statistics("task3")]
+        }, delay=1)
+        self.agents.append(agent)
+        slaves = self.master.routes["/state"]["slaves"]
+        slaves.append({"id" : "agent3", "hostname" : "host3",
+                       "pid" : "slave(1)@" + agent.addr})
+
+        self.master.routes.update({
+            "/state-summary" : {
+                "frameworks" : [{"id" : "framework", "name" : "marathon"}],
+                "slaves" : slaves
+            },
+            "/tasks?limit=1&offset=0" : {
+                "tasks" : [fake_task("task2", "agent2")]
+            },
+            "/tasks?limit=1&offset=1" : {
+                "tasks" : [fake_task("task3", "agent3")]
+            },
+            "/tasks?limit=1&offset=2" : {"tasks" : []}
+        })
+
+        argv = {
+            "--addr" : self.master.addr,
+            "--workers" : "2",
+            "--timeout" : "5",
+            "--deadline" : "0.5",
+            "--format" : "ndjson",
+            "--page-size" : "1"
+        }
+        started = time.time()
+        main.Cluster(FakeConfig()).ps(argv)
+
+        # The deadline bounds all pages together, not every page.
+        self.assertLess(time.time() - started, 0.9)
+        sys.stdout.seek(0)
+        records = [json.loads(line) for line in sys.stdout]
+        self.assertEqual(["host2", "host3"],
+                         [record["AGENT"] for record in records])
+        self.assertEqual(["", ""], [record["MEM"] for record in records])
+
+    def test_ps_ndjson(self):
+        argv = {
+            "--addr" : self.master.addr,
+            "--workers" : "2",
+            "--timeout" : "0.5",
+            "--deadline" : "10",
+            "--format" : "ndjson"
+        }
+        main.Cluster(FakeConfig()).ps(argv)
+
+        sys.stdout.seek(0)
+        records = [json.loads(line) for line in sys.stdout]
+
+        self.assertEqual(["task-task1", "task-task2"],
+                         [record["TASK"] for record in records])
+        self.assertEqual("1.5", records[0]["CPU (allocated)"])
+        self.assertEqual("", records[1]["CPU (allocated)"])
+
+    def test_top(self):
+        argv = {
+            "--addr" : self.master.addr,
+            "--interval" : "0.05",
+            "--tasks-interval" : "30",
+            "--iterations" : "2",
+            "--limit" : "20",
+            "--sort" : "cpu",
+            "--workers" : "2",
+            "--timeout" : "0.5",
+            "--task" : "k1$"
+        }
+        main.Cluster(FakeConfig()).top(argv)
+
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("Tasks: 1, CPU: 0.0%"))
+        self.assertEqual(
+            ["root", "marathon", "task-task1", "host1", "0.0",
+             "1.0", "MB/2.0", "MB", "1.5"],
+            lines[3].split())
+
+        # The task list is fetched once and only the agent running the
+        # matching task is sampled, once per refresh (plus the first).
+        self.assertEqual(1, self.master.requests.count("/state"))
+        self.assertEqual(["/monitor/statistics"] * 3,
+                         self.agents[0].requests)
+        self.assertEqual([], self.agents[1].requests)
+
+    def test_top_rows(self):
+        cluster = main.Cluster(FakeConfig())
+        agent = {"id" : "agent1", "hostname" : "host1"}
+        framework = {"id" : "framework", "name" : "marathon"}
+        tasks = [("root", framework, fake_task(task_id, "agent1"), agent)
+                 for task_id in ["task1", "task2"]]
+
+        statistics = fake_statistics("task1")
+        statistics["statistics"]["timestamp"] = 100.0
+        index = cluster.index_statistics([statistics])
+        rows, samples = cluster.top_rows(
+            tasks, {"agent1" : (index, 0)}, {})
+        self.assertEqual(None, rows[0][0]["cpu"])
+        self.assertEqual(1024 * 1024, rows[0][0]["mem"])
+        self.assertEqual({"cpu" : None, "mem" : None}, rows[1][0])
+
+        # 1.5 seconds of CPU time in 2 seconds are 0.75 CPUs.
+        statistics["statistics"]["timestamp"] = 102.0
+        statistics["statistics"]["cpus_user_time_secs"] += 1.5
+        index = cluster.index_statistics([statistics])
+        rows, samples = cluster.top_rows(
+            tasks, {"agent1" : (index, 0)}, samples)
+        self.assertEqual(0.75, rows[0][0]["cpu"])
+        self.assertEqual("75.0", rows[0][1][4])
+
+        # Samples of agents that failed to respond are kept.
+        rows, samples = cluster.top_rows(tasks, {}, samples)
+        self.assertEqual(None, rows[0][0]["cpu"])
+        self.assertEqual({("agent1", "framework", "task1") : (102.0, 4.5)},
+                         samples)
@@ -1,17 +1,19 @@
-import json
 import sys
-import urllib2
 import config
 import os
 import subprocess
 import ctypes
-from socket import error as socket_error
-from multiprocessing import Process, Manager
+import time
 
 import mesos
+import mesos.cgroups
+import mesos.containers
+import mesos.hosts
+import mesos.index
+import mesos.sandbox
 
+from mesos.http import HTTPError, HTTPException
 from mesos.plugins import PluginBase
-from mesos.util import Table
 
 PLUGIN_CLASS = "Container"
 PLUGIN_NAME = "container"
@@ -20,6 +22,20 @@ VERSION = "Mesos CLI Container Plugin 1.0"
 
 SHORT_HELP = "Container specific commands for the Mesos CLI"
 
+# The fields of the agent's '/state' needed by `logs` and to record
+# its sandboxes in the sandbox index (see `mesos.jsonstream` for the
+# format).
+LOGS_STATE_FIELDS = {
+    "frameworks" : [{
+        "id" : True,
+        "executors" : [{
+            "id" : True,
+            "container" : True,
+            "directory" : True
+        }]
+    }]
+}
+
 
 class Container(PluginBase):
 
@@ -28,13 +44,25 @@ class Container(PluginBase):
             "arguments" : [],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Agent [Default: "+config.AGENT_IP+"]"
+                "IP and Port of Agent, or a comma separated list of them "
+                "[Default: "+config.AGENT_IP+"]",
+                "--format=FORMAT" :
+                "Output format: table, json, ndjson or csv [Default: table]",
+                "--no-cache" :
+                "Do not use cached responses of the agent",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "List all running containers on this agent",
             "long_help"  :
 """
 List all containers that are currently running on this local agent machine.
 Also displays
+
+With several agents, the containers of each agent are listed after a
+'==> <addr> <==' line. The agents on the same remote host are listed in
+a single SSH session, and the SSH connection to every host is shared by
+all remote commands for SSH_CONTROL_PERSIST seconds.
 """
         },
         "execute" : {
@@ -56,7 +84,17 @@ Only supports the Mesos Containerizer.
                 "--addr=Addr" :
                 "IP and Port of Agent [Default: "+config.AGENT_IP+"]",
                 "--noStdout" : "Do not print Stdout",
-                "--noStderr" : "Do not print Stderr"
+                "--noStderr" : "Do not print Stderr",
+                "--follow" :
+                "Keep printing data appended to the logs (Stderr to stderr)",
+                "--tail=N" :
+                "Only print the last N lines of the logs",
+                "--bytes=N" :
+                "Only print the last N bytes of the logs",
+                "--no-cache" :
+                "Do not use cached responses of the agent",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "Show logs",
             "long_help"  :
@@ -81,20 +119,48 @@ Show the processes running inside of a container.
             "arguments" : ["<container-ID>..."],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Agent [Default: "+config.AGENT_IP+"]"
+                "IP and Port of Agent, or a comma separated list of them "
+                "[Default: "+config.AGENT_IP+"]",
+                "--interval=SECS" :
+                "Time between refreshes [Default: 1]",
+                "--iterations=N" :
+                "Exit after N refreshes instead of running until interrupted",
+                "--monitor" :
+                "Poll the agents' /monitor/statistics even for a local agent",
+                "--workers=N" :
+                "Number of agents to poll concurrently [Default: 32]",
+                "--timeout=SECS" :
+                "Time to wait for the statistics of an agent [Default: 10]"
                 },
             "short_help" : "Show status for one or more Containers",
             "long_help"  :
 """
 Show various statistics of running containers. Inputting multiple ID's
 will output the container statistics for all those containers.
+
+The CPU, memory and block I/O usage of each container on the local agent
+is read from its cgroups, and that of its processes from /proc, every
+--interval seconds. CPU usage is shown as a percentage of one CPU since
+the previous refresh.
+
+For remote agents, several agents (--addr=host1:5051,host2:5051) or with
+--monitor, the /monitor/statistics of the agents running the containers
+are polled concurrently instead, which needs neither root nor ssh. The
+containers are looked up once in the /containers of every agent. Agents
+that do not respond within --timeout seconds are listed as failed.
 """
         },
         "images" : {
             "arguments" : [],
             "flags" : {
                 "--addr=Addr" :
-                "IP and Port of Agent [Default: "+config.AGENT_IP+"]"
+                "IP and Port of Agent [Default: "+config.AGENT_IP+"]",
+                "--format=FORMAT" :
+                "Output format: table, json, ndjson or csv [Default: table]",
+                "--no-cache" :
+                "Do not use cached responses of the agent",
+                "--max-age=SECS" :
+                "Only use cached responses younger than this"
                 },
             "short_help" : "Lists container images",
             "long_help"  :
@@ -104,6 +170,15 @@ List images present in the Docker/Appc store on the agent
         }
     }
 
+    def __init__(self, config):
+        PluginBase.__init__(self, config)
+
+        # The prefix indexes of the containers on every agent queried.
+        self.container_indexes = {}
+
+        self.local_addresses = mesos.hosts.LocalAddresses(
+            ttl=getattr(config, "LOCAL_ADDRESSES_TTL", mesos.hosts.TTL))
+
     def __setup__(self, command, argv):
         pass
 
@@ -140,70 +215,84 @@ List images present in the Docker/Appc store on the agent
 
     # Checks if call is for local agent or should we treat as a remote agent
     def check_remote(self,addr):
-        addr = addr.split(":")[0]
-        process = subprocess.Popen("ifconfig | grep 'inet '", shell=True,
-                                                    stdout=subprocess.PIPE)
-        output = process.communicate()[0].split('\n')
-        ip_addr = []
-        for line in output:
-            if len(line) != 0:
-                ip_addr.append(line.strip().split(' ')[1].split(":")[1])
+        return not self.local_addresses.is_local(mesos.hosts.split_host(addr))
+
+    # Returns the options sharing one SSH connection per remote host
+    # between all remote commands. The first command to a host opens a
+    # master connection, which stays open in the background until it has
+    # been idle for 'SSH_CONTROL_PERSIST' seconds, and later commands
+    # (even of later invocations) are sent over it without a handshake.
+    def ssh_options(self):
+        persist = getattr(self.config, "SSH_CONTROL_PERSIST", 60)
+        directory = getattr(self.config, "CACHE_DIR", None)
+        if not persist or directory is None:
+            return []
+
+        # The path of a unix socket is limited to about 100 bytes, of
+        # which the hash of the connection ('%C') takes 40.
+        directory = os.path.join(directory, "ssh")
+        if len(directory) > 60:
+            return []
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory, 0700)
+            except OSError:
+                return []
 
-        if addr in ip_addr:
-            return False
+        return ["-o", "ControlMaster=auto",
+                "-o", "ControlPath=" + os.path.join(directory, "%C"),
+                "-o", "ControlPersist=%d" % persist]
 
-        return True
+    # Returns the command line running `command` on the host `target_ip`
+    def ssh_command(self, target_ip, command):
+        args = ["ssh"]
+        ssh_keys = config.SSH_KEYS;
+        if target_ip in ssh_keys:
+            args += ["-i", ssh_keys[target_ip]]
+        args += ["-tt", "-o", "LogLevel=QUIET"] + self.ssh_options()
+        return args + [target_ip, command]
 
-    # Executes command on remote node
-    def remote_command(self, cmd, flags, addr, id_commands):
+    # Returns the `mesos container` command line for a remote node
+    def mesos_command(self, cmd, flags, addr, id_commands):
         command = "mesos container "+cmd+" --addr="+addr+" "+flags
         for elem in id_commands:
             command += " "+ elem
+        return command
 
-        ssh_keys = config.SSH_KEYS;
-        target_ip = addr.split(":")[0]
-        if target_ip in ssh_keys:
-            subprocess.call(["ssh","-i",ssh_keys[target_ip],"-tt","-o",
-                                        "LogLevel=QUIET",target_ip,command])
-        else:
-            subprocess.call(["ssh","-tt","-o","LogLevel=QUIET",target_ip,
-                                                                command])
+    # Executes command on remote node
+    def remote_command(self, cmd, flags, addr, id_commands):
+        self.remote_commands(
+            addr, [self.mesos_command(cmd, flags, addr, id_commands)])
 
-        return
+    # Executes several commands on the remote node of `addr` one after
+    # the other, in a single SSH session
+    def remote_commands(self, addr, commands):
+        target_ip = mesos.hosts.split_host(addr)
+        subprocess.call(self.ssh_command(target_ip, " ; ".join(commands)))
 
     # Helper function to parse container images from file
     def parse_images(self,text):
-        result = ""
+        result = []
         previous = False
         text = text.split('\n')
         for line in text:
             if '@' in line and not previous:
-                result += line.split('@')[0] + "\n"
+                result.append(line.split('@')[0])
                 previous = True
             else:
                 previous = False
-        if result == "":
-            return "No Images Found!"
 
         return result
 
-    #Helper to hit the specified endpoint and return json results
-    def hit_endpoint(self,addr,endpoint):
-        try:
-            http_response = ( urllib2.urlopen("http://"+addr+endpoint)
-                                            .read().decode('utf-8') )
-        except socket_error as e:
-            print("Cannot establish connection with Agent")
-            sys.exit(1)
-
-        return json.loads(http_response)
-
     # Read file on a Master/Agent Node sandbox
-    def read_file(self, addr, path):
+    def read_file(self, addr, path, lines=None, bytes=None):
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+
         # Determine the current length of the file.
         try:
-            result = self.hit_endpoint( addr,
-                '/files/read?path='+path+'&offset=-1')
+            length = reader.length(addr, path)
         except HTTPError as error:
             if error.code == 404:
                 print ('No such file or directory')
@@ -212,60 +301,158 @@ List images present in the Docker/Appc store on the agent
                 print ('Failed to determine length of file')
                 sys.exit(1)
 
-        length = result['offset']
-        PAGE_LENGTH = 1024
-        offset = 0
-        while True:
-            try:
-                result = self.hit_endpoint( addr,
-                    '/files/read?path='+path
-                    +'&offset='+str(offset)
-                    +'&length='+str(PAGE_LENGTH))
-                offset += len(result['data'])
-                yield result['data']
-                if offset == length:
-                    return
-            except:
-                print('Failed to read file from agent')
+        try:
+            if lines is None and bytes is None:
+                pages = reader.read(addr, path, length=length)
+            else:
+                pages = reader.tail(addr, path, length, lines, bytes)
+
+            for data in pages:
+                yield data
+        except HTTPException:
+            print('Failed to read file from agent')
+            sys.exit(1)
+
+    # Helper function to find the sandbox directory of a container, looking
+    # it up in the sandbox index before falling back to the agent's /state
+    def sandbox(self, addr, container_id):
+        index = mesos.index.SandboxIndex.from_config(self.config)
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+
+        work_dir = index.container(addr, container_id)
+        if work_dir is not None:
+            if reader.exists(addr, work_dir):
+                return work_dir
+            index.remove(addr, work_dir)
+
+        # Resolve the prefix to a complete container ID, which may be in
+        # the index even if the prefix is ambiguous there (e.g., because
+        # of stale entries of containers that have exited since).
+        container_id = self.resolve_containers(
+            [addr], [container_id])[0][1]["container_id"]
+        work_dir = index.container(addr, container_id)
+        if work_dir is not None and reader.exists(addr, work_dir):
+            return work_dir
+
+        state_info = self.hit_endpoint(addr, "/state", LOGS_STATE_FIELDS)
+        index.add_agent_state(addr, state_info)
+
+        for framework in state_info["frameworks"]:
+            for executor in framework["executors"]:
+                if executor["container"] == container_id:
+                    return executor["directory"]
+
+        print("No container with specified ID found")
+        sys.exit(1)
+
+    # Helper returning the prefix index (see `mesos.containers`) of the
+    # containers on the agent at `addr`. The /containers of every agent is
+    # fetched at most once per invocation (and is kept in the response
+    # cache for a few seconds, so consecutive invocations share it).
+    def container_index(self, addr):
+        if addr not in self.container_indexes:
+            self.container_indexes[addr] = mesos.containers.ContainerIndex(
+                self.hit_endpoint(addr, "/containers"))
+        return self.container_indexes[addr]
+
+    # Helper resolving each of the container ID `prefixes` to an (addr,
+    # container) tuple of the one container it identifies on any of the
+    # agents at `addrs` (whose /containers are fetched concurrently).
+    # Exits if a prefix matches no container or several of them.
+    def resolve_containers(self, addrs, prefixes, workers=32):
+        indexes = {}
+        for addr, index, error in mesos.util.fan_out(
+                self.container_index, addrs, workers=workers):
+            if error is not None:
+                print >> sys.stderr, \
+                    "Could not get containers from agent at : " + addr
+                continue
+            indexes[addr] = index
+
+        result = []
+        for prefix in prefixes:
+            candidates = []
+            for addr in addrs:
+                if addr in indexes:
+                    for container in indexes[addr].matches(prefix):
+                        candidates.append((addr, container))
+
+            if not candidates:
+                print ("No container with specified ID found")
                 sys.exit(1)
 
+            if len(candidates) > 1:
+                print ("Container ID '%s' not unique enough, it matches:"
+                       % prefix)
+                for addr, container in candidates:
+                    if len(addrs) > 1:
+                        print ("  %s (on %s)" % (container["container_id"],
+                                                 addr))
+                    else:
+                        print ("  %s" % container["container_id"])
+                sys.exit(1)
+
+            result.append(candidates[0])
+
+        return result
+
     # Helper function to retrieve PID of a container from /containers endpoint
     # Also Serves the purpose of checking containerizer type
     def get_pid(self,addr,container_id):
-        container_info = self.hit_endpoint(addr,"/containers")
-        prev_match = False
-        pid = None
-        for container in container_info:
-            if ( container["container_id"].startswith(container_id)
-                    and "executor_pid" in container["status"].keys() ):
-                if prev_match:
-                    print ("Container ID not unique enough")
-                    sys.exit(1)
-                else:
-                    pid = str(container["status"]["executor_pid"])
-                    prev_match = True
-
-        if pid is None:
-            print ("No container with specified ID found")
+        addr, container = self.resolve_containers([addr], [container_id])[0]
+        if "executor_pid" not in container.get("status", {}):
+            print ("Container %s has no executor pid (only the Mesos "
+                   "Containerizer is supported)" % container["container_id"])
             sys.exit(1)
 
-        return pid
+        return str(container["status"]["executor_pid"])
+
+    # Lists the containers of several agents, running the commands for
+    # all remote agents on the same host in a single SSH session.
+    def ps_agents(self, argv, addrs):
+        hosts = []
+        commands = {}
+        for addr in addrs:
+            if not self.check_remote(addr):
+                print ("==> %s <==" % addr)
+                sys.stdout.flush()
+                self.ps(dict(argv, **{"--addr" : addr}))
+                continue
+
+            host = mesos.hosts.split_host(addr)
+            if host not in commands:
+                hosts.append(host)
+                commands[host] = []
+            commands[host] += [
+                "echo '==> %s <=='" % addr,
+                self.mesos_command("ps", "--format=" + argv["--format"],
+                                   addr, [])]
+
+        for host in hosts:
+            self.remote_commands(host, commands[host])
 
     def ps(self,argv):
+        addrs = argv["--addr"].split(",")
+        if len(addrs) > 1:
+            self.ps_agents(argv, addrs)
+            return
+
         if self.check_remote(argv["--addr"]):
-            self.remote_command("ps", "",  argv["--addr"], [])
+            self.remote_command("ps", "--format=" + argv["--format"],
+                                argv["--addr"], [])
             return
 
         container_info = self.hit_endpoint(argv["--addr"], "/containers")
         if len(container_info) == 0:
-            print("There are no containers running on this Agent")
-            return
+            print >> sys.stderr, ("There are no containers running "
+                                  "on this Agent")
 
-        table = Table(["Container ID", "Framework", "Executor"])
+        table = self.output(["Container ID", "Framework", "Executor"], argv)
         for elem in container_info:
             table.add_row([elem["container_id"], elem["framework_id"],
                                                  elem["executor_id"]])
-        print(table.to_string())
+        table.close()
 
     def execute(self,argv):
         if self.check_remote(argv["--addr"]):
@@ -281,41 +468,84 @@ List images present in the Docker/Appc store on the agent
         if self.check_remote(argv["--addr"]):
             flags = ""
             if argv["--noStdout"]:
-                flags += "--stdOut"
+                flags += " --noStdout"
             if argv["--noStderr"]:
                 flags += " --noStderr"
+            if argv["--follow"]:
+                flags += " --follow"
+            if argv["--tail"] is not None:
+                flags += " --tail=" + argv["--tail"]
+            if argv["--bytes"] is not None:
+                flags += " --bytes=" + argv["--bytes"]
             self.remote_command("logs", flags, argv["--addr"],
-                                            ["<container-ID>"])
+                                            [argv["<container-ID>"]])
             return
 
-        container_pid = self.get_pid(argv["--addr"],argv["<container-ID>"])
-        state_info = self.hit_endpoint(argv["--addr"], "/state")
-        work_dir = None
-        prev_match = False
-        for framework in state_info["frameworks"]:
-            for executor in framework["executors"]:
-                if executor["container"].startswith(argv["<container-ID>"]):
-                    if prev_match:
-                        print ("Container ID not unique enough")
-                    else:
-                        work_dir = executor["directory"]
-                        prev_match = True
+        work_dir = self.sandbox(argv["--addr"], argv["<container-ID>"])
 
-        if work_dir is None:
-            print("No container with specified ID found")
-            sys.exit(1)
+        lines = None
+        if argv["--tail"] is not None:
+            lines = int(argv["--tail"])
+        bytes = None
+        if argv["--bytes"] is not None:
+            bytes = int(argv["--bytes"])
+
+        if argv["--follow"]:
+            self.follow_logs(argv, work_dir, lines, bytes)
+            return
 
         if not argv["--noStdout"]:
             stdout_file = os.path.join(work_dir,"stdout")
-            for line in self.read_file(argv["--addr"], stdout_file):
-                print (line)
+            for data in self.read_file(argv["--addr"], stdout_file,
+                                       lines, bytes):
+                sys.stdout.write(data)
 
         print ("=" * 20)
 
         if not argv["--noStderr"]:
             stderr_file = os.path.join(work_dir,"stderr")
-            for line in self.read_file(argv["--addr"], stderr_file):
-                print (line)
+            for data in self.read_file(argv["--addr"], stderr_file,
+                                       lines, bytes):
+                sys.stdout.write(data)
+
+    # Follow the stdout/stderr logs of a container, writing
+    # each of them to the corresponding stream of our own.
+    def follow_logs(self, argv, work_dir, lines=None, bytes=None):
+        paths = []
+        streams = {}
+        if not argv["--noStdout"]:
+            paths.append(os.path.join(work_dir, "stdout"))
+            streams[paths[-1]] = sys.stdout
+        if not argv["--noStderr"]:
+            paths.append(os.path.join(work_dir, "stderr"))
+            streams[paths[-1]] = sys.stderr
+
+        reader = mesos.sandbox.SandboxReader.from_config(
+            self.http, self.config)
+        offsets = {}
+        try:
+            # Start with the tail of the logs if only that was asked for.
+            if lines is not None or bytes is not None:
+                for path in paths:
+                    offsets[path] = reader.length(argv["--addr"], path)
+                    for data in reader.tail(argv["--addr"], path,
+                                            offsets[path], lines, bytes):
+                        streams[path].write(data)
+
+            for path, data in reader.follow(argv["--addr"], paths, offsets):
+                streams[path].write(data)
+                streams[path].flush()
+        except HTTPError as error:
+            if error.code == 404:
+                print ('No such file or directory')
+            else:
+                print('Failed to read file from agent')
+            sys.exit(1)
+        except HTTPException:
+            print('Failed to read file from agent')
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
 
     def top(self, argv):
         if self.check_remote(argv["--addr"]):
@@ -325,80 +555,252 @@ List images present in the Docker/Appc store on the agent
         argv["<command>"]=["ps","-ax"]
         self.execute(argv)
 
+    # Helper rendering the statistics of a container sampled by a
+    # `mesos.cgroups.Sampler`, with the CPU usage (of the container and
+    # each of its processes) since the `previous` sample.
+    def stats_screen(self, container_id, previous, current):
+        def percent(cpus):
+            if cpus is None:
+                return ""
+            return "%.1f%%" % (cpus * 100)
+
+        def size(bytes):
+            if bytes is None:
+                return "-"
+            return mesos.util.data_size(bytes, "%.1f")
+
+        cpu = mesos.cgroups.cpu_usage(previous, current)
+        mem = size(current.get('mem_rss_bytes'))
+        if 'mem_limit_bytes' in current:
+            mem += "/" + size(current['mem_limit_bytes'])
+        read = mesos.cgroups.rate(previous, current, 'io_read_bytes')
+        written = mesos.cgroups.rate(previous, current, 'io_write_bytes')
+
+        screen = "Container: %s\n" % container_id
+        screen += "CPU: %s  MEM: %s  IO: %s/s read, %s/s written\n" % (
+            percent(cpu) or "-", mem, size(read), size(written))
+
+        table = mesos.util.Table(
+            ["PID", "COMMAND", "STATE", "THREADS", "%CPU", "RSS"])
+        processes = []
+        for pid, process in current['processes'].items():
+            cpus = None
+            if previous is not None and pid in previous['processes']:
+                elapsed = current['timestamp'] - previous['timestamp']
+                if elapsed > 0:
+                    cpus = (process['cpu_time_secs'] -
+                            previous['processes'][pid]['cpu_time_secs'])
+                    cpus = max(0.0, cpus / elapsed)
+            processes.append((cpus, pid, process))
+
+        # The busiest processes come first, like in top.
+        processes.sort(key=lambda item: (item[0], -item[1]), reverse=True)
+        for cpus, pid, process in processes:
+            table.add_row([str(pid), process['command'], process['state'],
+                           str(process['threads']), percent(cpus),
+                           size(process['rss_bytes'])])
+
+        return screen + table.to_string()
+
+    # Helper rendering the statistics of the `containers` polled by
+    # `monitor_stats`, with rates since the `previous` samples.
+    def monitor_screen(self, containers, previous, samples, failed):
+        def size(bytes):
+            if bytes is None:
+                return ""
+            return mesos.util.data_size(bytes, "%.1f")
+
+        screen = ""
+        if failed:
+            screen += "Could not get statistics from agents at : %s\n\n" % (
+                ", ".join(failed))
+
+        table = mesos.util.Table(["AGENT", "CONTAINER", "EXECUTOR", "%CPU",
+                                  "MEM", "NET RX/s", "NET TX/s"])
+        for key in containers:
+            addr, container_id, framework_id, executor_id = key
+            current = samples.get(key)
+
+            cpu = ""
+            mem = ""
+            rx = None
+            tx = None
+            if current is not None:
+                cpus = mesos.cgroups.cpu_usage(previous.get(key), current)
+                if cpus is not None:
+                    cpu = "%.1f" % (cpus * 100)
+                if 'mem_rss_bytes' in current:
+                    mem = size(current['mem_rss_bytes'])
+                    if 'mem_limit_bytes' in current:
+                        mem += "/" + size(current['mem_limit_bytes'])
+                rx = mesos.cgroups.rate(
+                    previous.get(key), current, 'net_rx_bytes')
+                tx = mesos.cgroups.rate(
+                    previous.get(key), current, 'net_tx_bytes')
+
+            table.add_row([addr, container_id, executor_id, cpu, mem,
+                           size(rx), size(tx)])
+
+        return screen + table.to_string()
+
+    # Polls the /monitor/statistics of the agents running the containers
+    # given in `argv` concurrently and shows their usage on every refresh.
+    def monitor_stats(self, argv, addrs):
+        interval = float(argv["--interval"])
+        iterations = None
+        if argv.get("--iterations") is not None:
+            iterations = int(argv["--iterations"])
+        workers = int(argv.get("--workers") or 32)
+
+        # A slow or dead agent must not hold up a refresh, so the
+        # statistics are fetched without retries and every agent is
+        # given up on after `timeout` seconds.
+        timeout = float(argv.get("--timeout") or 10)
+        client = mesos.http.Client(
+            connect_timeout=min(self.http.connect_timeout, timeout),
+            read_timeout=min(self.http.read_timeout, timeout),
+            retries=0)
+
+        containers = []
+        for addr, container in self.resolve_containers(
+                addrs, argv["<container-ID>"], workers):
+            containers.append((addr, container["container_id"],
+                               container["framework_id"],
+                               container["executor_id"]))
+
+        # Only the agents running one of the containers are polled.
+        agents = []
+        for addr, container_id, framework_id, executor_id in containers:
+            if addr not in agents:
+                agents.append(addr)
+
+        def fetch_statistics(addr):
+            statistics = client.get_json(addr, "/monitor/statistics")
+            fetched = time.time()
+
+            index = {}
+            for entry in statistics:
+                entry['statistics'].setdefault('timestamp', fetched)
+                index[(entry['framework_id'], entry['executor_id'])] = \
+                    entry['statistics']
+            return index
+
+        previous = {}
+        shown = 0
+        try:
+            while True:
+                started = time.time()
+                indexes = {}
+                failed = []
+                for addr, index, error in mesos.util.fan_out(
+                        fetch_statistics, agents, workers=workers,
+                        timeout=timeout):
+                    if error is not None:
+                        failed.append(addr)
+                    else:
+                        indexes[addr] = index
+
+                samples = {}
+                for key in containers:
+                    addr, container_id, framework_id, executor_id = key
+                    if addr in indexes:
+                        current = indexes[addr].get(
+                            (framework_id, executor_id))
+                        if current is not None:
+                            samples[key] = current
+
+                screen = self.monitor_screen(
+                    containers, previous, samples, failed)
+                if sys.stdout.isatty():
+                    screen = "\033[H\033[2J" + screen
+                sys.stdout.write(screen)
+                sys.stdout.flush()
+
+                # Containers on agents that failed to respond keep their
+                # last sample, so their rates resume once they do.
+                previous.update(samples)
+
+                shown += 1
+                if iterations is not None and shown >= iterations:
+                    break
+                time.sleep(max(0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            pass
+
     def stats(self, argv):
-        if self.check_remote(argv["--addr"]):
-            print ("This command does not support remote agents")
+        addrs = argv["--addr"].split(",")
+        if (argv.get("--monitor") or len(addrs) > 1 or
+                self.check_remote(addrs[0])):
+            self.monitor_stats(argv, addrs)
             return
 
-        self.check_sudo()
-        containers = argv["<container-ID>"]
-        pids = []
-        for container in containers:
-            container_pid = self.get_pid(argv["--addr"],container)
-            pids.append(container_pid)
-
-        def get_status(proc_dic):
-            self.nsenter(proc_dic['pid'])
-            command = ["top","-b","-d1","-n1"]
-            proc_dic['output'] = subprocess.check_output(command)
-
-        manager = Manager()
-        proc_dict = manager.dict()
-
-        """
-        We continuously ask containers for the system statistics and print
-        the information for the user. A try/except is used because it
-        gracefully exits the function when a user kills it via ctrl+c etc
-        """
+        interval = float(argv["--interval"])
+        iterations = None
+        if argv.get("--iterations") is not None:
+            iterations = int(argv["--iterations"])
+
+        # All containers are resolved from a single /containers
+        # (see `container_index()`).
+        containers = []
+        for container in argv["<container-ID>"]:
+            containers.append(
+                (container, int(self.get_pid(argv["--addr"], container))))
+
+        # The statistics are read from the cgroups of the containers and
+        # /proc in process, so nothing needs to be spawned per refresh.
+        sampler = mesos.cgroups.Sampler()
+        previous = {}
+        shown = 0
         try:
             while True:
-                display = ""
-                for pid in pids:
-                    proc_dict['pid'] = pid
-                    process = Process(target=get_status, args=(proc_dict,))
-                    process.start()
-                    process.join()
-                    #Parse relevant information from the top output
-                    stat_lines = proc_dict['output'].split('\n')
-                    stat_lines.pop(0)
-                    for line in stat_lines:
-                        if line == '':
-                            break
-                        else:
-                            display += line+"\n"
-                    display += "\n\n"
-                subprocess.call(['clear'])
-                print(display)
-                subprocess.call(['sleep','1'])
-        except:
-            return
+                started = time.time()
+                screen = ""
+                for container, pid in containers:
+                    try:
+                        current = sampler.sample(pid)
+                    except IOError:
+                        print >> sys.stderr, \
+                            "Container %s is no longer running" % container
+                        sys.exit(1)
+                    screen += self.stats_screen(
+                        container, previous.get(pid), current) + "\n"
+                    previous[pid] = current
+
+                if sys.stdout.isatty():
+                    screen = "\033[H\033[2J" + screen
+                sys.stdout.write(screen)
+                sys.stdout.flush()
+
+                shown += 1
+                if iterations is not None and shown >= iterations:
+                    break
+                time.sleep(max(0, interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            pass
 
     def images(self, argv):
         if self.check_remote(argv["--addr"]):
-            self.remote_command("images", "",  argv["--addr"], [])
+            self.remote_command("images", "--format=" + argv["--format"],
+                                argv["--addr"], [])
             return
 
         self.check_sudo()
         flags = self.hit_endpoint(argv["--addr"],"/flags")
 
-        # Get docker store images
-        docker_store = flags["flags"]["docker_store_dir"] + "/storedImages"
-        if os.path.exists(docker_store):
-            with open(docker_store) as f:
-                output = f.read().decode('ISO-8859-1')
-            print("Docker Image Store:")
-            print(self.parse_images(output))
-        else:
-            print("No Images present in Docker Store!")
-
-        # Get Appc store images
-        appc_store = flags["flags"]["appc_store_dir"] + "/storedImages"
-        if os.path.exists(appc_store):
-            with open(appc_store) as f:
-                output = f.read().decode('ISO-8859-1')
-            print("Appc Image Store:")
-            print(self.parse_images(output))
-        else:
-            print("No Images present in Appc Store!")
+        table = self.output(["Store", "Image"], argv)
 
+        # Get docker and appc store images
+        stores = [("Docker", flags["flags"]["docker_store_dir"]),
+                  ("Appc", flags["flags"]["appc_store_dir"])]
+        for name, store_dir in stores:
+            store = store_dir + "/storedImages"
+            if not os.path.exists(store):
+                print >> sys.stderr, "No Images present in %s Store!" % name
+                continue
+
+            with open(store) as f:
+                output = f.read().decode('ISO-8859-1')
+            for image in self.parse_images(output):
+                table.add_row([name, image])
 
+        table.close()
@@ -1,26 +1,344 @@
+import os
+import shutil
 import sys
 import StringIO
+import tempfile
+import time
 import unittest
 
+import mesos.index
+import mesos.sandbox
+
 import main
 
+from fake_server import FakeServer
+
+
+def fake_statistics(executor_id, timestamp, cpu_time, net_rx_bytes):
+    return {
+        "framework_id" : "framework",
+        "executor_id" : executor_id,
+        "statistics" : {
+            "timestamp" : timestamp,
+            "cpus_user_time_secs" : cpu_time,
+            "cpus_system_time_secs" : 0,
+            "mem_rss_bytes" : 1024 * 1024,
+            "mem_limit_bytes" : 2 * 1024 * 1024,
+            "net_rx_bytes" : net_rx_bytes
+        }
+    }
+
+
+class FakeConfig(object):
+    HTTP_RETRIES = 0
+
+
 #Need to write test cases for container commands
 class TestCommands(unittest.TestCase):
 
+    def setUp(self):
+        self.agents = []
+        for index in range(2):
+            executor_id = "executor%d" % (index + 1)
+            container_id = "abc%d" % (index + 1)
+            self.agents.append(FakeServer({
+                "/containers" : [{
+                    "container_id" : container_id,
+                    "framework_id" : "framework",
+                    "executor_id" : executor_id
+                }],
+                "/monitor/statistics" : [
+                    lambda executor_id=executor_id: [fake_statistics(
+                        executor_id, 100.0, 1.0, 0)],
+                    lambda executor_id=executor_id: [fake_statistics(
+                        executor_id, 102.0, 2.0, 4096)]
+                ]
+            }))
+
+        self.stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        self.stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+        for agent in self.agents:
+            agent.stop()
+
     def test_ps(self):
-        pass
+        config = FakeConfig()
+        config.CACHE_DIR = tempfile.mkdtemp()
+        container = main.Container(config)
+        container.check_remote = lambda addr: True
+
+        calls = []
+        call = main.subprocess.call
+        main.subprocess.call = calls.append
+        try:
+            container.ps({"--addr" : "10.0.0.1:5051,10.0.0.2:5051,"
+                                     "10.0.0.1:5052",
+                          "--format" : "csv"})
+        finally:
+            main.subprocess.call = call
+            shutil.rmtree(config.CACHE_DIR)
+
+        # The agents on the same host are listed in a single session,
+        # over a connection shared with later commands.
+        self.assertEqual(["10.0.0.1", "10.0.0.2"],
+                         [args[-2] for args in calls])
+        self.assertEqual(
+            "echo '==> 10.0.0.1:5051 <==' ; "
+            "mesos container ps --addr=10.0.0.1:5051 --format=csv ; "
+            "echo '==> 10.0.0.1:5052 <==' ; "
+            "mesos container ps --addr=10.0.0.1:5052 --format=csv",
+            calls[0][-1])
+        self.assertIn("ControlMaster=auto", calls[0])
+        self.assertIn("ControlPersist=60", calls[0])
+        self.assertIn("ControlPath=" + os.path.join(
+            config.CACHE_DIR, "ssh", "%C"), calls[0])
+
+        config.SSH_CONTROL_PERSIST = 0
+        self.assertEqual([], container.ssh_options())
 
     def test_execute(self):
         pass
 
+    def logs_argv(self, **flags):
+        argv = {
+            "--addr" : self.agents[0].addr,
+            "--noStdout" : False,
+            "--noStderr" : False,
+            "--follow" : False,
+            "--tail" : None,
+            "--bytes" : None,
+            "<container-ID>" : "abc1"
+        }
+        argv.update(flags)
+        return argv
+
+    def add_sandbox(self, directory, files):
+        routes = self.agents[0].routes
+        routes["/state"] = {
+            "frameworks" : [{
+                "id" : "framework",
+                "executors" : [{
+                    "id" : "executor1",
+                    "container" : "abc1",
+                    "directory" : directory
+                }]
+            }]
+        }
+        routes[mesos.sandbox.browse_endpoint(directory)] = []
+        for name, data in files.items():
+            path = os.path.join(directory, name)
+            routes[mesos.sandbox.read_endpoint(path, -1)] = {
+                "data" : "", "offset" : len(data)
+            }
+            routes[mesos.sandbox.read_endpoint(path, 0, len(data))] = {
+                "data" : data, "offset" : 0
+            }
+
     def test_logs(self):
-        pass
+        self.add_sandbox("/sandbox/abc1", {
+            "stdout" : "out 1\nout 2\n",
+            "stderr" : "err 1\nerr 2\n"
+        })
+        container = main.Container(FakeConfig())
+        container.check_remote = lambda addr: False
+
+        container.logs(self.logs_argv())
+        self.assertEqual("out 1\nout 2\n" + "=" * 20 + "\nerr 1\nerr 2\n",
+                         sys.stdout.getvalue())
+
+        sys.stdout.truncate(0)
+        container.logs(self.logs_argv(**{"--tail" : "1",
+                                         "--noStderr" : True}))
+        self.assertEqual("out 2\n" + "=" * 20 + "\n",
+                         sys.stdout.getvalue())
+
+    def test_logs_follow(self):
+        self.add_sandbox("/sandbox/abc1", {"stdout" : "out 1\nout 2\n"})
+
+        # The log grows by a line after its tail has been shown.
+        routes = self.agents[0].routes
+        path = "/sandbox/abc1/stdout"
+        routes[mesos.sandbox.read_endpoint(path, -1)] = [
+            lambda: {"data" : "", "offset" : 12},
+            lambda: {"data" : "", "offset" : 18}
+        ]
+        routes[mesos.sandbox.read_endpoint(path, 12, 6)] = {
+            "data" : "out 3\n", "offset" : 12
+        }
+
+        # Following stops (like on ^C) once the new line is flushed.
+        class Stdout(StringIO.StringIO):
+            def flush(self):
+                raise KeyboardInterrupt()
+        sys.stdout = Stdout()
+
+        config = FakeConfig()
+        config.SANDBOX_POLL_INTERVAL = 0.001
+        container = main.Container(config)
+        container.check_remote = lambda addr: False
+        container.logs(self.logs_argv(**{"--follow" : True,
+                                         "--noStderr" : True,
+                                         "--tail" : "1"}))
+        self.assertEqual("out 2\nout 3\n", sys.stdout.getvalue())
+
+    def test_logs_remote(self):
+        container = main.Container(FakeConfig())
+        container.check_remote = lambda addr: True
+
+        calls = []
+        call = main.subprocess.call
+        main.subprocess.call = calls.append
+        try:
+            container.logs(self.logs_argv(**{
+                "--addr" : "10.0.0.1:5051",
+                "--noStderr" : True,
+                "--follow" : True,
+                "--tail" : "5",
+                "--bytes" : "100"
+            }))
+        finally:
+            main.subprocess.call = call
+
+        self.assertEqual("10.0.0.1", calls[0][-2])
+        self.assertEqual(
+            "mesos container logs --addr=10.0.0.1:5051  --noStderr "
+            "--follow --tail=5 --bytes=100 abc1", calls[0][-1])
+
+    def test_sandbox(self):
+        self.add_sandbox("/sandbox/abc1", {})
+        config = FakeConfig()
+        config.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            # Every lookup is a new invocation. The agent's state
+            # changes, so it must not be cached either.
+            def sandbox(container_id):
+                container = main.Container(config)
+                container.use_cache = False
+                return container.sandbox(addr, container_id)
+            addr = self.agents[0].addr
+
+            self.assertEqual("/sandbox/abc1", sandbox("abc1"))
+
+            # Later lookups (even of a prefix) are answered from the
+            # sandbox index, once the sandbox is found to still exist.
+            del self.agents[0].requests[:]
+            self.assertEqual("/sandbox/abc1", sandbox("ab"))
+            self.assertEqual(["/files/browse?path=%2Fsandbox%2Fabc1"],
+                             self.agents[0].requests)
+
+            # The sandbox was garbage collected and the container runs
+            # in a new one, which is found in the agent's state after
+            # resolving the prefix.
+            del self.agents[0].routes["/files/browse?path=%2Fsandbox%2Fabc1"]
+            self.add_sandbox("/sandbox/abc1-2", {})
+            del self.agents[0].requests[:]
+            self.assertEqual("/sandbox/abc1-2", sandbox("ab"))
+            self.assertEqual(
+                ["/files/browse?path=%2Fsandbox%2Fabc1", "/containers",
+                 "/state"],
+                self.agents[0].requests)
+
+            index = mesos.index.SandboxIndex.from_config(config)
+            self.assertEqual("/sandbox/abc1-2", index.container(addr, "abc1"))
+
+            # A prefix matching no container is an error.
+            with self.assertRaises(SystemExit):
+                sandbox("xyz")
+            self.assertEqual("No container with specified ID found\n",
+                             sys.stdout.getvalue())
+        finally:
+            shutil.rmtree(config.CACHE_DIR)
 
     def test_top(self):
         pass
 
     def test_stats(self):
-        pass
+        argv = {
+            "--addr" : ",".join(agent.addr for agent in self.agents),
+            "--interval" : "0",
+            "--iterations" : "2",
+            "--workers" : "2",
+            "<container-ID>" : ["abc2", "abc1"]
+        }
+        main.Container(FakeConfig()).stats(argv)
+
+        # The second screen shows the rates between the two samples.
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(6, len(lines))
+        self.assertEqual(
+            [self.agents[1].addr, "abc2", "executor2", "50.0",
+             "1.0", "MB/2.0", "MB", "2.0", "KB"],
+            lines[4].split())
+        self.assertEqual(self.agents[0].addr, lines[5].split()[0])
+
+        for agent in self.agents:
+            self.assertEqual(["/containers"] + ["/monitor/statistics"] * 2,
+                             agent.requests)
+
+        sys.stdout.truncate(0)
+        argv["<container-ID>"] = ["abc"]
+        with self.assertRaises(SystemExit):
+            main.Container(FakeConfig()).stats(argv)
+        self.assertEqual(
+            ["Container ID 'abc' not unique enough, it matches:",
+             "  abc1 (on %s)" % self.agents[0].addr,
+             "  abc2 (on %s)" % self.agents[1].addr],
+            sys.stdout.getvalue().splitlines())
+
+    def test_stats_timeout(self):
+        # The first agent stalls on its second poll for longer
+        # than the statistics of an agent are waited for.
+        def stall():
+            time.sleep(0.5)
+            return []
+        self.agents[0].routes["/monitor/statistics"][1] = stall
+
+        argv = {
+            "--addr" : ",".join(agent.addr for agent in self.agents),
+            "--interval" : "0",
+            "--iterations" : "2",
+            "--timeout" : "0.1",
+            "<container-ID>" : ["abc1", "abc2"]
+        }
+        started = time.time()
+        main.Container(FakeConfig()).stats(argv)
+        self.assertLess(time.time() - started, 0.4)
+
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(
+            "Could not get statistics from agents at : %s" %
+            self.agents[0].addr, lines[3])
+        self.assertEqual([self.agents[0].addr, "abc1", "executor1"],
+                         lines[-2].split())
+        self.assertEqual(
+            [self.agents[1].addr, "abc2", "executor2", "50.0"],
+            lines[-1].split()[:4])
+
+    def test_get_pid(self):
+        self.agents[0].routes["/containers"] = [{
+            "container_id" : container_id,
+            "framework_id" : "framework",
+            "executor_id" : "executor",
+            "status" : {"executor_pid" : pid}
+        } for container_id, pid in [("abc", 1), ("abcd", 2), ("bcd", 3)]]
+
+        container = main.Container(FakeConfig())
+        addr = self.agents[0].addr
+        self.assertEqual("1", container.get_pid(addr, "abc"))
+        self.assertEqual("2", container.get_pid(addr, "abcd"))
+        self.assertEqual("3", container.get_pid(addr, "b"))
+
+        # All IDs are resolved from a single /containers.
+        self.assertEqual(["/containers"], self.agents[0].requests)
+
+        with self.assertRaises(SystemExit):
+            container.get_pid(addr, "c")
+        self.assertIn("No container", sys.stdout.getvalue())
 
     def test_images(self):
         pass
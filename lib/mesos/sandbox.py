@@ -0,0 +1,349 @@
+"""
+Files in a sandbox are read through the '/files/read' endpoint of an
+agent, one page per request. Reading a large file (e.g. the stdout of a
+long running task) in small pages, one request at a time, is dominated by
+round trips. Instead, a `SandboxReader` starts with a small page (so that
+short files are returned quickly) and doubles the page size with every
+page up to a ceiling (or up to the cap of the agent on the length of
+a read, once a short page reveals it), while keeping several pages in
+flight at once. Pages are still yielded strictly in order.
+
+Showing the end of a file (like `tail -n`) reads the file backwards from
+its end in growing chunks until enough lines have been found, so only
+about as much data as is shown is transferred.
+
+Following a file (like `tail -f`) polls the agent for the length of the
+file and only reads the bytes added since the last poll. The polling
+interval doubles while the file is idle, up to a ceiling, and halves
+again while it grows, so idle followers put little load on the agent.
+"""
+
+import os
+import time
+import urllib
+
+import mesos.http
+import mesos.util
+
+# Default settings of a reader. These can be overridden by the
+# corresponding 'SANDBOX_*' settings in the config
+# (see `SandboxReader.from_config()`).
+PAGE_SIZE = 64 * 1024
+MAX_PAGE_SIZE = 4 * 1024 * 1024
+READ_AHEAD = 4
+POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 8.0
+
+
+def read_endpoint(path, offset, length=None):
+    """
+    Returns the '/files/read' endpoint reading `length` bytes
+    of the file at `path` starting at `offset`.
+    """
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+
+    query = [("path", path), ("offset", offset)]
+    if length is not None:
+        query.append(("length", length))
+
+    return "/files/read?" + urllib.urlencode(query)
+
+
+def browse_endpoint(path):
+    """
+    Returns the '/files/browse' endpoint listing the directory at `path`.
+    """
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+
+    return "/files/browse?" + urllib.urlencode([("path", path)])
+
+
+def download_endpoint(path):
+    """
+    Returns the '/files/download' endpoint of the file at `path`.
+    """
+    if isinstance(path, unicode):
+        path = path.encode("utf-8")
+
+    return "/files/download?" + urllib.urlencode([("path", path)])
+
+
+def pages(offset, length, page_size, max_page_size):
+    """
+    Returns the list of (offset, length) tuples of the pages covering the
+    bytes from `offset` up to `length`. Pages start at `page_size` bytes
+    and double in size up to `max_page_size` bytes.
+    """
+    result = []
+    while offset < length:
+        size = min(page_size, length - offset)
+        result.append((offset, size))
+        offset += size
+        page_size = min(page_size * 2, max_page_size)
+
+    return result
+
+
+class SandboxReader(object):
+    """
+    Reads files from the sandboxes on an agent using an HTTP `client`.
+    """
+
+    def __init__(self,
+                 client,
+                 page_size=PAGE_SIZE,
+                 max_page_size=MAX_PAGE_SIZE,
+                 read_ahead=READ_AHEAD,
+                 poll_interval=POLL_INTERVAL,
+                 max_poll_interval=MAX_POLL_INTERVAL):
+        self.client = client
+        self.page_size = page_size
+        self.max_page_size = max(page_size, max_page_size)
+        self.read_ahead = max(1, read_ahead)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+
+        # The longest read each agent returns (by address), learned
+        # from the first read of it that came back short.
+        self.read_caps = {}
+
+    @classmethod
+    def from_config(cls, client, config):
+        """
+        Returns a reader using the 'SANDBOX_*' settings in `config`
+        (falling back to the defaults for any missing settings).
+        """
+        return cls(
+            client,
+            page_size=getattr(config, "SANDBOX_PAGE_SIZE", PAGE_SIZE),
+            max_page_size=getattr(
+                config, "SANDBOX_MAX_PAGE_SIZE", MAX_PAGE_SIZE),
+            read_ahead=getattr(config, "SANDBOX_READ_AHEAD", READ_AHEAD),
+            poll_interval=getattr(
+                config, "SANDBOX_POLL_INTERVAL", POLL_INTERVAL),
+            max_poll_interval=getattr(
+                config, "SANDBOX_MAX_POLL_INTERVAL", MAX_POLL_INTERVAL))
+
+    def exists(self, addr, directory):
+        """
+        Returns whether the directory at `directory` exists on the agent
+        at `addr` (e.g., whether a sandbox has been garbage collected).
+        """
+        try:
+            self.client.request(addr, browse_endpoint(directory))
+        except mesos.http.HTTPError as error:
+            if error.code == 404:
+                return False
+            raise
+
+        return True
+
+    def browse(self, addr, directory):
+        """
+        Returns the entries of the directory at `directory` on the agent
+        at `addr` as listed by '/files/browse' (dictionaries with the
+        'path', 'mode', 'size' and 'mtime' of every file).
+        """
+        return self.client.get_json(addr, browse_endpoint(directory))
+
+    def walk(self, addr, directory):
+        """
+        Yields the entries (see `browse()`) of all files
+        below `directory` on the agent at `addr`.
+        """
+        pending = [directory]
+        while pending:
+            for entry in self.browse(addr, pending.pop()):
+                if entry["mode"].startswith("d"):
+                    pending.append(entry["path"])
+                else:
+                    yield entry
+
+    def download(self, addr, path, filename, size=None):
+        """
+        Downloads the file at `path` on the agent at `addr` (which is
+        `size` bytes long) to the local `filename` and returns the number
+        of bytes transferred. A shorter local file is assumed to be a
+        partial download and is resumed at its length with paged reads,
+        so an interrupted download only fetches the missing bytes.
+        """
+        if size is None:
+            size = self.length(addr, path)
+
+        try:
+            offset = os.path.getsize(filename)
+        except OSError:
+            offset = 0
+
+        if offset == size:
+            return 0
+
+        if 0 < offset < size:
+            with open(filename, "ab") as output:
+                for data in self.read(addr, path, offset, size):
+                    output.write(data)
+            return size - offset
+
+        transferred = 0
+        with open(filename, "wb") as output:
+            with self.client.stream(addr, download_endpoint(path)) as body:
+                data = body.read()
+                while data:
+                    output.write(data)
+                    transferred += len(data)
+                    data = body.read()
+
+        return transferred
+
+    def length(self, addr, path):
+        """
+        Returns the current length of the file at `path` on the agent
+        at `addr`. Raises a `mesos.http.HTTPError` with code 404 if
+        there is no such file.
+        """
+        return self.client.get_json(addr, read_endpoint(path, -1))["offset"]
+
+    def read_page(self, addr, path, offset, length):
+        """
+        Returns up to `length` bytes of the file at `path` on the agent
+        at `addr` starting at `offset`. The agent escapes every non
+        printable byte of the file as a '\u00XX' character of the json
+        string it returns, so encoding the string as latin-1 gets the
+        raw bytes back (even if a page splits a multibyte character).
+        """
+        data = self.client.get_json(
+            addr, read_endpoint(path, offset, length))["data"]
+        if isinstance(data, unicode):
+            try:
+                data = data.encode("latin-1")
+            except UnicodeEncodeError:
+                data = data.encode("utf-8")
+        return data
+
+    def read(self, addr, path, offset=0, length=None):
+        """
+        Yields the data of the file at `path` on the agent at `addr` from
+        `offset` up to `length` (or the current length of the file) in
+        order, one page at a time. Raises one of the exceptions in
+        `mesos.http` if a page cannot be read.
+
+        Agents cap the length of a single read (at 64KB by default). The
+        first page that comes back short reveals the cap of its agent, and
+        the rest of the file is read in pages of at most that size, still
+        several at once.
+        """
+        if length is None:
+            length = self.length(addr, path)
+
+        def fetch(page):
+            return self.read_page(addr, path, page[0], page[1])
+
+        page_size = self.page_size
+        max_page_size = self.max_page_size
+        while offset < length:
+            cap = self.read_caps.get(addr)
+            if cap is not None:
+                page_size = min(page_size, cap)
+                max_page_size = min(max_page_size, cap)
+
+            results = mesos.util.fan_out(
+                fetch,
+                pages(offset, length, page_size, max_page_size),
+                workers=self.read_ahead,
+                window=self.read_ahead * 2)
+
+            # Closing `results` stops requesting pages right away when the
+            # caller stops reading early (e.g., `cluster grep --max-count`)
+            # or once the rest of the file is split into capped pages.
+            try:
+                for page, data, error in results:
+                    if error is not None:
+                        raise error
+
+                    if not data:
+                        # The file was truncated.
+                        return
+                    yield data
+
+                    offset = page[0] + len(data)
+                    if len(data) < page[1]:
+                        self.read_caps[addr] = len(data)
+                        page_size = len(data)
+                        break
+            finally:
+                results.close()
+
+    def tail(self, addr, path, length, lines=None, bytes=None):
+        """
+        Yields the data of the last `lines` lines of the file at `path`
+        on the agent at `addr` up to `length`. If `bytes` is set, only
+        the last `bytes` bytes are considered (and all of them are
+        yielded if `lines` is None).
+        """
+        start = 0
+        if bytes is not None:
+            start = max(0, length - bytes)
+
+        if lines is None:
+            for data in self.read(addr, path, start, length):
+                yield data
+            return
+
+        buffer = ""
+        offset = length
+        size = self.page_size
+        while True:
+            # A newline terminating the file does not start another line.
+            end = len(buffer)
+            if buffer.endswith("\n"):
+                end -= 1
+
+            if offset <= start or buffer.count("\n", 0, end) >= lines:
+                break
+
+            chunk = max(start, offset - size)
+            buffer = "".join(self.read(addr, path, chunk, offset)) + buffer
+            offset = chunk
+            size = min(size * 2, self.max_page_size)
+
+        for i in range(lines):
+            end = buffer.rfind("\n", 0, end)
+            if end == -1:
+                break
+
+        if lines > 0 and buffer[end + 1:]:
+            yield buffer[end + 1:]
+
+    def follow(self, addr, paths, offsets=None):
+        """
+        Follows the files at `paths` on the agent at `addr`, starting at
+        their offsets in the dictionary `offsets` (or 0). Polls the files
+        for new data forever and yields a tuple of (path, data) for every
+        page read. A file that shrinks is assumed to have been truncated
+        and is followed from its start again.
+        """
+        offsets = dict((path, (offsets or {}).get(path, 0)) for path in paths)
+        interval = self.poll_interval
+
+        while True:
+            grown = False
+            for path in paths:
+                length = self.length(addr, path)
+                if length < offsets[path]:
+                    offsets[path] = 0
+                if length == offsets[path]:
+                    continue
+
+                for data in self.read(addr, path, offsets[path], length):
+                    yield (path, data)
+                offsets[path] = length
+                grown = True
+
+            if grown:
+                interval = max(self.poll_interval, interval / 2)
+            else:
+                interval = min(self.max_poll_interval, interval * 2)
+
+            time.sleep(interval)
@@ -1,7 +1,13 @@
+import csv
 import imp
 import importlib
+import json
 import os
+import Queue
+import sys
 import textwrap
+import threading
+import time
 
 # Defines a table structure for printing to the terminal.
 class Table:
@@ -26,15 +32,292 @@ class Table:
         self.Table.append(row)
 
     def to_string(self):
-        table_string = ""
-        for row in self.Table:
-            for index in range(len(row)):
-                entry = row[index]
-                table_string += "%s%s" % \
-                        (entry, " " * (self.Padding[index] - len(entry) + 2 ))
-            table_string += "\n"
+        return "".join(format_row(row, self.Padding) for row in self.Table)
+
+
+# Defines a table structure that is written to a file object row by row,
+# so that output starts right away and memory stays flat no matter how
+# many rows there are. Since later rows are never seen in advance, column
+# widths are either fixed (`widths`) or sampled from the first `sample`
+# rows, which are buffered until then. Entries that do not fit their
+# column either overflow it or, if `truncate` is set, are cut to fit.
+class StreamingTable:
+    # Takes a list of column names
+    def __init__(self, columns, out=None, widths=None, sample=100,
+                 truncate=False):
+        self.Columns = columns
+        self.Out = out
+        self.Truncate = truncate
+        self.Buffer = [columns]
+        self.Padding = None
+        self.Sample = sample
+
+        if widths is not None:
+            self.Padding = list(widths)
+            self.write(self.Buffer)
+            self.Buffer = []
+
+    # Takes a row entry for every column
+    def add_row(self, row):
+        # Number of entries and Columns do not match
+        if len(row) != len(self.Columns):
+            return
+
+        if self.Padding is not None:
+            self.write([row])
+            return
+
+        self.Buffer.append(row)
+        if len(self.Buffer) > self.Sample:
+            self.flush()
+
+    # Fixes the column widths (if they are still being sampled)
+    # and writes out all buffered rows.
+    def flush(self):
+        if self.Padding is None:
+            self.Padding = [max(len(row[index]) for row in self.Buffer)
+                            for index in range(len(self.Columns))]
+            self.write(self.Buffer)
+        self.Buffer = []
+
+        out = self.Out or sys.stdout
+        out.flush()
+
+    # Writes out any rows that are still buffered.
+    def close(self):
+        self.flush()
+
+    def write(self, rows):
+        out = self.Out or sys.stdout
+        for row in rows:
+            if self.Truncate:
+                row = [entry[:self.Padding[index]]
+                       for index, entry in enumerate(row)]
+            out.write(format_row(row, self.Padding))
+
+
+# Writes rows as records (objects keyed by column name) to a file object
+# one at a time, either as a single json array or as newline delimited
+# json (one object per line).
+class JSONWriter:
+    def __init__(self, columns, out=None, delimited=False):
+        self.Columns = columns
+        self.Out = out
+        self.Delimited = delimited
+        self.Count = 0
+
+    def add_row(self, row):
+        out = self.Out or sys.stdout
+        record = json.dumps(dict(zip(self.Columns, row)), sort_keys=True)
+
+        if self.Delimited:
+            out.write(record + "\n")
+        elif self.Count == 0:
+            out.write("[\n" + record)
+        else:
+            out.write(",\n" + record)
+        self.Count += 1
+
+    def close(self):
+        out = self.Out or sys.stdout
+        if not self.Delimited:
+            if self.Count == 0:
+                out.write("[")
+            out.write("\n]\n")
+        out.flush()
+
+
+# Writes rows as csv (with a header row) to a file object one at a time.
+class CSVWriter:
+    def __init__(self, columns, out=None):
+        self.Out = out
+        self.add_row(columns)
+
+    def add_row(self, row):
+        writer = csv.writer(self.Out or sys.stdout)
+        writer.writerow([unicode(entry).encode("utf-8") for entry in row])
+
+    def close(self):
+        (self.Out or sys.stdout).flush()
+
+
+OUTPUT_FORMATS = ["table", "json", "ndjson", "csv"]
+
+
+def record_writer(format, columns, out=None):
+    """
+    Returns a writer for rows with the given `columns` in the output
+    `format` (one of `OUTPUT_FORMATS`). Every writer has an `add_row()`
+    method that writes out a row as soon as possible and a `close()`
+    method that finishes the output.
+    """
+    if format == "table":
+        return StreamingTable(columns, out=out)
+    if format == "json":
+        return JSONWriter(columns, out=out)
+    if format == "ndjson":
+        return JSONWriter(columns, out=out, delimited=True)
+    if format == "csv":
+        return CSVWriter(columns, out=out)
+
+    raise ValueError("Unknown output format '%s', expected one of: %s"
+                     % (format, ", ".join(OUTPUT_FORMATS)))
+
+
+# Formats a number of bytes with the unit that fits it best,
+# e.g. data_size(1536, "%.1f") is '1.5 KB'.
+def data_size(bytes, format):
+    # Ensure bytes is treated as floating point for the math below.
+    bytes = float(bytes)
+    if bytes < 1024:
+        return (format % bytes) + ' B'
+    elif bytes < (1024 * 1024):
+        return (format % (bytes / 1024)) + ' KB'
+    elif bytes < (1024 * 1024 * 1024):
+        return (format % (bytes / (1024 * 1024))) + ' MB'
+    else:
+        return (format % (bytes / (1024 * 1024 * 1024))) + ' GB'
+
+
+# Formats a row of a table with every entry padded to `padding`.
+# Entries wider than their column overflow it, but are still
+# separated from the next entry.
+def format_row(row, padding):
+    entries = []
+    for index in range(len(row)):
+        entry = row[index]
+        entries.append("%s%s" % \
+                (entry, " " * (max(padding[index] - len(entry), 0) + 2 )))
+    return "".join(entries) + "\n"
+
+
+class DeadlineExceeded(Exception):
+    """
+    Reported by `fan_out()` for items that did not finish in time.
+    """
+    pass
+
+
+def fan_out(function, items, workers, timeout=None, deadline=None,
+            window=None):
+    """
+    Calls `function` on every item in `items` using a bounded pool of
+    `workers` threads. Yields a tuple of (item, result, error) for every
+    item in the order of `items` as soon as it is available, where
+    `error` is the exception raised by `function` (or None).
+
+    A call that takes longer than `timeout` seconds, or that has not
+    finished `deadline` seconds after `fan_out()` was called, is given up
+    on and its item is yielded with a `DeadlineExceeded` error. Calls can
+    not be interrupted, so `function` should bound its own run time as
+    well (e.g., with socket timeouts).
+
+    If `window` is set, an item is only started once all but `window - 1`
+    of the items before it have been yielded. This bounds the number of
+    results held in memory when the caller consumes them slower than they
+    are produced (e.g., when writing pages of a file to a pipe).
+    """
+    items = list(items)
+    tasks = Queue.Queue()
+    for index in range(len(items)):
+        tasks.put(index)
+
+    results = {}
+    started = {}
+    stopped = []
+    yielded = [0]
+    condition = threading.Condition()
+
+    def work():
+        while not stopped:
+            try:
+                index = tasks.get_nowait()
+            except Queue.Empty:
+                return
+
+            with condition:
+                while (window is not None and not stopped and
+                       index >= yielded[0] + window):
+                    condition.wait()
+                if stopped:
+                    return
+                started[index] = time.time()
+
+            try:
+                outcome = (function(items[index]), None)
+            except Exception as error:
+                outcome = (None, error)
+
+            with condition:
+                results[index] = outcome
+                condition.notify_all()
+
+    for i in range(min(workers, len(items))):
+        # Daemon threads make sure that calls we give up on
+        # never keep the process from exiting.
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+
+    expires = None
+    if deadline is not None:
+        expires = time.time() + deadline
+
+    try:
+        for index, item in enumerate(items):
+            with condition:
+                while index not in results:
+                    now = time.time()
+                    limits = []
+                    if expires is not None:
+                        limits.append(expires)
+                    if timeout is not None and index in started:
+                        limits.append(started[index] + timeout)
+                    if limits and now >= min(limits):
+                        break
+                    if timeout is None and expires is None:
+                        # Waiting with a timeout polls in Python 2,
+                        # which would delay every result.
+                        condition.wait()
+                        continue
+                    # Wake up periodically to start the per call
+                    # timeout once a worker has picked up the item.
+                    condition.wait(min(limits + [now + 0.1]) - now)
+
+                outcome = results.pop(index, None)
+                yielded[0] = index + 1
+                condition.notify_all()
+
+            if outcome is None:
+                yield (item, None, DeadlineExceeded("Deadline exceeded"))
+            else:
+                yield (item, outcome[0], outcome[1])
+    finally:
+        with condition:
+            stopped.append(True)
+            condition.notify_all()
+
+
+def import_module(package_path, module_type):
+    """
+    Looks for the python package at `package_path` and imports
+    it as a module. Returns a reference to the imported module.
+    """
+    # We put the imported module into the namespace of
+    # "mesos.<module_type>.<>" to keep it from cluttering up
+    # the import namespace elsewhere.
+    package_name = os.path.basename(package_path)
+    package_dir = os.path.dirname(package_path)
+    module_name = "mesos." + module_type + "." + package_name
+    try:
+        module = importlib.import_module(module_name)
+    except:
+        (file, filename, data) = imp.find_module(package_name, \
+                                                    [package_dir])
+        module = imp.load_module(module_name, file, filename, data)
+
+    return module
 
-        return table_string
 
 def import_modules(package_paths, module_type):
     """
@@ -44,19 +327,8 @@ def import_modules(package_paths, module_type):
     """
     modules = {}
     for package_path in package_paths:
-        # We put the imported module into the namespace of
-        # "mesos.<module_type>.<>" to keep it from cluttering up
-        # the import namespace elsewhere.
         package_name = os.path.basename(package_path)
-        package_dir = os.path.dirname(package_path)
-        module_name = "mesos." + module_type + "." + package_name
-        try:
-            module = importlib.import_module(module_name)
-        except:
-            (file, filename, data) = imp.find_module(package_name, \
-                                                        [package_dir])
-            module = imp.load_module(module_name, file, filename, data)
-        modules[package_name] = module
+        modules[package_name] = import_module(package_path, module_type)
 
     return modules
 
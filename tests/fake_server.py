@@ -0,0 +1,74 @@
+"""
+A fake Mesos master or agent for the tests, serving canned json responses
+on a local port. The routes of a `FakeServer` map the paths of requests
+(including their query) to the responses, and may be changed while it is
+running. A route may also be a list of functions returning the responses
+of consecutive requests. Tests that need more than canned responses
+subclass `FakeHandler` and pass it to the server.
+"""
+
+import BaseHTTPServer
+import json
+import socket
+import SocketServer
+import sys
+import threading
+import time
+
+
+class FakeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path not in self.server.routes:
+            return self.send_body(404, "")
+
+        time.sleep(self.server.delay)
+
+        route = self.server.routes[self.path]
+        if isinstance(route, list) and route and callable(route[0]):
+            route = route.pop(0)()
+
+        self.send_body(200, json.dumps(route))
+
+    def send_body(self, code, body, headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Serves `routes` with `handler`, delaying every known route by `delay`
+    seconds. Connections are served concurrently, like by a real agent.
+    """
+    daemon_threads = True
+
+    def __init__(self, routes=None, delay=0, handler=FakeHandler):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), handler)
+        self.routes = routes if routes is not None else {}
+        self.delay = delay
+        self.requests = []
+        self.addr = "127.0.0.1:%d" % self.server_address[1]
+
+        thread = threading.Thread(target=self.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up on a slow response close their connection.
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
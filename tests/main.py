@@ -1,6 +1,21 @@
 import unittest
 
 from mesos.plugins.example.tests import TestCommands
+from mesos.plugins.cluster.tests import TestCommands as TestClusterCommands
+from mesos.plugins.container.tests import TestCommands as \
+    TestContainerCommands
+
+from test_cache import TestResponseCache
+from test_cgroups import TestSampler
+from test_cli import TestCLI
+from test_containers import TestContainerIndex
+from test_hosts import TestLocalAddresses
+from test_http import TestClient
+from test_index import TestSandboxIndex
+from test_jsonstream import TestParser
+from test_manifest import TestManifest
+from test_sandbox import TestSandboxReader
+from test_util import TestFanOut, TestRecordWriter, TestTable
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
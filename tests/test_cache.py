@@ -0,0 +1,76 @@
+import os
+import shutil
+import StringIO
+import tempfile
+import time
+import unittest
+
+import mesos.cache
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = mesos.cache.ResponseCache(
+            self.directory, ttls={"/state" : 5, "/flags" : 5}, max_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def age(self, addr, endpoint, seconds):
+        path = self.cache.path(addr, endpoint)
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def test_get(self):
+        self.cache.put("master:5050", "/state", "{}")
+
+        self.assertEqual("{}", self.cache.get("master:5050", "/state"))
+        self.assertIsNone(self.cache.get("agent:5051", "/state"))
+
+    def test_tee(self):
+        stream = self.cache.tee(
+            "master:5050", "/state", StringIO.StringIO("{}"))
+        while stream.read(1):
+            pass
+        stream.close()
+
+        self.assertEqual("{}", self.cache.get("master:5050", "/state"))
+
+        # Partially read responses are not cached.
+        stream = self.cache.tee(
+            "master:5050", "/flags", StringIO.StringIO("{}"))
+        stream.read(1)
+        stream.close()
+
+        self.assertIsNone(self.cache.get("master:5050", "/flags"))
+        self.assertEqual(1, len(os.listdir(self.directory)))
+
+    def test_uncached_endpoint(self):
+        self.cache.put("agent:5051", "/files/read?path=stdout", "{}")
+
+        self.assertIsNone(
+            self.cache.get("agent:5051", "/files/read?path=stdout"))
+
+    def test_ttl(self):
+        self.cache.put("master:5050", "/state", "{}")
+        self.age("master:5050", "/state", 10)
+
+        self.assertIsNone(self.cache.get("master:5050", "/state"))
+        self.assertEqual(
+            "{}", self.cache.get("master:5050", "/state", max_age=20))
+
+    def test_eviction(self):
+        self.cache.put("master:5050", "/state", "12345")
+        self.cache.put("master:5050", "/flags", "12345")
+        self.age("master:5050", "/state", 2)
+        self.age("master:5050", "/flags", 1)
+
+        # Using '/state' makes '/flags' the least recently used response.
+        self.assertEqual("12345", self.cache.get("master:5050", "/state"))
+        self.cache.put("agent:5051", "/state", "12345")
+
+        self.assertIsNone(self.cache.get("master:5050", "/flags"))
+        self.assertEqual("12345", self.cache.get("master:5050", "/state"))
+        self.assertEqual("12345", self.cache.get("agent:5051", "/state"))
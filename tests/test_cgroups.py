@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mesos.cgroups
+
+
+def stat(pid, command, utime, stime, rss):
+    # The fields of '/proc/<pid>/stat' after the command, starting
+    # with the state (field 3) and ending with the rss (field 24).
+    fields = ["S", "1", str(pid), str(pid), "0", "-1", "4194560", "0", "0",
+              "0", "0", str(utime), str(stime), "0", "0", "20", "0", "3",
+              "0", "100", "1000", str(rss)]
+    return "%d (%s) %s 0 0\n" % (pid, command, " ".join(fields))
+
+
+class TestSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.proc = os.path.join(self.root, "proc")
+        self.cgroup = os.path.join(self.root, "cgroup")
+        self.sampler = mesos.cgroups.Sampler(self.proc, self.cgroup)
+        self.ticks = mesos.cgroups.CLOCK_TICKS
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, text):
+        path = os.path.join(self.root, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_cgroups_v1(self):
+        self.write("proc/42/cgroup",
+                   "4:memory:/mesos/abc\n"
+                   "3:cpu,cpuacct:/mesos/abc\n"
+                   "2:blkio:/mesos/abc\n"
+                   "1:name=systemd:/system.slice\n")
+        self.write("proc/42/stat",
+                   stat(42, "mesos-executor", self.ticks, self.ticks, 10))
+        self.write("proc/43/stat", stat(43, "sleep (1)", 0, 0, 1))
+        self.write("cgroup/cpu,cpuacct/mesos/abc/cgroup.procs", "42\n43\n44\n")
+        self.write("cgroup/cpu,cpuacct/mesos/abc/cpuacct.stat",
+                   "user %d\nsystem %d\n" % (3 * self.ticks, self.ticks))
+        self.write("cgroup/memory/mesos/abc/memory.stat",
+                   "cache 100\nrss 200\ntotal_cache 100\ntotal_rss 300\n")
+        self.write("cgroup/memory/mesos/abc/memory.limit_in_bytes", "1024\n")
+        self.write("cgroup/blkio/mesos/abc/blkio.throttle.io_service_bytes",
+                   "8:0 Read 10\n8:0 Write 20\n8:0 Total 30\n"
+                   "8:16 Read 1\n8:16 Write 2\n8:16 Total 3\nTotal 33\n")
+
+        directory = os.path.join(self.cgroup, "cpu,cpuacct", "mesos", "abc")
+        self.assertEqual(directory, self.sampler.cgroups(42)["cpu"])
+        self.assertEqual(directory, self.sampler.cgroups(42)["cpuacct"])
+        self.assertNotIn("name=systemd", self.sampler.cgroups(42))
+
+        statistics = self.sampler.sample(42)
+        self.assertEqual(3.0, statistics["cpus_user_time_secs"])
+        self.assertEqual(1.0, statistics["cpus_system_time_secs"])
+        self.assertEqual(300, statistics["mem_rss_bytes"])
+        self.assertEqual(1024, statistics["mem_limit_bytes"])
+        self.assertEqual(11, statistics["io_read_bytes"])
+        self.assertEqual(22, statistics["io_write_bytes"])
+
+        # Process 44 exited while the container was sampled.
+        processes = statistics["processes"]
+        self.assertEqual([42, 43], sorted(processes.keys()))
+        self.assertEqual("sleep (1)", processes[43]["command"])
+        self.assertEqual("S", processes[42]["state"])
+        self.assertEqual(3, processes[42]["threads"])
+        self.assertEqual(2.0, processes[42]["cpu_time_secs"])
+        self.assertEqual(10 * mesos.cgroups.PAGE_SIZE,
+                         processes[42]["rss_bytes"])
+
+    def test_cgroups_v2(self):
+        self.write("proc/42/cgroup", "0::/mesos/abc\n")
+        self.write("proc/42/stat", stat(42, "sh", 0, 0, 0))
+        self.write("cgroup/mesos/abc/cgroup.procs", "42\n")
+        self.write("cgroup/mesos/abc/cpu.stat",
+                   "usage_usec 3500000\nuser_usec 2500000\n"
+                   "system_usec 1000000\n")
+        self.write("cgroup/mesos/abc/memory.stat", "anon 4096\nfile 10\n")
+        self.write("cgroup/mesos/abc/memory.max", "max\n")
+        self.write("cgroup/mesos/abc/io.stat",
+                   "8:0 rbytes=10 wbytes=20 rios=1 wios=2\n"
+                   "8:16 rbytes=1 wbytes=2 rios=1 wios=1\n")
+
+        statistics = self.sampler.sample(42)
+        self.assertEqual(2.5, statistics["cpus_user_time_secs"])
+        self.assertEqual(1.0, statistics["cpus_system_time_secs"])
+        self.assertEqual(4096, statistics["mem_rss_bytes"])
+        self.assertNotIn("mem_limit_bytes", statistics)
+        self.assertEqual(11, statistics["io_read_bytes"])
+        self.assertEqual(22, statistics["io_write_bytes"])
+        self.assertEqual([42], statistics["processes"].keys())
+
+        self.write("cgroup/mesos/abc/memory.max", "9223372036854771712\n")
+        self.assertNotIn("mem_limit_bytes", self.sampler.sample(42))
+
+    def test_no_process(self):
+        with self.assertRaises(IOError):
+            self.sampler.sample(42)
+
+    def test_process_exits(self):
+        self.write("proc/42/cgroup", "0::/mesos/abc\n")
+        self.write("proc/42/stat", stat(42, "sh", 0, 0, 0))
+        self.write("cgroup/mesos/abc/cgroup.procs", "42\n")
+        self.sampler.sample(42)
+
+        # The container exited (and its cgroups were removed).
+        shutil.rmtree(os.path.join(self.proc, "42"))
+        shutil.rmtree(os.path.join(self.cgroup, "mesos"))
+        with self.assertRaises(IOError):
+            self.sampler.sample(42)
+
+    def test_rates(self):
+        previous = {"timestamp" : 10.0, "cpus_user_time_secs" : 1.0,
+                    "cpus_system_time_secs" : 1.0, "io_read_bytes" : 0}
+        current = {"timestamp" : 12.0, "cpus_user_time_secs" : 2.0,
+                   "cpus_system_time_secs" : 2.0, "io_read_bytes" : 2048}
+
+        self.assertEqual(1.0, mesos.cgroups.cpu_usage(previous, current))
+        self.assertEqual(None, mesos.cgroups.cpu_usage(None, current))
+        self.assertEqual(None, mesos.cgroups.cpu_usage(current, current))
+        self.assertEqual(
+            1024.0, mesos.cgroups.rate(previous, current, "io_read_bytes"))
+        self.assertEqual(
+            None, mesos.cgroups.rate(previous, current, "io_write_bytes"))
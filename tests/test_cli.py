@@ -0,0 +1,44 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCLI(unittest.TestCase):
+    """
+    Runs the `mesos` command the way it is installed, with only 'lib' on
+    the path, so that the plugins are imported (and described in a new
+    plugin manifest) outside of the test runner.
+    """
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def mesos(self, *args):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.join(ROOT, "lib")
+        env["MESOS_CLI_CACHE_DIR"] = self.cache_dir
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "bin", "mesos")] +
+            list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        stdout, stderr = process.communicate()
+        return (process.returncode, stdout, stderr)
+
+    def test_help(self):
+        code, stdout, stderr = self.mesos("help")
+        self.assertEqual(0, code, stderr)
+        for command in ["agent", "cluster", "container"]:
+            self.assertIn(command, stdout)
+
+    def test_autocomplete(self):
+        code, stdout, stderr = self.mesos("__autocomplete__", "clu")
+        self.assertEqual(0, code, stderr)
+        self.assertIn("cluster", stdout)
@@ -0,0 +1,26 @@
+import unittest
+
+import mesos.containers
+
+
+class TestContainerIndex(unittest.TestCase):
+
+    def test_matches(self):
+        index = mesos.containers.ContainerIndex([
+            {"container_id" : container_id}
+            for container_id in ["b2", "a1", "ab", "abc", "b1"]])
+
+        def matches(prefix):
+            return [container["container_id"]
+                    for container in index.matches(prefix)]
+
+        self.assertEqual(5, len(index))
+        self.assertEqual(["a1", "ab", "abc"], matches("a"))
+        self.assertEqual(["b1", "b2"], matches("b"))
+        self.assertEqual(["abc"], matches("abc"))
+        self.assertEqual([], matches("c"))
+        self.assertEqual([], matches("abcd"))
+
+        # A complete ID is not ambiguous, even if it is also a prefix.
+        self.assertEqual(["ab"], matches("ab"))
+        self.assertEqual(5, len(matches("")))
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mesos.hosts
+
+
+FIB_TRIE = """Main:
+  +-- 0.0.0.0/0 3 0 5
+     |-- 0.0.0.0
+        /0 universe UNICAST
+     +-- 127.0.0.0/8 2 0 2
+        +-- 127.0.0.0/31 1 0 0
+           |-- 127.0.0.0
+              /8 host LOCAL
+           |-- 127.0.0.1
+              /32 host LOCAL
+        |-- 127.255.255.255
+           /32 link BROADCAST
+     +-- 10.0.0.0/24 2 0 2
+        +-- 10.0.0.0/30 2 0 2
+           |-- 10.0.0.0
+              /24 link UNICAST
+           |-- 10.0.0.2
+              /32 host LOCAL
+        |-- 10.0.0.255
+           /32 link BROADCAST
+"""
+
+IF_INET6 = """\
+fe8000000000000000fc00fffe000001 04 40 20 80     eth0
+00000000000000000000000000000001 01 80 10 80       lo
+"""
+
+
+class FakeAddresses(mesos.hosts.LocalAddresses):
+    """
+    Resolves hostnames from a dictionary instead of querying the resolver.
+    """
+    def __init__(self, proc, hosts):
+        mesos.hosts.LocalAddresses.__init__(self, proc)
+        self.hosts = hosts
+        self.resolved = []
+
+    def resolve(self, host):
+        self.resolved.append(host)
+        return set(self.hosts.get(host, []))
+
+
+class TestLocalAddresses(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.proc, "net"))
+        with open(os.path.join(self.proc, "net", "fib_trie"), "w") as f:
+            f.write(FIB_TRIE)
+        with open(os.path.join(self.proc, "net", "if_inet6"), "w") as f:
+            f.write(IF_INET6)
+
+        self.addresses = FakeAddresses(self.proc, {
+            "agent1" : ["10.0.0.2"],
+            "agent2" : ["10.0.0.3", "fd00::3"]
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.proc)
+
+    def test_split_host(self):
+        self.assertEqual("10.0.0.1", mesos.hosts.split_host("10.0.0.1:5051"))
+        self.assertEqual("agent1", mesos.hosts.split_host("agent1"))
+        self.assertEqual("::1", mesos.hosts.split_host("[::1]:5051"))
+        self.assertEqual("fe80::1", mesos.hosts.split_host("fe80::1"))
+
+    def test_addresses(self):
+        addresses, networks = self.addresses.addresses()
+        self.assertEqual(
+            set(["127.0.0.1", "10.0.0.2", "::1", "fe80::fc:ff:fe00:1"]),
+            addresses)
+        self.assertEqual(set([(0x7f000000, 0xff000000)]), networks)
+
+    def test_is_local(self):
+        self.assertTrue(self.addresses.is_local("10.0.0.2"))
+        self.assertTrue(self.addresses.is_local("127.0.1.1"))
+        self.assertTrue(self.addresses.is_local("0:0::1"))
+        self.assertFalse(self.addresses.is_local("10.0.0.3"))
+        self.assertTrue(self.addresses.is_local("agent1"))
+        self.assertFalse(self.addresses.is_local("agent2"))
+        self.assertFalse(self.addresses.is_local("unknown"))
+
+        # Addresses are never resolved, and hostnames only once.
+        self.assertTrue(self.addresses.is_local("agent1"))
+        self.assertEqual(["agent1", "agent2", "unknown"],
+                         self.addresses.resolved)
+
+    def test_no_proc(self):
+        addresses = FakeAddresses(os.path.join(self.proc, "missing"), {})
+        self.assertTrue(addresses.is_local("127.0.0.1"))
+        self.assertFalse(addresses.is_local("10.0.0.2"))
@@ -0,0 +1,82 @@
+import gzip
+import json
+import socket
+import StringIO
+import unittest
+
+import mesos.http
+
+from fake_server import FakeHandler, FakeServer
+
+
+class Handler(FakeHandler):
+
+    def setup(self):
+        FakeHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        if self.path != "/state":
+            return self.send_body(404, "")
+
+        body = json.dumps({"id" : "master"})
+        headers = {}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            buf = StringIO.StringIO()
+            with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+                f.write(body)
+            body = buf.getvalue()
+            headers["Content-Encoding"] = "gzip"
+        self.send_body(200, body, headers)
+
+
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(handler=Handler)
+        self.server.connections = 0
+        self.addr = self.server.addr
+        self.client = mesos.http.Client(backoff=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_get_json(self):
+        self.assertEqual({"id" : "master"},
+                         self.client.get_json(self.addr, "/state"))
+
+    def test_stream(self):
+        with self.client.stream(self.addr, "/state") as response:
+            body = ""
+            data = response.read(4)
+            while data:
+                body += data
+                data = response.read(4)
+
+        self.assertEqual({"id" : "master"}, json.loads(body))
+
+        # The connection is reused once the response was read completely.
+        self.client.get_json(self.addr, "/state")
+        self.assertEqual(1, self.server.connections)
+
+    def test_keep_alive(self):
+        for i in range(5):
+            self.client.get_json(self.addr, "/state")
+
+        self.assertEqual(1, self.server.connections)
+
+    def test_http_error(self):
+        with self.assertRaises(mesos.http.HTTPError) as context:
+            self.client.request(self.addr, "/missing")
+
+        self.assertEqual(404, context.exception.code)
+
+    def test_connection_error(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        addr = "127.0.0.1:%d" % sock.getsockname()[1]
+        sock.close()
+
+        with self.assertRaises(mesos.http.ConnectionError):
+            self.client.request(addr, "/state")
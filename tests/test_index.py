@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mesos.index
+
+
+MASTER_STATE = {
+    "slaves" : [{"id" : "agent1", "pid" : "slave(1)@10.0.0.1:5051"}],
+    "frameworks" : [{
+        "id" : "framework",
+        "tasks" : [{
+            "id" : "task1",
+            "framework_id" : "framework",
+            "executor_id" : "",
+            "slave_id" : "agent1"
+        }],
+        "completed_tasks" : [{
+            "id" : "task2",
+            "framework_id" : "framework",
+            "executor_id" : "executor2",
+            "slave_id" : "agent1"
+        }]
+    }],
+    "completed_frameworks" : []
+}
+
+AGENT_STATE = {
+    "frameworks" : [{
+        "id" : "framework",
+        "executors" : [{
+            "id" : "task1",
+            "container" : "abcd-1",
+            "directory" : "/sandboxes/task1/runs/abcd-1"
+        }],
+        "completed_executors" : [{
+            "id" : "task1",
+            "container" : "abce-0",
+            "directory" : "/sandboxes/task1/runs/abce-0"
+        }, {
+            "id" : "executor2",
+            "container" : "ef01",
+            "directory" : "/sandboxes/executor2/runs/ef01"
+        }]
+    }],
+    "completed_frameworks" : []
+}
+
+
+class TestSandboxIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "index.db")
+        self.index = mesos.index.SandboxIndex(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_task(self):
+        self.assertIsNone(self.index.task("framework", "task1"))
+
+        self.index.add_master_state(MASTER_STATE)
+
+        # The index is persistent.
+        index = mesos.index.SandboxIndex(self.path)
+        self.assertEqual(("10.0.0.1:5051", "task1"),
+                         index.task("framework", "task1"))
+        self.assertEqual(("10.0.0.1:5051", "executor2"),
+                         index.task("framework", "task2"))
+        self.assertIsNone(index.task("framework", "task3"))
+
+    def test_executor(self):
+        self.index.add_agent_state("10.0.0.1:5051", AGENT_STATE)
+
+        # The active run of an executor is preferred.
+        self.assertEqual("/sandboxes/task1/runs/abcd-1", self.index.executor(
+            "10.0.0.1:5051", "framework", "task1"))
+        self.assertEqual("/sandboxes/executor2/runs/ef01", self.index.executor(
+            "10.0.0.1:5051", "framework", "executor2"))
+        self.assertIsNone(self.index.executor(
+            "10.0.0.2:5051", "framework", "task1"))
+
+        self.index.remove("10.0.0.1:5051", "/sandboxes/task1/runs/abcd-1")
+        self.assertEqual("/sandboxes/task1/runs/abce-0", self.index.executor(
+            "10.0.0.1:5051", "framework", "task1"))
+
+    def test_container(self):
+        self.index.add_agent_state("10.0.0.1:5051", AGENT_STATE)
+
+        self.assertEqual("/sandboxes/task1/runs/abcd-1",
+                         self.index.container("10.0.0.1:5051", "abc"))
+        self.assertEqual("/sandboxes/task1/runs/abcd-1",
+                         self.index.container("10.0.0.1:5051", "abcd-1"))
+
+        # Only active containers are considered.
+        self.assertIsNone(self.index.container("10.0.0.1:5051", "ef"))
+
+        # Ambiguous prefixes miss.
+        state = {"frameworks" : [{
+            "id" : "framework",
+            "executors" : [{
+                "id" : "task3",
+                "container" : "abcf",
+                "directory" : "/sandboxes/task3/runs/abcf"
+            }]
+        }]}
+        self.index.add_agent_state("10.0.0.1:5051", state)
+        self.assertIsNone(self.index.container("10.0.0.1:5051", "abc"))
+
+    def test_prune(self):
+        self.index.add_master_state(MASTER_STATE)
+
+        self.index.max_age = -1
+        self.index.add_master_state({})
+        self.assertIsNone(self.index.task("framework", "task1"))
+
+    def test_unusable_path(self):
+        path = os.path.join(self.directory, "file")
+        open(path, "w").close()
+
+        # Falls back to an index in memory.
+        index = mesos.index.SandboxIndex(os.path.join(path, "index.db"))
+        index.add_master_state(MASTER_STATE)
+        self.assertEqual(("10.0.0.1:5051", "task1"),
+                         index.task("framework", "task1"))
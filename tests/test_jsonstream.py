@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import json
+import StringIO
+import unittest
+
+import mesos.jsonstream
+
+
+STATE = {
+    "frameworks" : [{
+        "id" : "framework",
+        "name" : u"café \"[x]\" {y}",
+        "tasks" : [{"id" : "task%d" % i,
+                    "resources" : {"cpus" : 0.5, "ports" : "[31000-32000]"},
+                    "labels" : [{"key" : "}", "value" : "\\\\"}]}
+                   for i in range(3)]
+    }],
+    "slaves" : [{"id" : "agent", "pid" : "slave(1)@127.0.0.1:5051"}],
+    "values" : [1, -2.5e10, True, False, None, "]"]
+}
+
+PROJECTION = {
+    "frameworks" : [{"name" : True, "tasks" : [{"id" : True}]}],
+    "values" : True
+}
+
+PROJECTED = {
+    "frameworks" : [{
+        "name" : STATE["frameworks"][0]["name"],
+        "tasks" : [{"id" : "task%d" % i} for i in range(3)]
+    }],
+    "values" : STATE["values"]
+}
+
+
+class TestParser(unittest.TestCase):
+
+    def test_projection(self):
+        text = json.dumps(STATE)
+
+        self.assertEqual(
+            PROJECTED,
+            mesos.jsonstream.load(StringIO.StringIO(text), PROJECTION))
+        self.assertEqual(
+            json.loads(text),
+            mesos.jsonstream.load(StringIO.StringIO(text)))
+
+    def test_chunk_boundaries(self):
+        text = json.dumps(STATE, indent=2)
+
+        # Every token ends up split across chunks for some chunk size.
+        for chunk_size in range(1, 12):
+            parser = mesos.jsonstream.Parser(
+                StringIO.StringIO(text), chunk_size=chunk_size)
+            self.assertEqual(PROJECTED, parser.value(PROJECTION))
+
+    def test_split_numbers(self):
+        class ShortReads(object):
+            # A stream returning at most `size` bytes per read,
+            # like a socket would.
+            def __init__(self, text, size):
+                self.text = text
+                self.size = size
+
+            def read(self, size=-1):
+                data = self.text[:self.size]
+                self.text = self.text[self.size:]
+                return data
+
+        document = {"keep" : -25000000000.0, "values" : [
+            12345, 6.25e-3, 1.5e10, -7, 0.5, 100000000000000000000]}
+        text = json.dumps(document)
+        for size in range(1, 10):
+            self.assertEqual(
+                document, mesos.jsonstream.load(ShortReads(text, size)))
+            self.assertEqual(
+                {"keep" : -25000000000.0},
+                mesos.jsonstream.load(ShortReads(text, size),
+                                      {"keep" : True}))
+
+    def test_mismatched_projection(self):
+        self.assertEqual(
+            {"slaves" : None, "values" : STATE["values"]},
+            mesos.jsonstream.loads(json.dumps(STATE), {
+                "slaves" : {"id" : True},
+                "values" : [{"id" : True}]
+            }))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            mesos.jsonstream.loads('{"frameworks" : [{"id" : 1}', PROJECTION)
@@ -0,0 +1,134 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import mesos
+
+
+PLUGIN_SOURCE = \
+"""
+PLUGIN_NAME = "fake"
+PLUGIN_CLASS = "Fake"
+SHORT_HELP = "Fake commands for the Mesos CLI"
+
+class Fake(object):
+    COMMANDS = {
+        "run" : {
+            "arguments" : [],
+            "flags" : {"--addr=Addr" : "An address"},
+            "short_help" : "Run",
+            "long_help" : "Run"
+        }
+    }
+"""
+
+
+class FakeConfig(object):
+    pass
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.plugin_path = os.path.join(self.directory, "fakeplugin")
+        os.mkdir(self.plugin_path)
+        with open(os.path.join(self.plugin_path, "__init__.py"), "w") as f:
+            f.write(PLUGIN_SOURCE)
+
+        self.config = FakeConfig()
+        self.config.MESOS_CLI_PLUGINS = [self.plugin_path]
+        self.config.CACHE_DIR = os.path.join(self.directory, "cache")
+
+        self.describe = mesos.manifest.describe
+        self.described = []
+        def describe(plugin_path):
+            self.described.append(plugin_path)
+            return self.describe(plugin_path)
+        mesos.manifest.describe = describe
+
+    def tearDown(self):
+        mesos.manifest.describe = self.describe
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        entries = mesos.manifest.load(self.config)
+
+        self.assertEqual(1, len(entries))
+        self.assertEqual("fake", entries[0]["PLUGIN_NAME"])
+        self.assertEqual("Fake", entries[0]["PLUGIN_CLASS"])
+        self.assertEqual(["run"], entries[0]["COMMANDS"].keys())
+        self.assertEqual([self.plugin_path], self.described)
+
+    def test_cached(self):
+        mesos.manifest.load(self.config)
+        entries = mesos.manifest.load(self.config)
+
+        self.assertEqual("fake", entries[0]["PLUGIN_NAME"])
+        self.assertEqual(1, len(self.described))
+
+    def test_invalidated_by_mtime(self):
+        mesos.manifest.load(self.config)
+
+        source = os.path.join(self.plugin_path, "__init__.py")
+        mtime = os.path.getmtime(source) + 10
+        os.utime(source, (mtime, mtime))
+        mesos.manifest.load(self.config)
+
+        self.assertEqual(2, len(self.described))
+
+    def test_invalidated_by_config(self):
+        mesos.manifest.load(self.config)
+
+        self.config.MASTER_IP = "10.0.0.1:5050"
+        mesos.manifest.load(self.config)
+
+        self.assertEqual(2, len(self.described))
+
+    def test_frozen_signature(self):
+        # A frozen executable bundles the sources of its plugins.
+        frozen_path = os.path.join(self.directory, "frozen")
+        os.mkdir(frozen_path)
+        with open(os.path.join(frozen_path, "__init__.pyc"), "w") as f:
+            f.write("")
+
+        signature = mesos.manifest.signature(frozen_path)
+        self.assertEqual(os.path.abspath(sys.executable), signature[0])
+        self.assertEqual(signature, mesos.manifest.signature(frozen_path))
+
+    def test_not_rewritten(self):
+        signature = mesos.manifest.signature
+        write = mesos.manifest.write
+        written = []
+        def record_write(path, manifest):
+            written.append(path)
+            write(path, manifest)
+        mesos.manifest.signature = lambda plugin_path: None
+        mesos.manifest.write = record_write
+        try:
+            mesos.manifest.load(self.config)
+            entries = mesos.manifest.load(self.config)
+        finally:
+            mesos.manifest.signature = signature
+            mesos.manifest.write = write
+
+        # Without a signature the plugin is described again,
+        # but the unchanged manifest is only written once.
+        self.assertEqual("fake", entries[0]["PLUGIN_NAME"])
+        self.assertEqual(2, len(self.described))
+        self.assertEqual(1, len(written))
+
+    def test_completion_index(self):
+        index = mesos.manifest.completion_index(self.config)
+
+        self.assertEqual({"fake" : {"run" : ["--addr", "--help", "-h"]}},
+                         index)
+
+        self.assertEqual(
+            ("default", ["--addr", "--help", "-h"]),
+            mesos.completion.complete(index, "", ["fake", "run", ""]))
+        self.assertEqual(
+            ("default", ["run", "-h", "--help", "--version"]),
+            mesos.completion.complete(index, "r", ["help", "fake", "r"]))
@@ -0,0 +1,230 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urlparse
+
+import mesos.http
+import mesos.sandbox
+
+from fake_server import FakeHandler, FakeServer
+
+
+class Handler(FakeHandler):
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        query = dict(urlparse.parse_qsl(url.query))
+        if url.path == "/files/browse":
+            return self.browse(query["path"])
+
+        data = self.server.files.get(query.get("path"))
+        if data is None:
+            return self.send_body(404, "")
+
+        if url.path == "/files/download":
+            self.server.downloads.append(query["path"])
+            return self.send_body(200, data)
+
+        offset = int(query["offset"])
+        if offset == -1:
+            result = {"data" : "", "offset" : len(data)}
+        else:
+            length = int(query.get("length", len(data)))
+            self.server.requested.append(length)
+            if self.server.max_length is not None:
+                length = min(length, self.server.max_length)
+            self.server.lengths.append(length)
+            # Like the agent, escape every non ASCII byte on its own.
+            result = {"data" : data[offset:offset + length].decode("latin-1"),
+                      "offset" : offset}
+
+            # Count the reads in flight at once, which take a while.
+            with self.server.lock:
+                self.server.in_flight += 1
+                self.server.max_in_flight = max(
+                    self.server.max_in_flight, self.server.in_flight)
+            time.sleep(self.server.delay)
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+        self.send_body(200, json.dumps(result))
+
+    def browse(self, directory):
+        entries = {}
+        for path, data in self.server.files.items():
+            if not path.startswith(directory + "/"):
+                continue
+            name = path[len(directory) + 1:].split("/")[0]
+            entry = {"path" : directory + "/" + name, "mode" : "drwxr-xr-x"}
+            if name == path[len(directory) + 1:]:
+                entry = {"path" : path, "mode" : "-rw-r--r--",
+                         "size" : len(data)}
+            entries[name] = entry
+
+        if not entries:
+            return self.send_body(404, "")
+        self.send_body(200, json.dumps(entries.values()))
+
+
+class TestSandboxReader(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeServer(handler=Handler)
+        self.server.files = {}
+        self.server.max_length = None
+        self.server.lengths = []
+        self.server.requested = []
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.downloads = []
+        self.addr = self.server.addr
+        self.client = mesos.http.Client(retries=0)
+        self.reader = mesos.sandbox.SandboxReader(
+            self.client, page_size=4, max_page_size=32, read_ahead=3)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_pages(self):
+        self.assertEqual([(0, 4), (4, 8), (12, 16), (28, 16), (44, 6)],
+                         mesos.sandbox.pages(0, 50, 4, 16))
+        self.assertEqual([], mesos.sandbox.pages(10, 10, 4, 16))
+
+    def test_read(self):
+        data = "".join(str(i) for i in range(200))
+        self.server.files["/sandbox/stdout"] = data
+
+        self.assertEqual(data, "".join(
+            self.reader.read(self.addr, "/sandbox/stdout")))
+        self.assertEqual(32, max(self.server.lengths))
+
+    def test_short_pages(self):
+        data = "".join(str(i) for i in range(200))
+        self.server.files["/sandbox/stdout"] = data
+        self.server.max_length = 5
+
+        self.assertEqual(data, "".join(
+            self.reader.read(self.addr, "/sandbox/stdout")))
+        self.assertEqual(5, self.reader.read_caps[self.addr])
+
+        # Once the cap of the agent is known, the file is read in pages
+        # of at most that size, which are still read concurrently.
+        del self.server.requested[:]
+        self.server.delay = 0.01
+        self.assertEqual(data, "".join(
+            self.reader.read(self.addr, "/sandbox/stdout")))
+        self.assertEqual(5, max(self.server.requested))
+        self.assertEqual(3, self.server.max_in_flight)
+
+    def test_non_ascii(self):
+        data = u"caf\u00e9 \u2603\n".encode("utf-8") * 10
+        self.server.files["/sandbox/my file"] = data
+
+        self.assertEqual(data, "".join(
+            self.reader.read(self.addr, "/sandbox/my file")))
+
+    def test_missing_file(self):
+        with self.assertRaises(mesos.http.HTTPError) as context:
+            list(self.reader.read(self.addr, "/sandbox/missing"))
+        self.assertEqual(404, context.exception.code)
+
+    def test_follow(self):
+        self.server.files["/sandbox/stdout"] = "a" * 10
+        self.server.files["/sandbox/stderr"] = ""
+        self.reader.poll_interval = 0.001
+        self.reader.max_poll_interval = 0.002
+
+        follow = self.reader.follow(
+            self.addr, ["/sandbox/stdout", "/sandbox/stderr"],
+            {"/sandbox/stdout" : 6})
+
+        # Only the data after the given offset is read.
+        self.assertEqual(("/sandbox/stdout", "aaaa"), next(follow))
+
+        del self.server.lengths[:]
+        self.server.files["/sandbox/stderr"] = "bb"
+        self.assertEqual(("/sandbox/stderr", "bb"), next(follow))
+        self.assertEqual([2], self.server.lengths)
+
+        # A truncated file is followed from its start again.
+        self.server.files["/sandbox/stdout"] = "ccc"
+        self.assertEqual(("/sandbox/stdout", "ccc"), next(follow))
+
+    def test_tail(self):
+        data = "".join("line %d\n" % i for i in range(100))
+        self.server.files["/sandbox/stdout"] = data
+
+        def tail(lines=None, bytes=None, length=len(data)):
+            return "".join(self.reader.tail(
+                self.addr, "/sandbox/stdout", length, lines, bytes))
+
+        self.assertEqual("line 97\nline 98\nline 99\n", tail(3))
+        self.assertEqual(data, tail(1000))
+        self.assertEqual("", tail(0))
+        self.assertEqual("e 99\n", tail(bytes=5))
+        self.assertEqual("e 99\n", tail(3, bytes=5))
+        self.assertEqual("line 98\nline", tail(2, length=len(data) - 4))
+
+        # Only the end of the file is read.
+        del self.server.lengths[:]
+        tail(1)
+        self.assertEqual(4 + 8, sum(self.server.lengths))
+
+    def test_stop_early(self):
+        self.server.files["/sandbox/stdout"] = "a" * 1000
+        self.reader.read_ahead = 1
+
+        pages = self.reader.read(self.addr, "/sandbox/stdout")
+        self.assertEqual("aaaa", next(pages))
+        pages.close()
+
+        # No further pages are requested once the reader is closed.
+        requested = len(self.server.lengths)
+        time.sleep(0.05)
+        self.assertEqual(requested, len(self.server.lengths))
+        self.assertTrue(requested <= 3)
+
+    def test_walk(self):
+        self.server.files["/sandbox/stdout"] = "out"
+        self.server.files["/sandbox/logs/app/app.log"] = "log"
+
+        self.assertEqual(
+            [("/sandbox/logs/app/app.log", 3), ("/sandbox/stdout", 3)],
+            sorted((entry["path"], entry["size"])
+                   for entry in self.reader.walk(self.addr, "/sandbox")))
+        self.assertTrue(self.reader.exists(self.addr, "/sandbox/logs"))
+        self.assertFalse(self.reader.exists(self.addr, "/sandbox/missing"))
+
+    def test_download(self):
+        data = "".join(str(i) for i in range(100))
+        self.server.files["/sandbox/stdout"] = data
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "stdout")
+            self.assertEqual(len(data), self.reader.download(
+                self.addr, "/sandbox/stdout", filename))
+            self.assertEqual(["/sandbox/stdout"], self.server.downloads)
+
+            # Complete files are skipped.
+            self.assertEqual(0, self.reader.download(
+                self.addr, "/sandbox/stdout", filename, len(data)))
+
+            # Partial files are resumed at their length.
+            with open(filename, "r+b") as f:
+                f.truncate(50)
+            del self.server.lengths[:]
+            self.assertEqual(len(data) - 50, self.reader.download(
+                self.addr, "/sandbox/stdout", filename, len(data)))
+            self.assertEqual(len(data) - 50, sum(self.server.lengths))
+            self.assertEqual(["/sandbox/stdout"], self.server.downloads)
+
+            with open(filename, "rb") as f:
+                self.assertEqual(data, f.read())
+        finally:
+            shutil.rmtree(directory)
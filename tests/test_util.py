@@ -0,0 +1,148 @@
+import json
+import StringIO
+import threading
+import time
+import unittest
+
+import mesos
+
+
+class TestTable(unittest.TestCase):
+
+    def test_to_string(self):
+        table = mesos.util.Table(["ID", "NAME"])
+        table.add_row(["1", "first"])
+        table.add_row(["22", "second"])
+
+        self.assertEqual(
+            "ID  NAME    \n"
+            "1   first   \n"
+            "22  second  \n",
+            table.to_string())
+
+    def test_sampled_widths(self):
+        out = StringIO.StringIO()
+        table = mesos.util.StreamingTable(["ID", "NAME"], out=out, sample=2)
+        table.add_row(["1", "first"])
+
+        # Nothing is written until the widths are sampled.
+        self.assertEqual("", out.getvalue())
+
+        table.add_row(["22", "second"])
+        table.add_row(["333", "third"])
+        table.flush()
+
+        self.assertEqual(
+            "ID  NAME    \n"
+            "1   first   \n"
+            "22  second  \n"
+            "333  third   \n",
+            out.getvalue())
+
+    def test_fixed_widths(self):
+        out = StringIO.StringIO()
+        table = mesos.util.StreamingTable(
+            ["ID", "NAME"], out=out, widths=[2, 4], truncate=True)
+        table.add_row(["1", "first"])
+
+        self.assertEqual(
+            "ID  NAME  \n"
+            "1   firs  \n",
+            out.getvalue())
+
+    def test_matches_table(self):
+        rows = [["a", "bbb"], ["cc", "d"]]
+
+        table = mesos.util.Table(["X", "Y"])
+        out = StringIO.StringIO()
+        streaming_table = mesos.util.StreamingTable(["X", "Y"], out=out)
+        for row in rows:
+            table.add_row(row)
+            streaming_table.add_row(row)
+        streaming_table.flush()
+
+        self.assertEqual(table.to_string(), out.getvalue())
+
+
+class TestRecordWriter(unittest.TestCase):
+
+    def write(self, format, rows):
+        out = StringIO.StringIO()
+        writer = mesos.util.record_writer(format, ["ID", "NAME"], out=out)
+        for row in rows:
+            writer.add_row(row)
+        writer.close()
+        return out.getvalue()
+
+    def test_json(self):
+        rows = [["1", "first"], ["2", "second"]]
+
+        self.assertEqual(
+            [{"ID" : "1", "NAME" : "first"}, {"ID" : "2", "NAME" : "second"}],
+            json.loads(self.write("json", rows)))
+        self.assertEqual([], json.loads(self.write("json", [])))
+
+    def test_ndjson(self):
+        output = self.write("ndjson", [["1", "first"], ["2", "second"]])
+
+        self.assertEqual(
+            [{"ID" : "1", "NAME" : "first"}, {"ID" : "2", "NAME" : "second"}],
+            [json.loads(line) for line in output.splitlines()])
+
+    def test_csv(self):
+        self.assertEqual("ID,NAME\r\n1,\"a, b\"\r\n",
+                         self.write("csv", [["1", "a, b"]]))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.write("xml", [])
+
+
+class TestFanOut(unittest.TestCase):
+
+    def test_ordering(self):
+        def function(item):
+            time.sleep(0.01 * (5 - item))
+            if item == 3:
+                raise ValueError(item)
+            return item * 2
+
+        results = list(mesos.util.fan_out(function, range(5), workers=5))
+
+        self.assertEqual([0, 1, 2, 3, 4], [item for item, _, _ in results])
+        self.assertEqual([0, 2, 4, None, 8],
+                         [result for _, result, _ in results])
+        self.assertIsInstance(results[3][2], ValueError)
+
+    def test_timeout(self):
+        def function(item):
+            if item == 1:
+                time.sleep(1)
+            return item
+
+        results = list(mesos.util.fan_out(
+            function, range(3), workers=3, timeout=0.1))
+
+        self.assertEqual([0, None, 2], [result for _, result, _ in results])
+        self.assertIsInstance(results[1][2], mesos.util.DeadlineExceeded)
+
+    def test_window(self):
+        running = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def function(item):
+            with lock:
+                running.append(item)
+                peak[0] = max(peak[0], max(running) - min(running) + 1)
+            time.sleep(0.01)
+            with lock:
+                running.remove(item)
+            return item
+
+        results = mesos.util.fan_out(function, range(10), workers=4, window=2)
+        for item, result, error in results:
+            self.assertEqual(item, result)
+            time.sleep(0.02)
+
+        self.assertTrue(peak[0] <= 2)